@@ -0,0 +1,78 @@
+import argparse
+import logging
+import os
+import tempfile
+import time
+
+from benchmarks import synthetic
+from main import load_tables, process_xml
+from omniplan_exporter.db import operations
+from omniplan_exporter.xml import extract_operations
+
+
+def _time(function, *args, **kwargs):
+    started = time.perf_counter()
+    function(*args, **kwargs)
+    return time.perf_counter() - started
+
+
+def run_benchmark(task_count, repeat=3):
+    """
+    Times loading a synthetic export with and without bulk-load mode, both for
+    the database load alone and for a full process_xml.
+
+    Args:
+        task_count (int): The number of tasks in the synthetic export.
+        repeat (int): The number of runs per mode. The fastest run is kept.
+
+    Returns:
+        list: (label, default seconds, bulk seconds) tuples.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.xml")
+        synthetic.write_project(path, task_count)
+        tables = extract_operations.stream_project(path)
+
+        results = []
+        for label, run in (
+            ("load_tables", lambda db, bulk: _load(db, tables, bulk)),
+            (
+                "process_xml",
+                lambda db, bulk: process_xml(path, db, force=True, bulk=bulk),
+            ),
+        ):
+            timings = {}
+            for bulk in (False, True):
+                db_path = os.path.join(directory, f"{label}-{bulk}.db")
+                timings[bulk] = min(_time(run, db_path, bulk) for _ in range(repeat))
+            results.append((label, timings[False], timings[True]))
+    return results
+
+
+def _load(db_path, tables, bulk):
+    conn = operations.create_connection(db_path)
+    try:
+        load_tables(conn, tables, bulk)
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark bulk-load mode against the default import."
+    )
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{args.tasks} tasks")
+    for label, default, bulk in run_benchmark(args.tasks, args.repeat):
+        print(
+            f"{label:>12}: default {default:7.2f}s  bulk {bulk:7.2f}s  "
+            f"{default / bulk:5.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,235 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import sqlite3
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from benchmarks import synthetic
+from main import parse_xml, process_xml
+from omniplan_exporter.db import operations
+from omniplan_exporter.xml import extract_operations
+
+DEFAULT_TASK_COUNTS = (1000, 10000, 100000, 1000000)
+
+# The per-table extractors, keyed by the table they produce rows for.
+EXTRACTORS = {
+    "tasks": extract_operations.extract_tasks,
+    "resources": extract_operations.extract_resources,
+    "assignments": extract_operations.extract_assignments,
+    "calendars": extract_operations.extract_calendars,
+    "calendar_weekdays": extract_operations.extract_calendar_weekdays,
+    "calendar_exceptions": extract_operations.extract_calendar_exceptions,
+    "extended_attributes": extract_operations.extract_extended_attributes,
+    "predecessor_links": extract_operations.extract_predecessor_links,
+    "task_closure": extract_operations.extract_task_closure,
+    "jira_keys": extract_operations.extract_jira_keys,
+}
+
+INSERTERS = {
+    "tasks": operations.insert_tasks_into_db,
+    "resources": operations.insert_resources_into_db,
+    "assignments": operations.insert_assignments_into_db,
+    "calendars": operations.insert_calendars_into_db,
+    "calendar_weekdays": operations.insert_calendar_weekdays_into_db,
+    "calendar_exceptions": operations.insert_calendar_exceptions_into_db,
+    "extended_attributes": operations.insert_extended_attributes_into_db,
+    "predecessor_links": operations.insert_predecessor_links_into_db,
+    "task_closure": operations.insert_task_closure_into_db,
+    "jira_keys": operations.insert_jira_keys_into_db,
+}
+
+
+def measure(function, *args, memory=True):
+    """
+    Times a call and, if requested, repeats it under tracemalloc to find its peak
+    allocation. The two runs are separate because tracing slows allocations down
+    several times.
+
+    Args:
+        function (callable): The function to benchmark.
+        *args: The arguments of the call.
+        memory (bool): Whether to measure the peak allocation.
+
+    Returns:
+        tuple: The result of the call, the elapsed seconds, and the peak number
+        of bytes allocated during the call (None if memory is False).
+    """
+    gc.collect()
+    started = time.perf_counter()
+    result = function(*args)
+    seconds = time.perf_counter() - started
+
+    peak = None
+    if memory:
+        del result
+        gc.collect()
+        tracemalloc.start()
+        try:
+            result = function(*args)
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+
+def _result(task_count, benchmark, seconds, peak, rows=None):
+    return {
+        "tasks": task_count,
+        "benchmark": benchmark,
+        "seconds": round(seconds, 6),
+        "peak_bytes": peak,
+        "rows": rows,
+    }
+
+
+def _insert_and_commit(insert, conn, rows):
+    insert(conn, rows)
+    conn.commit()
+
+
+def run_size(directory, task_count, memory=True):
+    """
+    Benchmarks every extractor, every inserter and process_xml on one synthetic
+    export.
+
+    Args:
+        directory (str): The directory for the export and databases.
+        task_count (int): The number of tasks in the synthetic export.
+        memory (bool): Whether to measure peak allocations.
+
+    Returns:
+        list: One result dict per benchmark.
+    """
+    path = os.path.join(directory, f"synthetic-{task_count}.xml")
+    synthetic.write_project(path, task_count)
+    results = []
+
+    root, seconds, peak = measure(parse_xml, path, memory=memory)
+    results.append(_result(task_count, "parse_xml", seconds, peak))
+
+    tables = {}
+    for table, extract in EXTRACTORS.items():
+        tables[table], seconds, peak = measure(extract, root, memory=memory)
+        results.append(
+            _result(task_count, extract.__name__, seconds, peak, len(tables[table]))
+        )
+    del root
+
+    _, seconds, peak = measure(extract_operations.stream_project, path, memory=memory)
+    results.append(_result(task_count, "stream_project", seconds, peak))
+
+    conn = sqlite3.connect(os.path.join(directory, f"insert-{task_count}.db"))
+    try:
+        for table, insert in INSERTERS.items():
+            _, seconds, peak = measure(
+                _insert_and_commit, insert, conn, tables[table], memory=memory
+            )
+            results.append(
+                _result(task_count, insert.__name__, seconds, peak, len(tables[table]))
+            )
+    finally:
+        conn.close()
+    del tables
+
+    db_path = os.path.join(directory, f"process-{task_count}.db")
+    _, seconds, peak = measure(
+        lambda: process_xml(path, db_path, force=True), memory=memory
+    )
+    results.append(_result(task_count, "process_xml", seconds, peak))
+
+    os.remove(path)
+    return results
+
+
+def run_benchmarks(task_counts, memory=True):
+    """
+    Runs the benchmarks at each task count.
+
+    Args:
+        task_counts (iterable): The task counts of the synthetic exports.
+        memory (bool): Whether to measure peak allocations.
+
+    Returns:
+        dict: The environment and the results, ready to be written as JSON.
+    """
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        for task_count in task_counts:
+            results.extend(run_size(directory, task_count, memory))
+    return {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "cpu_count": os.cpu_count(),
+        "results": results,
+    }
+
+
+def compare(report, baseline):
+    """
+    Prints each result next to the matching result of a baseline report.
+
+    Args:
+        report (dict): The report of this run.
+        baseline (dict): A report written by an earlier run.
+    """
+    previous = {
+        (result["tasks"], result["benchmark"]): result for result in baseline["results"]
+    }
+    for result in report["results"]:
+        line = (
+            f"{result['tasks']:>8} {result['benchmark']:<36} "
+            f"{result['seconds']:10.3f}s"
+        )
+        if result["peak_bytes"] is not None:
+            line += f" {result['peak_bytes'] / 2**20:9.1f} MiB"
+        before = previous.get((result["tasks"], result["benchmark"]))
+        if before and result["seconds"]:
+            line += f"  {before['seconds'] / result['seconds']:5.2f}x"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark extraction, insertion and full imports."
+    )
+    parser.add_argument(
+        "--tasks",
+        default=",".join(str(count) for count in DEFAULT_TASK_COUNTS),
+        help="Comma separated task counts to benchmark.",
+    )
+    parser.add_argument(
+        "--output", default="benchmark-results.json", help="The JSON file to write."
+    )
+    parser.add_argument(
+        "--baseline", help="A JSON file from an earlier run to compare against."
+    )
+    parser.add_argument(
+        "--no-memory",
+        action="store_true",
+        help="Only measure time, skipping the tracemalloc runs.",
+    )
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    task_counts = [int(count) for count in args.tasks.split(",")]
+    report = run_benchmarks(task_counts, memory=not args.no_memory)
+    with open(args.output, "w") as file:
+        json.dump(report, file, indent=2)
+
+    baseline = {"results": []}
+    if args.baseline:
+        with open(args.baseline) as file:
+            baseline = json.load(file)
+    compare(report, baseline)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
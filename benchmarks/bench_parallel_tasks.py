@@ -0,0 +1,61 @@
+import argparse
+import os
+import tempfile
+import time
+
+from benchmarks import synthetic
+from omniplan_exporter.xml import extract_operations, parallel_operations
+
+
+def run_benchmark(task_count, worker_counts):
+    """
+    Times serial and parallel extraction of a synthetic export and checks that
+    every parallel run produces the same rows as the serial one.
+
+    Args:
+        task_count (int): The number of tasks in the synthetic export.
+        worker_counts (list): The worker counts to benchmark.
+
+    Returns:
+        list: (label, seconds, speedup) tuples.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, "synthetic.xml")
+        synthetic.write_project(path, task_count)
+
+        started = time.perf_counter()
+        expected = extract_operations.stream_project(path)
+        serial = time.perf_counter() - started
+        results = [("serial", serial, 1.0)]
+
+        for workers in worker_counts:
+            started = time.perf_counter()
+            rows = parallel_operations.stream_project_parallel(path, workers)
+            elapsed = time.perf_counter() - started
+            if rows != expected:
+                raise AssertionError(f"Rows differ from serial with {workers} workers")
+            results.append((f"{workers} workers", elapsed, serial / elapsed))
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark parallel parsing of the Tasks section."
+    )
+    parser.add_argument("--tasks", type=int, default=200000)
+    parser.add_argument(
+        "--workers",
+        default="1,2,4,8",
+        help="Comma separated worker counts to benchmark.",
+    )
+    args = parser.parse_args()
+    worker_counts = [int(count) for count in args.workers.split(",")]
+
+    print(f"{args.tasks} tasks, {os.cpu_count()} CPUs")
+    for label, seconds, speedup in run_benchmark(args.tasks, worker_counts):
+        print(f"{label:>12}: {seconds:8.2f}s  {speedup:5.2f}x")
+
+
+if __name__ == "__main__":
+    main()
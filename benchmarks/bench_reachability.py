@@ -0,0 +1,99 @@
+import argparse
+import logging
+import sqlite3
+import time
+
+from benchmarks.bench_schedule import random_plan
+from omniplan_exporter.db import indexes, operations, reachability
+
+
+def chain_plan(task_count):
+    """
+    Generates a plan of tasks in one long finish-to-start chain, where every
+    task depends on all tasks before it.
+
+    Args:
+        task_count (int): The number of tasks.
+
+    Returns:
+        tuple: (UID, duration in seconds) pairs and (TaskUID, PredecessorUID,
+        Type, LinkLag) rows.
+    """
+    tasks = [(uid, 27000) for uid in range(1, task_count + 1)]
+    links = [(uid, uid - 1, 1, 0) for uid in range(2, task_count + 1)]
+    return tasks, links
+
+
+def run_benchmark(tasks, links, repeat=3):
+    """
+    Times building the reachability labels, and the transitive lookups of the
+    milestone report: everything the last task depends on, everything the first
+    task unblocks, and a depends_on check in each direction between them.
+
+    Args:
+        tasks (list): (UID, duration in seconds) pairs.
+        links (list): (TaskUID, PredecessorUID, Type, LinkLag) rows.
+        repeat (int): The number of runs per step. The fastest run is kept.
+
+    Returns:
+        list: (label, seconds) tuples.
+    """
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    operations.create_tasks_table(cursor)
+    operations.create_predecessor_links_table(cursor)
+    cursor.executemany(
+        "INSERT INTO omniplan_tasks (UID, Name, DurationSeconds) "
+        "VALUES (?, 'Task', ?)",
+        tasks,
+    )
+    cursor.executemany(operations.INSERT_PREDECESSOR_LINKS_SQL, links)
+    indexes.create_indexes(cursor)
+    conn.commit()
+    first, last = tasks[0][0], tasks[-1][0]
+    steps = (
+        ("build labels", lambda: reachability.build_dependency_labels(cursor)),
+        (
+            "predecessors",
+            lambda: operations.get_transitive_predecessors(conn, [last]),
+        ),
+        ("successors", lambda: operations.get_transitive_successors(conn, [first])),
+        ("depends on", lambda: operations.depends_on(conn, last, first)),
+        ("independent", lambda: operations.depends_on(conn, first, last)),
+    )
+    results = []
+    for label, step in steps:
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            step()
+            timings.append(time.perf_counter() - started)
+        results.append((label, min(timings)))
+    conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the transitive dependency lookups on a random plan."
+    )
+    parser.add_argument("--tasks", type=int, default=5000)
+    parser.add_argument("--links", type=int, default=5000)
+    parser.add_argument(
+        "--chain", action="store_true", help="Link the tasks in one long chain."
+    )
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    if args.chain:
+        tasks, links = chain_plan(args.tasks)
+    else:
+        tasks, links = random_plan(args.tasks, args.links)
+    print(f"{len(tasks)} tasks, {len(links)} links")
+    for label, seconds in run_benchmark(tasks, links, args.repeat):
+        print(f"{label:>12}: {seconds:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
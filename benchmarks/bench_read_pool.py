@@ -0,0 +1,122 @@
+import argparse
+import logging
+import os
+import sqlite3
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks import synthetic
+from main import process_xml
+from omniplan_exporter.db import operations, pool
+
+
+def _lookups(conn, uids):
+    """
+    The per-task lookups of the report and sync paths, for a list of tasks.
+    """
+    for uid in uids:
+        operations.get_jira_number(conn, uid)
+        operations.get_descendant_uids(conn, uid, max_depth=1)
+        operations.fetch_task_name_by_uid(conn, uid)
+
+
+def _connect_per_call(db_path, uids):
+    for uid in uids:
+        conn = sqlite3.connect(db_path)
+        try:
+            _lookups(conn, (uid,))
+        finally:
+            conn.close()
+
+
+def _shared_connection(db_path, uids):
+    conn = sqlite3.connect(db_path)
+    try:
+        _lookups(conn, uids)
+    finally:
+        conn.close()
+
+
+def _threaded(read_pool, uids, threads):
+    def work(chunk):
+        for uid in chunk:
+            with read_pool.connection() as conn:
+                _lookups(conn, (uid,))
+
+    chunks = [uids[index::threads] for index in range(threads)]
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(work, chunks))
+
+
+def run_benchmark(task_count, calls, threads, repeat=3):
+    """
+    Times repeated lookup helpers on a synthetic plan: with a new connection per
+    call, on one shared default connection, through one pooled read-only
+    connection, and from several threads sharing a ReadPool.
+
+    Args:
+        task_count (int): The number of tasks in the synthetic export.
+        calls (int): The number of tasks to look up.
+        threads (int): The number of threads for the threaded run.
+        repeat (int): The number of runs per mode. The fastest run is kept.
+
+    Returns:
+        list: (label, seconds) tuples.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        xml_path = os.path.join(directory, "synthetic.xml")
+        db_path = os.path.join(directory, "synthetic.db")
+        synthetic.write_project(xml_path, task_count)
+        process_xml(xml_path, db_path)
+        uids = [(index * 7919) % task_count + 1 for index in range(calls)]
+
+        with pool.ReadPool(db_path, size=threads) as read_pool:
+
+            def pooled(db_path, uids):
+                with read_pool.connection() as conn:
+                    _lookups(conn, uids)
+
+            runs = (
+                ("connect per call", lambda: _connect_per_call(db_path, uids)),
+                ("shared connection", lambda: _shared_connection(db_path, uids)),
+                ("pooled read-only", lambda: pooled(db_path, uids)),
+                (
+                    f"pooled, {threads} threads",
+                    lambda: _threaded(read_pool, uids, threads),
+                ),
+            )
+            results = []
+            for label, run in runs:
+                timings = []
+                for _ in range(repeat):
+                    started = time.perf_counter()
+                    run()
+                    timings.append(time.perf_counter() - started)
+                results.append((label, min(timings)))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark pooled read-only connections on repeated lookups."
+    )
+    parser.add_argument("--tasks", type=int, default=10000)
+    parser.add_argument("--calls", type=int, default=5000)
+    parser.add_argument("--threads", type=int, default=pool.POOL_SIZE)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{args.tasks} tasks, {args.calls} lookups of 3 helpers")
+    results = run_benchmark(args.tasks, args.calls, args.threads, args.repeat)
+    baseline = results[0][1]
+    for label, seconds in results:
+        print(
+            f"{label:>20}: {seconds:7.3f}s  "
+            f"{args.calls / seconds:9,.0f} tasks/s  {baseline / seconds:6.2f}x"
+        )
+
+
+if __name__ == "__main__":
+    main()
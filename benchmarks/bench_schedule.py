@@ -0,0 +1,100 @@
+import argparse
+import logging
+import random
+import sqlite3
+import time
+
+from omniplan_exporter.db import operations, schedule
+
+
+def random_plan(task_count, link_count, seed=0):
+    """
+    Generates a random acyclic plan: tasks of up to 20 working days, and links
+    of every type, each from a random earlier task and some with a lag.
+
+    Args:
+        task_count (int): The number of tasks.
+        link_count (int): The number of links.
+        seed (int): The random seed.
+
+    Returns:
+        tuple: (UID, duration in seconds) pairs and (TaskUID, PredecessorUID,
+        Type, LinkLag) rows.
+    """
+    rng = random.Random(seed)
+    tasks = [
+        (uid, rng.randrange(0, 20 * 27000, 3600)) for uid in range(1, task_count + 1)
+    ]
+    links = []
+    for _ in range(link_count):
+        uid = rng.randrange(2, task_count + 1)
+        # Mostly finish-to-start, like a real plan.
+        type_ = rng.choice((1, 1, 1, 1, 0, 2, 3))
+        # A day's lag now and then, in tenths of a minute.
+        lag = rng.choice((0, 0, 0, 4500))
+        links.append((uid, rng.randrange(max(1, uid - 1000), uid), type_, lag))
+    return tasks, links
+
+
+def run_benchmark(task_count, link_count, repeat=3):
+    """
+    Times the critical path analysis of a random plan: building the network,
+    the forward and backward passes, and the whole build_schedule of an import
+    (reading the network and writing omniplan_task_schedule).
+
+    Args:
+        task_count (int): The number of tasks.
+        link_count (int): The number of links.
+        repeat (int): The number of runs per step. The fastest run is kept.
+
+    Returns:
+        list: (label, seconds) tuples.
+    """
+    tasks, links = random_plan(task_count, link_count)
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    operations.create_tasks_table(cursor)
+    operations.create_predecessor_links_table(cursor)
+    cursor.executemany(
+        "INSERT INTO omniplan_tasks (UID, DurationSeconds) VALUES (?, ?)", tasks
+    )
+    cursor.executemany(operations.INSERT_PREDECESSOR_LINKS_SQL, links)
+    conn.commit()
+
+    network = schedule.build_network(tasks, links)
+    steps = (
+        ("build network", lambda: schedule.build_network(tasks, links)),
+        ("compute schedule", lambda: schedule.compute_schedule(network)),
+        ("build_schedule", lambda: schedule.build_schedule(cursor)),
+    )
+    results = []
+    try:
+        for label, step in steps:
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                step()
+                timings.append(time.perf_counter() - started)
+            results.append((label, min(timings)))
+    finally:
+        conn.close()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the critical path analysis on a random plan."
+    )
+    parser.add_argument("--tasks", type=int, default=100000)
+    parser.add_argument("--links", type=int, default=300000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    logging.getLogger().setLevel(logging.WARNING)
+
+    print(f"{args.tasks} tasks, {args.links} links")
+    for label, seconds in run_benchmark(args.tasks, args.links, args.repeat):
+        print(f"{label:>17}: {seconds:7.3f}s")
+
+
+if __name__ == "__main__":
+    main()
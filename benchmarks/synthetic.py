@@ -0,0 +1,211 @@
+import random
+import shutil
+import tempfile
+from datetime import datetime, timedelta
+
+MSPDI_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>\n'
+    '<Project xmlns="http://schemas.microsoft.com/project">\n'
+    "<Name>Synthetic</Name>\n"
+)
+
+JIRA_FIELD_ID = "188743731"
+MUP_UID_FIELD_ID = "188743734"
+
+# One task in this many is a milestone.
+MILESTONE_EVERY = 20
+
+
+def outline_levels(task_count, max_depth, rng):
+    """
+    Generates the outline level of every task as a random walk that starts at
+    level 1 and changes by at most one level per task.
+    """
+    levels = []
+    level = 0
+    for _ in range(task_count):
+        level = max(1, min(level + rng.choice((-1, 0, 1)), max_depth))
+        levels.append(level)
+    return levels
+
+
+def _write_calendars(file, calendar_count):
+    file.write("<Calendars>\n")
+    for uid in range(1, calendar_count + 1):
+        file.write(
+            "<Calendar>"
+            f"<UID>{uid}</UID><Name>Calendar {uid}</Name>"
+            f"<IsBaseCalendar>{1 if uid == 1 else 0}</IsBaseCalendar>"
+            f"<BaseCalendarUID>{-1 if uid == 1 else 1}</BaseCalendarUID>"
+            "<WeekDays>"
+        )
+        for day_type in range(1, 8):
+            working = 0 if day_type in (1, 7) else 1
+            file.write(
+                f"<WeekDay><DayType>{day_type}</DayType>"
+                f"<DayWorking>{working}</DayWorking>"
+            )
+            if working:
+                file.write(
+                    "<WorkingTimes>"
+                    "<WorkingTime><FromTime>08:00:00</FromTime>"
+                    "<ToTime>12:00:00</ToTime></WorkingTime>"
+                    "<WorkingTime><FromTime>13:00:00</FromTime>"
+                    "<ToTime>16:30:00</ToTime></WorkingTime>"
+                    "</WorkingTimes>"
+                )
+            file.write("</WeekDay>")
+        file.write(
+            "</WeekDays><Exceptions><Exception>"
+            f"<UID>{uid}</UID><Name>Holiday {uid}</Name>"
+            "<FromDate>2024-12-24T00:00:00</FromDate>"
+            "<ToDate>2024-12-26T23:59:00</ToDate>"
+            "</Exception></Exceptions></Calendar>\n"
+        )
+    file.write("</Calendars>\n")
+
+
+def write_project(
+    path,
+    task_count,
+    max_depth=4,
+    seed=0,
+    assignment_density=1.0,
+    extended_attributes=1,
+    predecessor_links=1,
+    calendars=1,
+):
+    """
+    Writes a deterministic synthetic MSPDI export. The file is written as it is
+    generated, so exports of millions of tasks do not need to fit in memory.
+
+    Args:
+        path (str): The path of the XML file to write.
+        task_count (int): The number of tasks to generate.
+        max_depth (int): The deepest outline level.
+        seed (int): The random seed.
+        assignment_density (float): The average number of resource assignments
+            per task. Resources are created at one per 20 tasks.
+        extended_attributes (int): The extended attributes per task. The first
+            is the Jira key (MUP-<uid>), the second a MUP UID, the rest are
+            generic text fields.
+        predecessor_links (int): The most predecessor links per task. Each
+            links to a random earlier task that is not one of its summary tasks.
+        calendars (int): The number of calendars, each with a working week and
+            one exception.
+
+    Returns:
+        dict: The number of tasks, resources and assignments written.
+    """
+    rng = random.Random(seed)
+    project_start = datetime(2024, 1, 1, 8, 0, 0)
+    levels = outline_levels(task_count, max_depth, rng)
+    resource_count = max(1, task_count // 20) if assignment_density > 0 else 0
+    assignment_count = 0
+
+    # Assignments follow the resources in the export, so they are spooled to a
+    # temporary file while the tasks are written.
+    with open(path, "w", encoding="utf-8") as file, tempfile.TemporaryFile(
+        "w+", encoding="utf-8"
+    ) as assignments:
+        file.write(MSPDI_HEADER)
+        _write_calendars(file, calendars)
+
+        file.write("<Tasks>\n")
+        # (uid, outline level) pairs of the summary tasks the task is under.
+        ancestors = []
+        for index, outline_level in enumerate(levels):
+            uid = index + 1
+            while ancestors and ancestors[-1][1] >= outline_level:
+                ancestors.pop()
+            summary = int(index + 1 < task_count and levels[index + 1] > outline_level)
+            milestone = int(not summary and uid % MILESTONE_EVERY == 0)
+            start = project_start + timedelta(days=rng.randrange(365))
+            finish = (
+                start if milestone else start + timedelta(days=rng.randrange(1, 30))
+            )
+            hours = 0 if milestone else rng.randrange(1, 200)
+            file.write(
+                "<Task>"
+                f"<UID>{uid}</UID><ID>{uid}</ID><Name>Task {uid}</Name>"
+                "<Type>0</Type><Priority>500</Priority>"
+                f"<Start>{start.isoformat()}</Start>"
+                f"<Finish>{finish.isoformat()}</Finish>"
+                f"<Duration>PT{hours}H0M0S</Duration><Work>PT{hours}H0M0S</Work>"
+                "<ActualWork>PT0H0M0S</ActualWork>"
+                f"<RemainingWork>PT{hours}H0M0S</RemainingWork>"
+                f"<Summary>{summary}</Summary><Milestone>{milestone}</Milestone>"
+                f"<Notes>Notes for task {uid}</Notes>"
+                f"<OutlineLevel>{outline_level}</OutlineLevel>"
+                f"<PercentComplete>{rng.randrange(101)}</PercentComplete>"
+            )
+            for attribute in range(extended_attributes):
+                if attribute == 0:
+                    field_id, value = JIRA_FIELD_ID, f"MUP-{uid}"
+                elif attribute == 1:
+                    field_id, value = MUP_UID_FIELD_ID, f"mup-uid-{uid}"
+                else:
+                    field_id, value = str(188743734 + attribute), f"Text {attribute}"
+                file.write(
+                    f"<ExtendedAttribute><FieldID>{field_id}</FieldID>"
+                    f"<Value>{value}</Value></ExtendedAttribute>"
+                )
+            if uid > 1:
+                # A link from a summary task to a task under it would be a
+                # dependency cycle, since the summary only finishes after it.
+                own = {ancestor for ancestor, _ in ancestors}
+                drawn = {rng.randrange(1, uid) for _ in range(predecessor_links)}
+                for predecessor in sorted(drawn - own):
+                    file.write(
+                        "<PredecessorLink>"
+                        f"<PredecessorUID>{predecessor}</PredecessorUID>"
+                        "<Type>1</Type></PredecessorLink>"
+                    )
+            file.write("</Task>\n")
+            if summary:
+                ancestors.append((uid, outline_level))
+
+            if not summary and resource_count:
+                whole, fraction = divmod(assignment_density, 1)
+                count = int(whole) + (rng.random() < fraction)
+                for resource_uid in rng.sample(
+                    range(1, resource_count + 1), min(count, resource_count)
+                ):
+                    assignment_count += 1
+                    assignments.write(
+                        "<Assignment>"
+                        f"<UID>{assignment_count}</UID><TaskUID>{uid}</TaskUID>"
+                        f"<ResourceUID>{resource_uid}</ResourceUID>"
+                        "<Milestone>0</Milestone>"
+                        "<PercentWorkComplete>0</PercentWorkComplete>"
+                        f"<Units>1</Units><Work>PT{hours}H0M0S</Work>"
+                        "<ActualWork>PT0H0M0S</ActualWork>"
+                        f"<RemainingWork>PT{hours}H0M0S</RemainingWork>"
+                        f"<Start>{start.isoformat()}</Start>"
+                        f"<Finish>{finish.isoformat()}</Finish>"
+                        "</Assignment>\n"
+                    )
+        file.write("</Tasks>\n")
+
+        file.write("<Resources>\n")
+        for uid in range(1, resource_count + 1):
+            file.write(
+                "<Resource>"
+                f"<UID>{uid}</UID><ID>{uid}</ID><Name>Resource {uid}</Name>"
+                "<Type>1</Type><MaxUnits>1</MaxUnits>"
+                f"<CalendarUID>{(uid - 1) % max(calendars, 1) + 1}</CalendarUID>"
+                f"<Group>Team {uid % 10}</Group>"
+                "</Resource>\n"
+            )
+        file.write("</Resources>\n")
+
+        file.write("<Assignments>\n")
+        assignments.seek(0)
+        shutil.copyfileobj(assignments, file)
+        file.write("</Assignments>\n</Project>\n")
+
+    return {
+        "tasks": task_count,
+        "resources": resource_count,
+        "assignments": assignment_count,
+    }
@@ -1,10 +1,14 @@
 import sqlite3
 import xml.etree.ElementTree as ET
+import argparse
 import logging
 import os
 from dotenv import load_dotenv
-from omniplan_exporter.db import operations
-from omniplan_exporter.xml import extract_operations
+from omniplan_exporter.db import operations, snapshots, staging
+from omniplan_exporter.db.incremental import import_incrementally
+from omniplan_exporter.db.pipeline import import_pipelined
+from omniplan_exporter.utils import fingerprint
+from omniplan_exporter.xml import extract_operations, parallel_operations
 
 # Load environment variables
 load_dotenv()
@@ -17,13 +21,53 @@ def strip_namespace(xml_string):
     return xml_string.replace(' xmlns="http://schemas.microsoft.com/project"', "")
 
 
-def process_xml(file_path, db_name):
+def process_xml(
+    file_path,
+    db_name,
+    streaming=True,
+    workers=None,
+    incremental=False,
+    force=False,
+    bulk=False,
+    in_memory=False,
+    snapshot=False,
+):
     """
     Processes an XML file and extracts various elements to insert into a database.
 
     Args:
         file_path (str): The path to the XML file to be processed.
         db_name (str): The name of the SQLite database file.
+        streaming (bool): If True (the default), the export is read incrementally
+            with iterparse so that memory stays flat regardless of file size. A
+            full streaming import hands the rows to a writer thread in batches as
+            they are parsed (see omniplan_exporter.db.pipeline). If False, the
+            whole document is loaded into a tree before extraction. A full
+            import is built in a staging database, validated and then swapped
+            into db_name (see omniplan_exporter.db.staging), so readers of
+            db_name only ever see complete imports.
+        workers (int, optional): If greater than 1, the Tasks section is converted
+            in a pool of this many processes. The rows are identical to the
+            serial path.
+        incremental (bool): If True, only rows whose content changed since the
+            previous import are written, instead of rebuilding every table.
+        force (bool): If True, the export is imported even if it has not changed
+            since the last successful import.
+        bulk (bool): If True, a full import runs in bulk-load mode: WAL journal,
+            relaxed synchronous and a larger page cache while loading, then
+            ANALYZE and a WAL checkpoint. Ignored for incremental imports.
+        in_memory (bool): If True, a full import is built in an in-memory
+            database, indexes and derived tables included, and written to
+            db_name in one backup instead of through a staging file. Needs
+            memory for the whole database. Ignored for incremental imports.
+        snapshot (bool): If True, the import is also recorded as a snapshot,
+            keyed by its ImportID, that the query helpers can read with as_of
+            (see omniplan_exporter.db.snapshots). Only changed rows are stored.
+
+    Returns:
+        dict: The Delta (inserted, updated, deleted) of each table for an
+        incremental import, otherwise None. Also None if the import was skipped
+        because the export is unchanged.
 
     Raises:
         ET.ParseError: If there is an error parsing the XML file.
@@ -38,66 +82,248 @@ def process_xml(file_path, db_name):
         6. Extracts calendar weekdays and inserts them into the database.
         7. Extracts calendar exceptions and inserts them into the database.
     """
+    conn = None
     try:
         logger.info(f"Processing XML file: {file_path}")
         # Ensure the resources directory exists
         os.makedirs(os.path.dirname(db_name), exist_ok=True)
 
-        # Read and strip the namespace from the XML file
-        with open(file_path, "r") as file:
-            xml_string = file.read()
-        xml_string = strip_namespace(xml_string)
-
-        # Parse the XML file
-        root = ET.fromstring(xml_string)
-
         # Create a database connection
         conn = operations.create_connection(db_name)
 
-        # Extract and insert tasks
-        tasks = extract_operations.extract_tasks(root)
-        operations.insert_tasks_into_db(conn, tasks)
-
-        # Extract and insert resources
-        resources = extract_operations.extract_resources(root)
-        operations.insert_resources_into_db(conn, resources)
-
-        # Extract and insert assignments
-        assignments = extract_operations.extract_assignments(root)
-        operations.insert_assignments_into_db(conn, assignments)
-
-        # Extract and insert calendars
-        calendars = extract_operations.extract_calendars(root)
-        operations.insert_calendars_into_db(conn, calendars)
-
-        # Extract and insert calendar weekdays
-        calendar_weekdays = extract_operations.extract_calendar_weekdays(root)
-        operations.insert_calendar_weekdays_into_db(conn, calendar_weekdays)
+        previous = operations.get_last_import(conn)
+        unchanged, source = fingerprint.matches(file_path, previous)
+        if unchanged and not force:
+            if source.mtime_ns != previous.mtime_ns:
+                operations.update_last_import_mtime(conn, source.mtime_ns)
+            logger.info("XML file is unchanged since the last import, skipping.")
+            return None
+        if source.content_hash is None:
+            source = fingerprint.fingerprint(file_path)
 
-        # Extract and insert calendar exceptions
-        calendar_exceptions = extract_operations.extract_calendar_exceptions(root)
-        operations.insert_calendar_exceptions_into_db(conn, calendar_exceptions)
-
-        # Extract and insert extended attributes
-        extended_attributes = extract_operations.extract_extended_attributes(root)
-        operations.insert_extended_attributes_into_db(conn, extended_attributes)
-
-        # Extract and insert predecessor links
-        predecessor_links = extract_operations.extract_predecessor_links(root)
-        operations.insert_predecessor_links_into_db(conn, predecessor_links)
+        deltas = None
+        if incremental:
+            tables = extract_tables(file_path, streaming, workers)
+            deltas = import_incrementally(conn, tables)
+            import_id = operations.record_import(conn, file_path, source)
+            if snapshot:
+                snapshots.record_snapshot(conn, import_id)
+        elif in_memory:
+            # Keep every page write of the import off the disk until the backup.
+            memory_conn = operations.create_memory_connection()
+            try:
+                expected = build_import(
+                    memory_conn, file_path, streaming, workers, bulk
+                )
+                staging.swap_in(
+                    memory_conn, db_name, expected, file_path, source, snapshot
+                )
+            finally:
+                memory_conn.close()
+        else:
+            # Build the import next to the live database, so readers never see
+            # a half-written table, and swap it in once it is complete.
+            with staging.staging_database(db_name) as staging_db:
+                expected = build_import(staging_db, file_path, streaming, workers, bulk)
+                staging.swap_in(
+                    staging_db, db_name, expected, file_path, source, snapshot
+                )
 
         logger.info("XML processing completed successfully.")
+        return deltas
     except ET.ParseError as e:
         logger.error(f"Error parsing XML: {e}")
     except sqlite3.Error as e:
         logger.error(f"Database error: {e}")
+    except staging.StagingError as e:
+        logger.error(f"Staging database is incomplete, import not applied: {e}")
     except Exception as e:
         logger.error(f"Unexpected error: {e}")
+    finally:
+        if conn:
+            conn.close()
 
 
-if __name__ == "__main__":
+def build_import(database, file_path, streaming=True, workers=None, bulk=False):
+    """
+    Runs a full import of the export into an empty database.
+
+    Args:
+        database (str or sqlite3.Connection): The path to the database file, or
+            a connection to it, e.g. from operations.create_memory_connection.
+            A connection is left open.
+        file_path (str): The path to the XML file.
+        streaming (bool): Whether to read the export with iterparse.
+        workers (int, optional): The number of processes for the Tasks section.
+        bulk (bool): Whether to load in bulk-load mode.
+
+    Returns:
+        dict: The number of extracted rows keyed by table.
+    """
+    if streaming and not (workers and workers > 1):
+        # Overlap parsing with the SQLite writes in a writer thread.
+        parse, _ = import_pipelined(
+            database, extract_operations.iter_row_batches(file_path), bulk=bulk
+        )
+        return parse.table_rows
+
+    tables = extract_tables(file_path, streaming, workers)
+    if isinstance(database, str):
+        conn = operations.create_connection(database)
+    else:
+        conn = database
+    try:
+        load_tables(conn, tables, bulk)
+    finally:
+        if conn is not database:
+            conn.close()
+    return {table: len(tables[table]) for table in tables}
+
+
+def extract_tables(file_path, streaming=True, workers=None):
+    """
+    Extracts every import table from the export into memory.
+
+    Args:
+        file_path (str): The path to the XML file.
+        streaming (bool): Whether to read the export with iterparse.
+        workers (int, optional): The number of processes for the Tasks section.
+
+    Returns:
+        dict: The extracted rows keyed by table name.
+    """
+    if workers and workers > 1:
+        return parallel_operations.stream_project_parallel(file_path, workers)
+    if streaming:
+        return extract_operations.stream_project(file_path)
+    return extract_operations.extract_all(parse_xml(file_path))
+
+
+def load_tables(conn, tables, bulk=False):
+    """
+    Replaces every table in the database with the extracted rows, in a single
+    transaction.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        tables (dict): The extracted rows keyed by table name.
+        bulk (bool): Whether to load in bulk-load mode (see
+            operations.import_transaction).
+    """
+    with operations.import_transaction(conn, bulk):
+        # Insert tasks
+        operations.insert_tasks_into_db(conn, tables["tasks"])
+
+        # Insert resources
+        operations.insert_resources_into_db(conn, tables["resources"])
+
+        # Insert assignments
+        operations.insert_assignments_into_db(conn, tables["assignments"])
+
+        # Insert calendars
+        operations.insert_calendars_into_db(conn, tables["calendars"])
+
+        # Insert calendar weekdays
+        operations.insert_calendar_weekdays_into_db(conn, tables["calendar_weekdays"])
+
+        # Insert calendar exceptions
+        operations.insert_calendar_exceptions_into_db(
+            conn, tables["calendar_exceptions"]
+        )
+
+        # Insert extended attributes
+        operations.insert_extended_attributes_into_db(
+            conn, tables["extended_attributes"]
+        )
+
+        # Insert predecessor links
+        operations.insert_predecessor_links_into_db(conn, tables["predecessor_links"])
+
+        # Insert the task closure
+        operations.insert_task_closure_into_db(conn, tables["task_closure"])
+
+        # Insert the Jira keys
+        operations.insert_jira_keys_into_db(conn, tables["jira_keys"])
+
+
+def parse_xml(file_path):
+    """
+    Reads the whole XML file, strips the namespace and parses it into a tree.
+
+    Args:
+        file_path (str): The path to the XML file.
+
+    Returns:
+        Element: The root element of the parsed document.
+    """
+    with open(file_path, "r") as file:
+        xml_string = file.read()
+    return ET.fromstring(strip_namespace(xml_string))
+
+
+def main():
+    """
+    Main function to import an OmniPlan XML export into the database.
+    """
+    parser = argparse.ArgumentParser(
+        description="Import an OmniPlan XML export into a SQLite database."
+    )
+    parser.add_argument(
+        "--xml-path",
+        default=os.getenv("XML_FILE_PATH"),
+        help="Path to the XML export. Defaults to XML_FILE_PATH.",
+    )
+    parser.add_argument(
+        "--db-path",
+        default=os.getenv("DB_FILE_PATH"),
+        help="Path to the SQLite database file. Defaults to DB_FILE_PATH.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="Convert the Tasks section in this many processes (opt-in).",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Only write rows that changed since the previous import.",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="Import even if the export is unchanged since the last import.",
+    )
+    parser.add_argument(
+        "--bulk-load",
+        action="store_true",
+        help="Load with WAL, relaxed synchronous and a large cache, then ANALYZE.",
+    )
+    parser.add_argument(
+        "--in-memory",
+        action="store_true",
+        help="Build the import in memory and write it to disk in one backup.",
+    )
+    parser.add_argument(
+        "--snapshot",
+        action="store_true",
+        help="Also record the import as a snapshot for as_of queries.",
+    )
+    args = parser.parse_args()
+
     logger.info("Starting XML processing")
-    xml_file_path = os.getenv("XML_FILE_PATH")
-    db_file_path = os.getenv("DB_FILE_PATH")
-    process_xml(xml_file_path, db_file_path)
+    process_xml(
+        args.xml_path,
+        args.db_path,
+        workers=args.workers,
+        incremental=args.incremental,
+        force=args.force,
+        bulk=args.bulk_load,
+        in_memory=args.in_memory,
+        snapshot=args.snapshot,
+    )
     logger.info("Finished XML processing")
+
+
+if __name__ == "__main__":
+    main()
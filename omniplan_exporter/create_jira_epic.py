@@ -1,6 +1,6 @@
 import logging
 import argparse
-from omniplan_exporter.db import operations
+from omniplan_exporter.db import operations, pool
 from omniplan_exporter.jira.integration import create_jira_task
 from omniplan_exporter.config import JIRA_BASE_URL  # Added import
 
@@ -54,7 +54,7 @@ def create_epic_and_subtasks(conn, task_uid, bearer_token, dry_run=False):
     created_subtasks = []
 
     for subtask in subtasks:
-        subtask_name = subtask[1]
+        subtask_name = subtask.name
 
         if dry_run:
             logger.info(
@@ -116,7 +116,7 @@ def main():
 
     try:
         # Connect to the SQLite database
-        conn = operations.create_connection(args.db_path)
+        conn = pool.connect_read_only(args.db_path)
 
         # Fetch the OmniPlan task details
         task_name = operations.fetch_task_name_by_uid(conn, args.omniplan_uid)
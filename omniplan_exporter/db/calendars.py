@@ -0,0 +1,444 @@
+import logging
+from array import array
+from bisect import bisect_left
+from collections import namedtuple
+from datetime import date, datetime, timedelta
+from itertools import accumulate
+
+from omniplan_exporter.utils import decoding
+
+logger = logging.getLogger(__name__)
+
+MINUTES_PER_DAY = 24 * 60
+
+# The days a calendar is compiled for, unless given. Working time outside of them
+# cannot be computed.
+FIRST_DAY = date(2000, 1, 1)
+LAST_DAY = date(2100, 1, 1)
+
+# The tables a calendar is read from.
+CALENDAR_TABLES = (
+    "omniplan_calendars",
+    "omniplan_calendar_weekdays",
+    "omniplan_calendar_exceptions",
+)
+
+# The working times of a WeekDay marked as working without any, as in MSPDI.
+DEFAULT_WORKING_TIMES = ((8 * 60, 12 * 60), (13 * 60, 17 * 60))
+
+# A calendar as imported: its weekday working times keyed by MSPDI DayType
+# (1 is Sunday, 7 Saturday) as (from minute, to minute) tuples, and the working
+# times of its exception days keyed by date, empty for non-working days.
+# base_uid is the calendar it inherits from, if any.
+CalendarDefinition = namedtuple(
+    "CalendarDefinition", ["uid", "name", "base_uid", "weekdays", "exceptions"]
+)
+
+# The pattern index of a non-working exception day. Weekdays are 0 to 6,
+# Monday first, like date.weekday(). Working exception days come after it.
+_EXCEPTION = 7
+
+
+def _minute_of_day(value, end=False):
+    """
+    Converts an "HH:MM:SS" time to minutes after midnight. As an end, 00:00:00
+    is the end of the day.
+    """
+    hours, minutes = value.split(":")[:2]
+    minute = int(hours) * 60 + int(minutes)
+    return MINUTES_PER_DAY if end and not minute else minute
+
+
+def _add_working_time(intervals, day_working, from_time, to_time):
+    """
+    Adds the working time of a WeekDay or Exception row to the intervals of its
+    day. Rows of non-working days add nothing, and a working day without working
+    times has DEFAULT_WORKING_TIMES, as in MSPDI.
+    """
+    if str(day_working) != "1":
+        return
+    if from_time and to_time:
+        intervals.append((_minute_of_day(from_time), _minute_of_day(to_time, end=True)))
+    else:
+        intervals.extend(DEFAULT_WORKING_TIMES)
+
+
+def _weekday(day_type):
+    # DayType 1 is Sunday, 2 Monday, ..., 7 Saturday.
+    return (day_type + 5) % 7
+
+
+def _day_pattern(intervals):
+    """
+    Compiles the working times of one day.
+
+    Returns:
+        tuple: The working minutes before each minute of the day (1441 entries)
+        and the minute of the day of each working minute, in order.
+    """
+    working = bytearray(MINUTES_PER_DAY)
+    for start, finish in intervals:
+        working[start:finish] = b"\x01" * (finish - start)
+    before = array("H", [0, *accumulate(working)])
+    minutes = array("H", (minute for minute, flag in enumerate(working) if flag))
+    return before, minutes
+
+
+def _day_hours(weekdays):
+    """
+    Returns the average length of the working weekdays, in hours, or 0.0 if no
+    weekday has working time.
+    """
+    working_days = [
+        len({minute for start, finish in intervals for minute in range(start, finish)})
+        for intervals in weekdays.values()
+    ]
+    working_days = [minutes for minutes in working_days if minutes]
+    return sum(working_days) / len(working_days) / 60 if working_days else 0.0
+
+
+class WorkingCalendar:
+    """
+    A calendar compiled into per-day arrays of working minutes and their prefix
+    sums, from first_day up to but excluding last_day.
+
+    The working minutes before any moment are the prefix sum of its day plus the
+    working minutes before its time of day in that day's pattern, so the working
+    time between two moments is a subtraction. Adding working time finds the
+    day with a binary search over the prefix sums and the minute in the day's
+    pattern directly. Times are counted in whole minutes; seconds are dropped.
+
+    Args:
+        uid (int): The calendar UID.
+        name (str): The calendar name.
+        weekdays (dict): The working times of each weekday (0 is Monday) as
+            (from minute, to minute) tuples.
+        exceptions (dict): The working times of the exception days keyed by
+            date, which replace those of their weekday. Empty for non-working
+            days.
+        first_day (date): The first day to compile.
+        last_day (date): The day after the last day to compile.
+    """
+
+    def __init__(
+        self, uid, name, weekdays, exceptions, first_day=FIRST_DAY, last_day=LAST_DAY
+    ):
+        self.uid = uid
+        self.name = name
+        self.first_day = first_day
+        self.last_day = last_day
+        self._first = first_day.toordinal()
+        patterns = [_day_pattern(weekdays.get(weekday, ())) for weekday in range(7)]
+        patterns.append(_day_pattern(()))
+
+        days = last_day.toordinal() - self._first
+        kinds = [(self._first + day - 1) % 7 for day in range(days)]
+        # One pattern per distinct working time of the exception days.
+        exception_kinds = {(): _EXCEPTION}
+        for exception, intervals in exceptions.items():
+            day = exception.toordinal() - self._first
+            if not 0 <= day < days:
+                continue
+            intervals = tuple(sorted(intervals))
+            kind = exception_kinds.get(intervals)
+            if kind is None:
+                kind = exception_kinds[intervals] = len(patterns)
+                patterns.append(_day_pattern(intervals))
+            kinds[day] = kind
+        self._before = [before for before, _ in patterns]
+        self._minutes = [minutes for _, minutes in patterns]
+        self._kinds = array("H", kinds)
+        totals = [len(minutes) for minutes in self._minutes]
+        self._prefix = array("q", [0, *accumulate(map(totals.__getitem__, kinds))])
+
+        self.day_hours = _day_hours(weekdays)
+
+    def __repr__(self):
+        return f"WorkingCalendar(uid={self.uid!r}, name={self.name!r})"
+
+    def _day(self, moment):
+        day = moment.toordinal() - self._first
+        if not 0 <= day < len(self._kinds):
+            raise ValueError(
+                f"{moment} is outside of the calendar ({self.first_day} to "
+                f"{self.last_day})."
+            )
+        return day
+
+    def _minutes_before(self, moment):
+        day = self._day(moment)
+        if isinstance(moment, datetime):
+            minute = moment.hour * 60 + moment.minute
+        else:
+            minute = 0
+        return self._prefix[day] + self._before[self._kinds[day]][minute]
+
+    def is_working_day(self, day):
+        """
+        Tells whether a date has any working time.
+        """
+        index = self._day(day)
+        return self._prefix[index + 1] > self._prefix[index]
+
+    def working_minutes(self, start, finish):
+        """
+        Counts the working minutes between two moments.
+
+        Args:
+            start (datetime or date): The start. A date is its midnight.
+            finish (datetime or date): The finish.
+
+        Returns:
+            int: The working minutes, negative if finish is before start.
+
+        Raises:
+            ValueError: If either moment is outside of the compiled days.
+        """
+        return self._minutes_before(finish) - self._minutes_before(start)
+
+    def add_working_minutes(self, start, minutes):
+        """
+        Finds the moment a number of working minutes after a start.
+
+        Args:
+            start (datetime or date): The start. A date is its midnight.
+            minutes (int): The working minutes to add, at least 0.
+
+        Returns:
+            datetime: The earliest moment with that much working time since
+            start, e.g. the end of a working period rather than the start of
+            the next one. start itself when adding 0.
+
+        Raises:
+            ValueError: If minutes is negative, or the result is outside of the
+            compiled days.
+        """
+        if minutes < 0:
+            raise ValueError("Cannot add a negative working time.")
+        if not isinstance(start, datetime):
+            start = datetime.combine(start, datetime.min.time())
+        if not minutes:
+            return start
+        target = self._minutes_before(start) + minutes
+        if target > self._prefix[-1]:
+            raise ValueError(
+                f"Adding {minutes} working minutes to {start} ends after "
+                f"{self.last_day}."
+            )
+        # The day whose working minutes reach the target.
+        day = bisect_left(self._prefix, target) - 1
+        minute = self._minutes[self._kinds[day]][target - self._prefix[day] - 1] + 1
+        return datetime.fromordinal(self._first + day) + timedelta(minutes=minute)
+
+    def add_working_hours(self, start, hours):
+        """
+        Adds working hours to a moment, see add_working_minutes.
+        """
+        return self.add_working_minutes(start, round(hours * 60))
+
+
+def _exception_days(from_date, to_date):
+    """
+    Returns the dates covered by an exception. A ToDate at midnight ends the
+    exception at the end of the day before.
+    """
+    if not from_date:
+        return []
+    first = decoding.parse_datetime(from_date)
+    last = decoding.parse_datetime(to_date) if to_date else first
+    if last > first and last.time() == datetime.min.time():
+        last -= timedelta(minutes=1)
+    return [
+        first.date() + timedelta(days=day)
+        for day in range((last.date() - first.date()).days + 1)
+    ]
+
+
+def load_calendar_definitions(conn):
+    """
+    Reads the imported calendars.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+        dict: The CalendarDefinition records keyed by calendar UID.
+    """
+    cursor = conn.cursor()
+    definitions = {
+        uid: CalendarDefinition(uid, name, base_uid, {}, {})
+        for uid, name, base_uid in cursor.execute(
+            "SELECT UID, Name, BaseCalendarUID FROM omniplan_calendars ORDER BY UID"
+        )
+    }
+    cursor.execute(
+        "SELECT CalendarUID, DayType, DayWorking, FromTime, ToTime "
+        "FROM omniplan_calendar_weekdays"
+    )
+    for calendar_uid, day_type, day_working, from_time, to_time in cursor:
+        definition = definitions.get(calendar_uid)
+        # DayType 0 marks the exceptions of older exports.
+        if definition is None or not day_type:
+            continue
+        intervals = definition.weekdays.setdefault(int(day_type), [])
+        _add_working_time(intervals, day_working, from_time, to_time)
+    cursor.execute(
+        "SELECT CalendarUID, FromDate, ToDate, DayWorking, FromTime, ToTime "
+        "FROM omniplan_calendar_exceptions"
+    )
+    for calendar_uid, from_date, to_date, day_working, from_time, to_time in cursor:
+        definition = definitions.get(calendar_uid)
+        if definition is None:
+            continue
+        for day in _exception_days(from_date, to_date):
+            intervals = definition.exceptions.setdefault(day, [])
+            _add_working_time(intervals, day_working, from_time, to_time)
+    return definitions
+
+
+def resolve_definition(definitions, uid):
+    """
+    Merges a calendar with the calendars it inherits from: weekdays it does not
+    define come from its base calendar, and the exceptions of its base calendar
+    apply to it as well.
+
+    Args:
+        definitions (dict): The CalendarDefinition records keyed by UID.
+        uid (int): The calendar to resolve.
+
+    Returns:
+        tuple: The working times of each weekday (0 is Monday) and of each
+        exception day, keyed by date.
+    """
+    chain = []
+    while uid in definitions and uid not in chain:
+        chain.append(uid)
+        uid = definitions[uid].base_uid
+    if uid in chain:
+        logger.warning(f"Calendar {chain[0]} inherits from itself through {uid}.")
+    weekdays = {}
+    exceptions = {}
+    # The base calendar first, so the derived calendars override it.
+    for calendar_uid in reversed(chain):
+        definition = definitions[calendar_uid]
+        for day_type, intervals in definition.weekdays.items():
+            weekdays[_weekday(day_type)] = tuple(intervals)
+        for day, intervals in definition.exceptions.items():
+            exceptions[day] = tuple(intervals)
+    return weekdays, exceptions
+
+
+def default_calendar_uid(conn, definitions):
+    """
+    Returns the UID of the default calendar of a plan: the base calendar with the
+    lowest UID, or any calendar if none is marked as a base calendar.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        definitions (dict): The CalendarDefinition records keyed by UID.
+
+    Returns:
+        int: The calendar UID, or None if the plan has no calendars.
+    """
+    base_uids = [
+        row[0]
+        for row in conn.execute(
+            "SELECT UID FROM omniplan_calendars WHERE IsBaseCalendar = 1 ORDER BY UID"
+        )
+    ]
+    return (base_uids or sorted(definitions) or [None])[0]
+
+
+def project_day_hours(conn):
+    """
+    Returns the length of a working day of the plan: the average working weekday
+    of its default calendar.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+        float: The hours per working day, or decoding.WORK_DAY_HOURS if the plan
+        has no calendars or its default calendar has no working time.
+    """
+    tables = {
+        row[0]
+        for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    if not set(CALENDAR_TABLES) <= tables:
+        return decoding.WORK_DAY_HOURS
+    definitions = load_calendar_definitions(conn)
+    uid = default_calendar_uid(conn, definitions)
+    if uid is None:
+        return decoding.WORK_DAY_HOURS
+    weekdays, _ = resolve_definition(definitions, uid)
+    return _day_hours(weekdays) or decoding.WORK_DAY_HOURS
+
+
+class CalendarCache:
+    """
+    Compiled calendars of an imported plan, compiled on first use and kept for
+    the lifetime of the cache. Resources share the compiled calendar of their
+    omniplan_resources.CalendarUID.
+
+    Resources without a known calendar, and calendar_for(None), get the default
+    calendar: the base calendar with the lowest UID.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection. It is only
+            read while the cache is created.
+        first_day (date): The first day to compile calendars for.
+        last_day (date): The day after the last day to compile.
+    """
+
+    def __init__(self, conn, first_day=FIRST_DAY, last_day=LAST_DAY):
+        self.first_day = first_day
+        self.last_day = last_day
+        self.definitions = load_calendar_definitions(conn)
+        self.resource_calendars = dict(
+            conn.execute("SELECT UID, CalendarUID FROM omniplan_resources")
+        )
+        self.default_uid = default_calendar_uid(conn, self.definitions)
+        self._compiled = {}
+
+    def calendar_for(self, calendar_uid):
+        """
+        Returns a compiled calendar.
+
+        Args:
+            calendar_uid (int): The calendar UID, or None for the default.
+
+        Returns:
+            WorkingCalendar: The calendar, or the default calendar if the UID is
+            unknown. None if the plan has no calendars.
+        """
+        if calendar_uid not in self.definitions:
+            calendar_uid = self.default_uid
+        if calendar_uid is None:
+            return None
+        calendar = self._compiled.get(calendar_uid)
+        if calendar is None:
+            weekdays, exceptions = resolve_definition(self.definitions, calendar_uid)
+            calendar = WorkingCalendar(
+                calendar_uid,
+                self.definitions[calendar_uid].name,
+                weekdays,
+                exceptions,
+                self.first_day,
+                self.last_day,
+            )
+            self._compiled[calendar_uid] = calendar
+        return calendar
+
+    def for_resource(self, resource_uid):
+        """
+        Returns the compiled calendar of a resource.
+
+        Args:
+            resource_uid (int): The resource UID.
+
+        Returns:
+            WorkingCalendar: The calendar of the resource, or the default
+            calendar.
+        """
+        return self.calendar_for(self.resource_calendars.get(resource_uid))
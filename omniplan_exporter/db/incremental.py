@@ -0,0 +1,242 @@
+import hashlib
+import logging
+import sqlite3
+from collections import namedtuple
+from functools import lru_cache
+
+from omniplan_exporter.db import (
+    calendars,
+    indexes,
+    operations,
+    reachability,
+    rollup,
+    schedule,
+    utilization,
+)
+
+logger = logging.getLogger(__name__)
+
+# Number of row keys (UIDs) inserted, updated and deleted by an incremental import.
+Delta = namedtuple("Delta", ["inserted", "updated", "deleted"])
+
+# A step run after the rows are in: the tables it writes, and the import tables
+# (keys of operations.IMPORT_TABLES) it reads.
+DerivedBuild = namedtuple("DerivedBuild", ["build", "tables", "sources"])
+
+# The calendars set the length of a working day, in which every derived table
+# counts days.
+_CALENDARS = tuple(
+    table
+    for table, spec in operations.IMPORT_TABLES.items()
+    if spec.name in calendars.CALENDAR_TABLES
+)
+
+# The derived builds of an incremental import, in the order they must run.
+DERIVED_BUILDS = (
+    DerivedBuild(
+        operations.update_work_days, (), ("tasks", "assignments", *_CALENDARS)
+    ),
+    DerivedBuild(
+        schedule.build_schedule,
+        ("omniplan_task_schedule",),
+        ("tasks", "predecessor_links", *_CALENDARS),
+    ),
+    DerivedBuild(
+        reachability.build_dependency_labels,
+        ("omniplan_dependency_labels",),
+        ("tasks", "predecessor_links"),
+    ),
+    DerivedBuild(
+        rollup.build_rollup, ("omniplan_task_rollup",), ("tasks", *_CALENDARS)
+    ),
+    DerivedBuild(
+        utilization.build_utilization,
+        utilization.UTILIZATION_TABLES,
+        ("resources", "assignments", *_CALENDARS),
+    ),
+)
+
+
+def group_rows(rows):
+    """
+    Groups rows by their key, the first column, keeping document order.
+
+    Args:
+        rows (list): The extracted rows of one table.
+
+    Returns:
+        dict: The rows keyed by the string form of their first column.
+    """
+    groups = {}
+    for row in rows:
+        groups.setdefault(str(row[0]), []).append(row)
+    return groups
+
+
+def hash_rows(rows):
+    """
+    Computes the content hash of the rows that share a key.
+
+    Args:
+        rows (list): The rows of one key.
+
+    Returns:
+        str: A hex digest that changes whenever any column of any row changes.
+    """
+    return hashlib.blake2b(repr(rows).encode("utf-8"), digest_size=16).hexdigest()
+
+
+@lru_cache(maxsize=None)
+def expected_columns(table):
+    """
+    Returns the columns the current schema defines for an import table.
+
+    Args:
+        table (str): The table key in operations.IMPORT_TABLES.
+
+    Returns:
+        tuple: The column names.
+    """
+    conn = sqlite3.connect(":memory:")
+    try:
+        cursor = conn.cursor()
+        operations.IMPORT_TABLES[table].create(cursor)
+        return _table_columns(cursor, operations.IMPORT_TABLES[table].name)
+    finally:
+        conn.close()
+
+
+def _table_columns(cursor, name):
+    return tuple(row[1] for row in cursor.execute(f"PRAGMA table_info({name})"))
+
+
+def _replace_all(cursor, table, groups, hashes):
+    spec = operations.IMPORT_TABLES[table]
+    operations.reset_table(cursor, table)
+    rows = [row for group in groups.values() for row in group]
+    cursor.executemany(spec.insert, spec.prepare(rows) if spec.prepare else rows)
+    cursor.executemany(
+        "INSERT INTO omniplan_row_hashes (TableName, RowKey, Hash) VALUES (?, ?, ?)",
+        ((spec.name, key, row_hash) for key, row_hash in hashes.items()),
+    )
+    return Delta(len(groups), 0, 0)
+
+
+def import_table_incrementally(conn, table, rows):
+    """
+    Applies only the changed rows of one table, comparing per-key content hashes
+    with the ones stored by the previous import.
+
+    Rows are keyed by their first column (the UID, or the owning task or calendar
+    UID for child tables), and all rows of a changed key are replaced together.
+    The table is rebuilt from scratch when it does not exist yet, when its schema
+    has changed, or when it was last written by a full import.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        table (str): The table key in operations.IMPORT_TABLES (e.g., "tasks").
+        rows (list): All extracted rows of the table.
+
+    Returns:
+        Delta: The number of keys inserted, updated and deleted.
+    """
+    spec = operations.IMPORT_TABLES[table]
+    cursor = conn.cursor()
+    operations.create_row_hashes_table(cursor)
+
+    groups = group_rows(rows)
+    hashes = {key: hash_rows(group) for key, group in groups.items()}
+
+    if _table_columns(cursor, spec.name) != expected_columns(table):
+        return _replace_all(cursor, table, groups, hashes)
+
+    previous = dict(
+        cursor.execute(
+            "SELECT RowKey, Hash FROM omniplan_row_hashes WHERE TableName = ?",
+            (spec.name,),
+        )
+    )
+    if not previous and cursor.execute(f"SELECT 1 FROM {spec.name}").fetchone():
+        return _replace_all(cursor, table, groups, hashes)
+
+    inserted = [key for key in hashes if key not in previous]
+    updated = [
+        key for key in hashes if key in previous and previous[key] != hashes[key]
+    ]
+    deleted = [key for key in previous if key not in hashes]
+
+    key_column = expected_columns(table)[0]
+    cursor.executemany(
+        f"DELETE FROM {spec.name} WHERE {key_column} = ?",
+        ((key,) for key in updated + deleted),
+    )
+    changed_rows = [row for key in inserted + updated for row in groups[key]]
+    cursor.executemany(
+        spec.insert, spec.prepare(changed_rows) if spec.prepare else changed_rows
+    )
+
+    cursor.executemany(
+        "DELETE FROM omniplan_row_hashes WHERE TableName = ? AND RowKey = ?",
+        ((spec.name, key) for key in deleted),
+    )
+    cursor.executemany(
+        """
+        INSERT OR REPLACE INTO omniplan_row_hashes (TableName, RowKey, Hash)
+        VALUES (?, ?, ?)
+        """,
+        ((spec.name, key, hashes[key]) for key in inserted + updated),
+    )
+    return Delta(len(inserted), len(updated), len(deleted))
+
+
+def import_incrementally(conn, tables):
+    """
+    Incrementally imports every extracted table and commits the changes.
+
+    Of the derived tables (the task schedule, subtree rollups and resource
+    utilization, see DERIVED_BUILDS) only those whose source tables changed, or
+    which do not exist yet, are rebuilt. Indexes are created only where missing.
+
+    Everything runs in a single explicit transaction, including the DROP and
+    CREATE of tables rebuilt after a schema change, so a failure leaves the
+    previous import untouched and readers never see a half-applied one.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        tables (dict): The extracted rows keyed by table, as returned by
+        extract_operations.stream_project.
+
+    Returns:
+        dict: The Delta of each table.
+    """
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        deltas = {}
+        for table in operations.IMPORT_TABLES:
+            deltas[table] = import_table_incrementally(conn, table, tables[table])
+            logger.info(
+                f"{table}: {deltas[table].inserted} inserted, "
+                f"{deltas[table].updated} updated, {deltas[table].deleted} deleted."
+            )
+        existing = {
+            row[0]
+            for row in cursor.execute(
+                "SELECT name FROM sqlite_master WHERE type='table'"
+            )
+        }
+        for derived in DERIVED_BUILDS:
+            if (
+                any(deltas[table] != (0, 0, 0) for table in derived.sources)
+                or not set(derived.tables) <= existing
+            ):
+                derived.build(cursor)
+            else:
+                logger.info(f"{derived.build.__qualname__}: no changes, skipped.")
+        indexes.create_indexes(cursor)
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    return deltas
@@ -0,0 +1,169 @@
+import re
+from collections import namedtuple
+
+# A secondary index on an import table. columns is the SQL between the
+# parentheses of CREATE INDEX and may contain expressions. where, if given, makes
+# it a partial index over the rows matching that condition.
+Index = namedtuple("Index", ["name", "table", "columns", "where"], defaults=(None,))
+
+# The indexes behind the read queries in operations. They are built after the
+# rows are loaded (see operations.import_transaction), which is much faster than
+# maintaining them row by row.
+INDEXES = (
+    # get_sub_tasks, and get_subtree for each level of the subtree
+    Index("idx_tasks_parent_uid", "omniplan_tasks", "ParentUID"),
+    # get_tasks_by_outline
+    Index("idx_tasks_outline_milestone", "omniplan_tasks", "OutlineLevel, Milestone"),
+    # incremental imports replacing a task's attributes
+    Index(
+        "idx_extended_attributes_task_field",
+        "omniplan_task_extended_attributes",
+        "TaskUID, FieldID",
+    ),
+    # get_task_dependencies, get_transitive_predecessors, get_transitive_successors
+    # and depends_on, in both directions, and get_sub_tasks
+    Index("idx_predecessor_links_task_uid", "omniplan_predecessor_links", "TaskUID"),
+    Index(
+        "idx_predecessor_links_predecessor_uid",
+        "omniplan_predecessor_links",
+        "PredecessorUID",
+    ),
+    # get_assignments_by_uid
+    Index("idx_assignments_task_uid", "omniplan_assignments", "TaskUID"),
+    # get_descendants and get_descendant_uids, and is_descendant
+    Index(
+        "idx_task_closure_ancestor",
+        "omniplan_task_closure",
+        "AncestorUID, DescendantUID, Depth",
+    ),
+    # get_ancestor_uids and get_top_level_ancestor
+    Index(
+        "idx_task_closure_descendant",
+        "omniplan_task_closure",
+        "DescendantUID, Depth, AncestorUID",
+    ),
+    # get_jira_number, get_jira_numbers and get_subtree
+    Index(
+        "idx_task_jira_keys_task_uid",
+        "omniplan_task_jira_keys",
+        "TaskUID, JiraKey",
+    ),
+    # get_parent_task and get_task_uids_by_jira_keys, by normalized key
+    Index(
+        "idx_task_jira_keys_normalized_key",
+        "omniplan_task_jira_keys",
+        "NormalizedKey, TaskUID",
+    ),
+    # get_critical_path
+    Index(
+        "idx_task_schedule_critical",
+        "omniplan_task_schedule",
+        "EarlyStart, EarlyFinish",
+        "Critical = 1",
+    ),
+    # get_overallocated_resources
+    Index(
+        "idx_resource_utilization_overallocated",
+        "omniplan_resource_utilization",
+        "OverAllocatedSeconds",
+        "OverAllocations > 0",
+    ),
+    # incremental imports replacing a calendar's rows
+    Index(
+        "idx_calendar_weekdays_calendar_uid",
+        "omniplan_calendar_weekdays",
+        "CalendarUID",
+    ),
+    Index(
+        "idx_calendar_exceptions_calendar_uid",
+        "omniplan_calendar_exceptions",
+        "CalendarUID",
+    ),
+)
+
+
+def create_index_sql(index):
+    sql = f"CREATE INDEX IF NOT EXISTS {index.name} ON {index.table} ({index.columns})"
+    return f"{sql} WHERE {index.where}" if index.where else sql
+
+
+def create_indexes(cursor, indexes=INDEXES):
+    """
+    Creates the indexes whose table exists. Existing indexes are kept as they
+    are, not rebuilt.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        indexes (iterable): The indexes to create. Defaults to INDEXES.
+    """
+    tables, existing = set(), set()
+    for kind, name in cursor.execute(
+        "SELECT type, name FROM sqlite_master WHERE type IN ('table', 'index')"
+    ):
+        (tables if kind == "table" else existing).add(name)
+    for index in indexes:
+        if index.table in tables and index.name not in existing:
+            cursor.execute(create_index_sql(index))
+
+
+def drop_indexes(cursor, indexes=INDEXES):
+    """
+    Drops the given indexes, e.g. before rewriting most of a table.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        indexes (iterable): The indexes to drop. Defaults to INDEXES.
+    """
+    for index in indexes:
+        cursor.execute(f"DROP INDEX IF EXISTS {index.name}")
+
+
+def query_plan(cursor, sql, params=()):
+    """
+    Returns how SQLite will run a query.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        sql (str): The query.
+        params (tuple): Values for its placeholders. They only need the right
+            count, since the plan does not depend on them.
+
+    Returns:
+        list: The detail column of EXPLAIN QUERY PLAN, e.g.
+        "SEARCH omniplan_tasks USING INDEX idx_tasks_parent_uid (ParentUID=?)".
+    """
+    return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+# The name of a common table expression, e.g. "subtree" in
+# "WITH RECURSIVE subtree(UID, Depth) AS (".
+_CTE_NAME = re.compile(
+    r"(\w+)\s*(?:\([^()]*\))?\s+AS\s+(?:NOT\s+)?(?:MATERIALIZED\s+)?\(", re.IGNORECASE
+)
+
+
+def full_scans(cursor, sql, params=()):
+    """
+    Returns the tables a query reads without an index. Scans of the query's own
+    common table expressions are not counted: a recursive CTE is read row by row
+    by design, and its rows are found through the indexes. Neither are scans of
+    virtual tables such as json_each, which only walk the query's parameters.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        sql (str): The query.
+        params (tuple): Values for its placeholders.
+
+    Returns:
+        list: The SCAN steps of the query plan, empty if every table is searched
+        through an index or primary key.
+    """
+    ctes = {f"SCAN {name}" for name in _CTE_NAME.findall(sql)}
+    return [
+        detail
+        for detail in query_plan(cursor, sql, params)
+        if detail.startswith("SCAN")
+        and "USING" not in detail
+        and "VIRTUAL TABLE" not in detail
+        and detail not in ctes
+    ]
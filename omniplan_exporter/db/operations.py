@@ -1,91 +1,239 @@
 import sqlite3
+import json
 import logging
 import os
-import isodate
+from collections import namedtuple
+from contextlib import contextmanager
 from datetime import datetime
+from omniplan_exporter.db import (
+    calendars,
+    indexes,
+    reachability,
+    rollup,
+    schedule,
+    utilization,
+)
+from omniplan_exporter.model import TASK_COLUMNS_SQL, Task, TaskTable
+from omniplan_exporter.utils import decoding, fingerprint
+from omniplan_exporter.utils.conversions import normalize_jira_key
+
+
+INSERT_TASKS_SQL = """
+    INSERT INTO omniplan_tasks (
+        UID, ID, Name, OutlineLevel, Type, Priority, Start, Finish, Duration,
+        Work, ActualWork, RemainingWork, Summary, Milestone, Notes, ParentUID,
+        PercentComplete, StartEpoch, StartDay, FinishEpoch, FinishDay,
+        DurationSeconds, DurationDays, WorkSeconds, WorkDays, ActualWorkSeconds,
+        ActualWorkDays, RemainingWorkSeconds, RemainingWorkDays
+    ) VALUES (
+        ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?,
+        ?, ?, ?
+    )
+"""
+
+INSERT_RESOURCES_SQL = """
+    INSERT INTO omniplan_resources (
+        UID, ID, Name, Type, MaxUnits, CalendarUID, GroupName
+    ) VALUES (?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_ASSIGNMENTS_SQL = """
+    INSERT INTO omniplan_assignments (
+        UID, TaskUID, ResourceUID, Milestone, PercentWorkComplete, Units, Work,
+        ActualWork, RemainingWork, Start, Finish, StartEpoch, StartDay,
+        FinishEpoch, FinishDay, WorkSeconds, WorkDays, ActualWorkSeconds,
+        ActualWorkDays, RemainingWorkSeconds, RemainingWorkDays
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_CALENDARS_SQL = """
+    INSERT INTO omniplan_calendars (
+        UID, Name, IsBaseCalendar, BaseCalendarUID
+    ) VALUES (?, ?, ?, ?)
+"""
+
+INSERT_CALENDAR_WEEKDAYS_SQL = """
+    INSERT INTO omniplan_calendar_weekdays (
+        CalendarUID, DayType, DayWorking, FromTime, ToTime
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+INSERT_CALENDAR_EXCEPTIONS_SQL = """
+    INSERT INTO omniplan_calendar_exceptions (
+        CalendarUID, ExceptionUID, Name, FromDate, ToDate, DayWorking, FromTime,
+        ToTime
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+INSERT_EXTENDED_ATTRIBUTES_SQL = """
+    INSERT INTO omniplan_task_extended_attributes (TaskUID, FieldID, Value)
+    VALUES (?, ?, ?)
+"""
+
+INSERT_PREDECESSOR_LINKS_SQL = """
+    INSERT INTO omniplan_predecessor_links (TaskUID, PredecessorUID, Type, LinkLag)
+    VALUES (?, ?, ?, ?)
+"""
+
+INSERT_TASK_CLOSURE_SQL = """
+    INSERT INTO omniplan_task_closure (AncestorUID, DescendantUID, Depth)
+    VALUES (?, ?, ?)
+"""
+
+INSERT_JIRA_KEYS_SQL = """
+    INSERT INTO omniplan_task_jira_keys (TaskUID, JiraKey, NormalizedKey)
+    VALUES (?, ?, ?)
+"""
 
 
 def create_connection(db_name):
     return sqlite3.connect(db_name, detect_types=sqlite3.PARSE_DECLTYPES)
 
 
-def insert_tasks_into_db(conn, tasks):
-    cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_tasks")
-    create_tasks_table(cursor)
-    cursor.executemany(
+def create_memory_connection():
+    """
+    Opens an empty in-memory database to build an import in. The connection may
+    be handed to another thread, such as the pipelined writer, as long as one
+    thread uses it at a time.
+    """
+    return sqlite3.connect(
+        ":memory:", detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+    )
+
+
+def task_db_rows(tasks):
+    """
+    Appends the derived date and duration columns to extracted task rows.
+    """
+    return (
         (
-            """
-            INSERT INTO omniplan_tasks (
-                UID, ID, Name, OutlineLevel, Type, Priority, Start, Finish, Duration,
-                Work, ActualWork, RemainingWork, Summary, Milestone, Notes, ParentUID,
-                PercentComplete
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """
-        ),
-        tasks,
+            *task,
+            *decoding.date_columns(task[6]),
+            *decoding.date_columns(task[7]),
+            *decoding.duration_columns(task[8]),
+            *decoding.duration_columns(task[9]),
+            *decoding.duration_columns(task[10]),
+            *decoding.duration_columns(task[11]),
+        )
+        for task in tasks
     )
+
+
+def assignment_db_rows(assignments):
+    """
+    Appends the derived date and duration columns to extracted assignment rows.
+    """
+    return (
+        (
+            *assignment,
+            *decoding.date_columns(assignment[9]),
+            *decoding.date_columns(assignment[10]),
+            *decoding.duration_columns(assignment[6]),
+            *decoding.duration_columns(assignment[7]),
+            *decoding.duration_columns(assignment[8]),
+        )
+        for assignment in assignments
+    )
+
+
+# The work-day columns derived on insert, with the seconds they are counted from.
+WORK_DAY_COLUMNS = {
+    "omniplan_tasks": (
+        ("DurationDays", "DurationSeconds"),
+        ("WorkDays", "WorkSeconds"),
+        ("ActualWorkDays", "ActualWorkSeconds"),
+        ("RemainingWorkDays", "RemainingWorkSeconds"),
+    ),
+    "omniplan_assignments": (
+        ("WorkDays", "WorkSeconds"),
+        ("ActualWorkDays", "ActualWorkSeconds"),
+        ("RemainingWorkDays", "RemainingWorkSeconds"),
+    ),
+}
+
+
+def update_work_days(cursor, inserted=False):
+    """
+    Recounts the work-day columns of tasks and assignments in working days of
+    the plan's project calendar (see calendars.project_day_hours). They are
+    derived on insert in days of decoding.WORK_DAY_HOURS, so nothing is written
+    for plans with that day length if every row was just inserted. Rows kept
+    from an earlier import may have been counted in another day length, so
+    they are always recounted. Runs in the caller's transaction.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        inserted (bool): Whether every row was inserted by this import, as in a
+            full import.
+
+    Returns:
+        float: The hours per working day.
+    """
+    day_hours = calendars.project_day_hours(cursor.connection)
+    if inserted and day_hours == decoding.WORK_DAY_HOURS:
+        return day_hours
+    tables = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    for table, columns in WORK_DAY_COLUMNS.items():
+        if table not in tables:
+            continue
+        assignments = ", ".join(f"{days} = {seconds} / ?" for days, seconds in columns)
+        cursor.execute(
+            f"UPDATE {table} SET {assignments}", [day_hours * 3600] * len(columns)
+        )
+    logging.info(f"Counted work days of {day_hours:g} hours.")
+    return day_hours
+
+
+def reset_table(cursor, table):
+    """
+    Drops and recreates an import table and forgets its row hashes.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        table (str): The table key in IMPORT_TABLES (e.g., "tasks").
+    """
+    spec = IMPORT_TABLES[table]
+    cursor.execute(f"DROP TABLE IF EXISTS {spec.name}")
+    spec.create(cursor)
+    create_row_hashes_table(cursor)
+    cursor.execute("DELETE FROM omniplan_row_hashes WHERE TableName = ?", (spec.name,))
+
+
+def insert_tasks_into_db(conn, tasks):
+    cursor = conn.cursor()
+    reset_table(cursor, "tasks")
+    cursor.executemany(INSERT_TASKS_SQL, task_db_rows(tasks))
     logging.info(f"Inserted {len(tasks)} task records into the database.")
 
 
 def insert_resources_into_db(conn, resources):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_resources")
-    create_resources_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_resources (
-            UID, ID, Name, Type, MaxUnits, CalendarUID, GroupName
-        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-        """,
-        resources,
-    )
+    reset_table(cursor, "resources")
+    cursor.executemany(INSERT_RESOURCES_SQL, resources)
     logging.info(f"Inserted {len(resources)} resource records into the database.")
 
 
 def insert_assignments_into_db(conn, assignments):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_assignments")
-    create_assignments_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_assignments (
-            UID, TaskUID, ResourceUID, Milestone, PercentWorkComplete, Units, Work,
-            ActualWork, RemainingWork, Start, Finish
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """,
-        assignments,
-    )
+    reset_table(cursor, "assignments")
+    cursor.executemany(INSERT_ASSIGNMENTS_SQL, assignment_db_rows(assignments))
     logging.info(f"Inserted {len(assignments)} assignment records into the database.")
 
 
 def insert_calendars_into_db(conn, calendars):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_calendars")
-    create_calendars_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_calendars (
-            UID, Name, IsBaseCalendar, BaseCalendarUID
-        ) VALUES (?, ?, ?, ?)
-        """,
-        calendars,
-    )
+    reset_table(cursor, "calendars")
+    cursor.executemany(INSERT_CALENDARS_SQL, calendars)
     logging.info(f"Inserted {len(calendars)} calendar records into the database.")
 
 
 def insert_calendar_weekdays_into_db(conn, calendar_weekdays):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_calendar_weekdays")
-    create_calendar_weekdays_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_calendar_weekdays (
-            CalendarUID, DayType, DayWorking, FromTime, ToTime
-        ) VALUES (?, ?, ?, ?, ?)
-        """,
-        calendar_weekdays,
-    )
+    reset_table(cursor, "calendar_weekdays")
+    cursor.executemany(INSERT_CALENDAR_WEEKDAYS_SQL, calendar_weekdays)
     logging.info(
         "Inserted %d calendar weekday records into the database.",
         len(calendar_weekdays),
@@ -94,16 +242,8 @@ def insert_calendar_weekdays_into_db(conn, calendar_weekdays):
 
 def insert_calendar_exceptions_into_db(conn, calendar_exceptions):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_calendar_exceptions")
-    create_calendar_exceptions_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_calendar_exceptions (
-            CalendarUID, ExceptionUID, Name, FromDate, ToDate
-        ) VALUES (?, ?, ?, ?, ?)
-        """,
-        calendar_exceptions,
-    )
+    reset_table(cursor, "calendar_exceptions")
+    cursor.executemany(INSERT_CALENDAR_EXCEPTIONS_SQL, calendar_exceptions)
     logging.info(
         f"Inserted {len(calendar_exceptions)} calendar exception records "
         f"into the database."
@@ -112,15 +252,8 @@ def insert_calendar_exceptions_into_db(conn, calendar_exceptions):
 
 def insert_extended_attributes_into_db(conn, extended_attributes):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_task_extended_attributes")
-    create_extended_attributes_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_task_extended_attributes (TaskUID, FieldID, Value)
-        VALUES (?, ?, ?)
-        """,
-        extended_attributes,
-    )
+    reset_table(cursor, "extended_attributes")
+    cursor.executemany(INSERT_EXTENDED_ATTRIBUTES_SQL, extended_attributes)
     logging.info(
         f"Inserted {len(extended_attributes)} extended attribute records "
         f"into the database."
@@ -129,16 +262,24 @@ def insert_extended_attributes_into_db(conn, extended_attributes):
 
 def insert_predecessor_links_into_db(conn, predecessor_links):
     cursor = conn.cursor()
-    cursor.execute("DROP TABLE IF EXISTS omniplan_predecessor_links")
-    create_predecessor_links_table(cursor)
-    cursor.executemany(
-        """
-        INSERT INTO omniplan_predecessor_links (TaskUID, PredecessorUID, Type)
-        VALUES (?, ?, ?)
-        """,
-        predecessor_links,
+    reset_table(cursor, "predecessor_links")
+    cursor.executemany(INSERT_PREDECESSOR_LINKS_SQL, predecessor_links)
+
+
+def insert_task_closure_into_db(conn, task_closure):
+    cursor = conn.cursor()
+    reset_table(cursor, "task_closure")
+    cursor.executemany(INSERT_TASK_CLOSURE_SQL, task_closure)
+    logging.info(
+        f"Inserted {len(task_closure)} task closure records into the database."
     )
-    conn.commit()
+
+
+def insert_jira_keys_into_db(conn, jira_keys):
+    cursor = conn.cursor()
+    reset_table(cursor, "jira_keys")
+    cursor.executemany(INSERT_JIRA_KEYS_SQL, jira_keys)
+    logging.info(f"Inserted {len(jira_keys)} Jira key records into the database.")
 
 
 def create_tasks_table(cursor):
@@ -162,6 +303,18 @@ def create_tasks_table(cursor):
             Notes TEXT,
             ParentUID INTEGER,
             PercentComplete REAL,
+            StartEpoch INTEGER,
+            StartDay INTEGER,
+            FinishEpoch INTEGER,
+            FinishDay INTEGER,
+            DurationSeconds INTEGER,
+            DurationDays REAL,
+            WorkSeconds INTEGER,
+            WorkDays REAL,
+            ActualWorkSeconds INTEGER,
+            ActualWorkDays REAL,
+            RemainingWorkSeconds INTEGER,
+            RemainingWorkDays REAL,
             FOREIGN KEY (ParentUID) REFERENCES omniplan_tasks(UID)
         )
         """
@@ -199,6 +352,16 @@ def create_assignments_table(cursor):
             RemainingWork TEXT,
             Start DATETIME,
             Finish DATETIME,
+            StartEpoch INTEGER,
+            StartDay INTEGER,
+            FinishEpoch INTEGER,
+            FinishDay INTEGER,
+            WorkSeconds INTEGER,
+            WorkDays REAL,
+            ActualWorkSeconds INTEGER,
+            ActualWorkDays REAL,
+            RemainingWorkSeconds INTEGER,
+            RemainingWorkDays REAL,
             FOREIGN KEY (TaskUID) REFERENCES omniplan_tasks(UID),
             FOREIGN KEY (ResourceUID) REFERENCES omniplan_resources(UID)
         )
@@ -243,6 +406,9 @@ def create_calendar_exceptions_table(cursor):
             Name TEXT,
             FromDate TEXT,
             ToDate TEXT,
+            DayWorking TEXT,
+            FromTime TEXT,
+            ToTime TEXT,
             FOREIGN KEY (CalendarUID) REFERENCES omniplan_calendars(UID)
         )
         """
@@ -269,6 +435,7 @@ def create_predecessor_links_table(cursor):
             TaskUID INTEGER,
             PredecessorUID INTEGER,
             Type INTEGER,
+            LinkLag INTEGER,
             FOREIGN KEY (TaskUID) REFERENCES omniplan_tasks(UID),
             FOREIGN KEY (PredecessorUID) REFERENCES omniplan_tasks(UID)
         )
@@ -276,31 +443,769 @@ def create_predecessor_links_table(cursor):
     )
 
 
-def get_parent_task(conn, jira_task):
+def create_task_closure_table(cursor):
+    # Every (ancestor, descendant) pair of the task tree, including each task
+    # with itself at depth 0. Its indexes are in indexes.INDEXES.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_task_closure (
+            AncestorUID INTEGER,
+            DescendantUID INTEGER,
+            Depth INTEGER,
+            FOREIGN KEY (AncestorUID) REFERENCES omniplan_tasks(UID),
+            FOREIGN KEY (DescendantUID) REFERENCES omniplan_tasks(UID)
+        )
+        """
+    )
+
+
+def create_jira_keys_table(cursor):
+    # The Jira key of each task, copied from its extended attributes at import.
+    # JiraKey is the value as exported, NormalizedKey the one to look up by.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_task_jira_keys (
+            TaskUID INTEGER,
+            JiraKey TEXT,
+            NormalizedKey TEXT,
+            FOREIGN KEY (TaskUID) REFERENCES omniplan_tasks(UID)
+        )
+        """
+    )
+
+
+def create_row_hashes_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_row_hashes (
+            TableName TEXT,
+            RowKey TEXT,
+            Hash TEXT,
+            PRIMARY KEY (TableName, RowKey)
+        )
+        """
+    )
+
+
+# The version of the tables an import writes and of how the derived tables are
+# computed. Bump it with every such change: an unchanged export is imported
+# again when the last import was made with another version.
+SCHEMA_VERSION = 4
+
+
+def create_imports_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_imports (
+            ImportID INTEGER PRIMARY KEY,
+            SourcePath TEXT,
+            Size INTEGER,
+            MTimeNs INTEGER,
+            ContentHash TEXT,
+            ImportedAt TEXT,
+            SchemaVersion INTEGER
+        )
+        """
+    )
+    # Import logs written before the schema version was recorded.
+    if "SchemaVersion" not in _table_columns(cursor, "omniplan_imports"):
+        cursor.execute("ALTER TABLE omniplan_imports ADD COLUMN SchemaVersion INTEGER")
+
+
+def get_last_import(conn):
     """
-    Retrieves the parent task based on the jira_task parameter from the
-    omniplan_task_extended_attributes table.
+    Fetches the fingerprint of the export used by the last successful import.
 
     Args:
-        jira_task (str): The jira_task number to search for.
         conn (sqlite3.Connection): The SQLite database connection.
 
     Returns:
-        tuple: The parent task UID, name, notes, start date, finish date,
-        percent complete, work, and jira_task value, or None if not found.
+        Fingerprint: The size, modification time and content hash of the export,
+        or None if nothing was imported yet or the last import was made with
+        another SCHEMA_VERSION.
     """
     cursor = conn.cursor()
+    create_imports_table(cursor)
     cursor.execute(
         """
-        SELECT t.UID, t.Name, t.Notes, t.Start, t.Finish, t.PercentComplete, t.Work,
-        tea.Value
-        FROM omniplan_tasks t
-        JOIN omniplan_task_extended_attributes tea ON t.UID = tea.TaskUID
-        WHERE tea.FieldID = 188743731 AND LOWER(tea.Value) = LOWER(?)
+        SELECT Size, MTimeNs, ContentHash, SchemaVersion FROM omniplan_imports
+        ORDER BY ImportID DESC LIMIT 1
+        """
+    )
+    row = cursor.fetchone()
+    if not row or row[3] != SCHEMA_VERSION:
+        return None
+    return fingerprint.Fingerprint(*row[:3])
+
+
+def record_import(conn, source_path, source_fingerprint):
+    """
+    Records the fingerprint of a successfully imported export, with the
+    SCHEMA_VERSION it was imported with, and commits.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        source_path (str): The path to the XML export.
+        source_fingerprint (Fingerprint): The fingerprint of the export.
+
+    Returns:
+        int: The ImportID of the import.
+    """
+    cursor = conn.cursor()
+    create_imports_table(cursor)
+    cursor.execute(
+        """
+        INSERT INTO omniplan_imports
+            (SourcePath, Size, MTimeNs, ContentHash, ImportedAt, SchemaVersion)
+        VALUES (?, ?, ?, ?, ?, ?)
         """,
-        (jira_task,),
+        (
+            os.path.abspath(source_path),
+            *source_fingerprint,
+            datetime.now().isoformat(timespec="seconds"),
+            SCHEMA_VERSION,
+        ),
     )
-    result = cursor.fetchone()
+    conn.commit()
+    return cursor.lastrowid
+
+
+def update_last_import_mtime(conn, mtime_ns):
+    """
+    Updates the modification time recorded for the last import, after the export
+    was found to be touched but unchanged, so the next check is a stat call again.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        mtime_ns (int): The current modification time of the export.
+    """
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        UPDATE omniplan_imports SET MTimeNs = ?
+        WHERE ImportID = (SELECT MAX(ImportID) FROM omniplan_imports)
+        """,
+        (mtime_ns,),
+    )
+    conn.commit()
+
+
+# The tables written by an import, keyed like extract_operations.TABLES. Every
+# table is keyed by its first column: the UID, or the owning task/calendar UID.
+ImportTable = namedtuple("ImportTable", ["name", "create", "insert", "prepare"])
+
+IMPORT_TABLES = {
+    "tasks": ImportTable(
+        "omniplan_tasks", create_tasks_table, INSERT_TASKS_SQL, task_db_rows
+    ),
+    "resources": ImportTable(
+        "omniplan_resources", create_resources_table, INSERT_RESOURCES_SQL, None
+    ),
+    "assignments": ImportTable(
+        "omniplan_assignments",
+        create_assignments_table,
+        INSERT_ASSIGNMENTS_SQL,
+        assignment_db_rows,
+    ),
+    "calendars": ImportTable(
+        "omniplan_calendars", create_calendars_table, INSERT_CALENDARS_SQL, None
+    ),
+    "calendar_weekdays": ImportTable(
+        "omniplan_calendar_weekdays",
+        create_calendar_weekdays_table,
+        INSERT_CALENDAR_WEEKDAYS_SQL,
+        None,
+    ),
+    "calendar_exceptions": ImportTable(
+        "omniplan_calendar_exceptions",
+        create_calendar_exceptions_table,
+        INSERT_CALENDAR_EXCEPTIONS_SQL,
+        None,
+    ),
+    "extended_attributes": ImportTable(
+        "omniplan_task_extended_attributes",
+        create_extended_attributes_table,
+        INSERT_EXTENDED_ATTRIBUTES_SQL,
+        None,
+    ),
+    "predecessor_links": ImportTable(
+        "omniplan_predecessor_links",
+        create_predecessor_links_table,
+        INSERT_PREDECESSOR_LINKS_SQL,
+        None,
+    ),
+    "task_closure": ImportTable(
+        "omniplan_task_closure",
+        create_task_closure_table,
+        INSERT_TASK_CLOSURE_SQL,
+        None,
+    ),
+    "jira_keys": ImportTable(
+        "omniplan_task_jira_keys",
+        create_jira_keys_table,
+        INSERT_JIRA_KEYS_SQL,
+        None,
+    ),
+}
+
+
+# Connection settings used while bulk loading, and restored afterwards.
+# journal_mode is a property of the database file and stays WAL.
+BULK_LOAD_PRAGMAS = (
+    ("journal_mode", "WAL"),
+    ("synchronous", "NORMAL"),
+    ("cache_size", -262144),
+    ("temp_store", "MEMORY"),
+)
+
+
+@contextmanager
+def import_transaction(conn, bulk=False):
+    """
+    Runs a full import in a single transaction, so a failure leaves the previous
+    import untouched. The import indexes are built once the rows are in.
+
+    In bulk mode the database is switched to WAL, synchronous is relaxed and the
+    page cache enlarged while loading. Afterwards the tables are analyzed and the
+    WAL is checkpointed, and the connection settings are restored.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        bulk (bool): Whether to use bulk-load mode.
+
+    Yields:
+        sqlite3.Cursor: The cursor to load the rows with.
+    """
+    previous = {}
+    if bulk:
+        for name, value in BULK_LOAD_PRAGMAS:
+            if name != "journal_mode":
+                previous[name] = conn.execute(f"PRAGMA {name}").fetchone()[0]
+            conn.execute(f"PRAGMA {name} = {value}")
+    cursor = conn.cursor()
+    try:
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        yield cursor
+        update_work_days(cursor, inserted=True)
+        schedule.build_schedule(cursor)
+        reachability.build_dependency_labels(cursor)
+        rollup.build_rollup(cursor)
+        utilization.build_utilization(cursor)
+        indexes.create_indexes(cursor)
+        if bulk:
+            cursor.execute("ANALYZE")
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        for name, value in previous.items():
+            conn.execute(f"PRAGMA {name} = {value}")
+    if bulk:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+
+
+def history_table(name):
+    """
+    Returns the name of the snapshot history table of an import table (see
+    omniplan_exporter.db.snapshots), e.g. omniplan_tasks_history.
+    """
+    return f"{name}_history"
+
+
+def _table_columns(cursor, name):
+    return [row[1] for row in cursor.execute(f"PRAGMA main.table_info({name})")]
+
+
+@contextmanager
+def snapshot_view(conn, snapshot_id):
+    """
+    Makes the import tables read as they were at a snapshot (see
+    omniplan_exporter.db.snapshots) for the queries run on conn in the with
+    block.
+
+    Every import table is shadowed by a temporary view of the same name over
+    its history table, so the query helpers run unchanged and still search the
+    history through indexes. Tables without history read as empty. The views are
+    only created in the temp schema, so read-only connections can use them too.
+    Views cannot be nested.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        snapshot_id (int): The snapshot, i.e. the ImportID of the import that
+            recorded it. The later of two snapshots wins for imports in between.
+            None leaves the current import in place.
+
+    Yields:
+        sqlite3.Connection: The connection.
+    """
+    if snapshot_id is None:
+        yield conn
+        return
+    snapshot_id = int(snapshot_id)
+    cursor = conn.cursor()
+    existing = {
+        row[0]
+        for row in cursor.execute(
+            "SELECT name FROM main.sqlite_master WHERE type='table'"
+        )
+    }
+    query_only = cursor.execute("PRAGMA query_only").fetchone()[0]
+    views = []
+    cursor.execute("PRAGMA query_only = OFF")
+    try:
+        for spec in IMPORT_TABLES.values():
+            if spec.name not in existing:
+                continue
+            history = history_table(spec.name)
+            if history in existing:
+                recorded = set(_table_columns(cursor, history))
+                source = (
+                    f"main.{history} WHERE ValidFrom <= {snapshot_id} "
+                    f"AND (ValidTo IS NULL OR ValidTo > {snapshot_id})"
+                )
+            else:
+                recorded = None
+                source = f"main.{spec.name} WHERE 0"
+            columns = ", ".join(
+                column if recorded is None or column in recorded else "NULL"
+                for column in _table_columns(cursor, spec.name)
+            )
+            cursor.execute(
+                f"CREATE TEMP VIEW {spec.name} AS SELECT {columns} FROM {source}"
+            )
+            views.append(spec.name)
+        cursor.execute(f"PRAGMA query_only = {query_only}")
+        yield conn
+    finally:
+        cursor.execute("PRAGMA query_only = OFF")
+        for name in views:
+            cursor.execute(f"DROP VIEW temp.{name}")
+        cursor.execute(f"PRAGMA query_only = {query_only}")
+
+
+# The task found by get_parent_task, with Start and Finish reduced to dates.
+ParentTask = namedtuple(
+    "ParentTask",
+    [
+        "uid",
+        "name",
+        "notes",
+        "start_date",
+        "finish_date",
+        "percent_complete",
+        "work",
+        "jira_task",
+        "work_days",
+    ],
+)
+
+# A direct child of a task, as returned by get_sub_tasks.
+SubTask = namedtuple(
+    "SubTask",
+    ["uid", "name", "milestone", "outline_level", "start", "percent_complete"],
+)
+
+# A task of a subtree, as returned by get_subtree. depth is 0 for the root,
+# jira_key its Jira number (None if it has none) and assignments a list of
+# (resource name, units) tuples.
+SubtreeTask = namedtuple(
+    "SubtreeTask",
+    [
+        "uid",
+        "parent_uid",
+        "depth",
+        "name",
+        "outline_level",
+        "milestone",
+        "summary",
+        "start",
+        "finish",
+        "work",
+        "work_days",
+        "percent_complete",
+        "jira_key",
+        "assignments",
+    ],
+)
+
+# The critical path analysis of a task, as returned by get_task_schedules. Times
+# and floats are in working seconds from the start of the project (see
+# omniplan_exporter.db.schedule); float days count working days of the project
+# calendar.
+TaskSchedule = namedtuple(
+    "TaskSchedule",
+    [
+        "uid",
+        "early_start",
+        "early_finish",
+        "late_start",
+        "late_finish",
+        "total_float",
+        "free_float",
+        "total_float_days",
+        "free_float_days",
+        "critical",
+    ],
+)
+
+# A task another task depends on, or that depends on it, as returned by
+# get_transitive_predecessors and get_transitive_successors. direct is 1 if the
+# two tasks are linked by a predecessor link, 0 if only through other tasks.
+Dependency = namedtuple("Dependency", ["uid", "name", "milestone", "direct"])
+
+# The totals of a task's subtree, as returned by get_task_rollups (see
+# omniplan_exporter.db.rollup). Work is summed over the leaf tasks, in seconds
+# and working days of the project calendar, and percent complete is weighted by
+# work.
+TaskRollup = namedtuple(
+    "TaskRollup",
+    [
+        "uid",
+        "work_seconds",
+        "actual_work_seconds",
+        "remaining_work_seconds",
+        "work_days",
+        "actual_work_days",
+        "remaining_work_days",
+        "percent_complete",
+        "start",
+        "finish",
+        "descendants",
+        "leaf_descendants",
+    ],
+)
+
+# The utilization of a resource, as returned by get_overallocated_resources (see
+# omniplan_exporter.db.utilization). Times are seconds since 1970-01-01 in the
+# plan's own time, overallocated_minutes working minutes in the resource's
+# calendar and overallocations the number of over-allocated stretches.
+ResourceUtilization = namedtuple(
+    "ResourceUtilization",
+    [
+        "uid",
+        "name",
+        "max_units",
+        "peak_units",
+        "peak_start",
+        "loaded_seconds",
+        "overallocated_seconds",
+        "overallocated_minutes",
+        "overallocations",
+    ],
+)
+
+# The lookups run by the functions below. Each is served by one of
+# indexes.INDEXES or a primary key, see INDEXED_QUERIES.
+SELECT_PARENT_TASK_SQL = """
+    SELECT t.UID, t.Name, t.Notes, t.Start, t.Finish, t.PercentComplete, t.Work,
+    k.JiraKey, t.WorkDays
+    FROM omniplan_tasks t
+    JOIN omniplan_task_jira_keys k ON t.UID = k.TaskUID
+    WHERE k.NormalizedKey = ?
+    ORDER BY k.TaskUID
+    LIMIT 1
+"""
+
+SELECT_SUB_TASKS_SQL = """
+    SELECT UID, Name, Milestone, OutlineLevel, Start, PercentComplete
+    FROM omniplan_tasks
+    WHERE ParentUID = ?
+"""
+
+SELECT_PREDECESSOR_LINKS_SQL = """
+    SELECT PredecessorUID, Type FROM omniplan_predecessor_links WHERE TaskUID = ?
+"""
+
+SELECT_TASKS_BY_OUTLINE_SQL = f"""
+    SELECT {TASK_COLUMNS_SQL}
+    FROM omniplan_tasks
+    WHERE OutlineLevel=? AND Milestone=?
+"""
+
+SELECT_TASKS_BY_OUTLINE_AND_PARENTS_SQL = f"""
+    {SELECT_TASKS_BY_OUTLINE_SQL}
+    AND ParentUID IN (SELECT value FROM json_each(?))
+"""
+
+SELECT_PREDECESSORS_SQL = """
+    SELECT t.Name
+    FROM omniplan_tasks t
+    JOIN omniplan_predecessor_links d ON t.UID = d.PredecessorUID
+    WHERE d.TaskUID = ?
+"""
+
+SELECT_SUCCESSORS_SQL = """
+    SELECT t.Name
+    FROM omniplan_tasks t
+    JOIN omniplan_predecessor_links d ON t.UID = d.TaskUID
+    WHERE d.PredecessorUID = ?
+"""
+
+# A task and all of its descendants in depth-first order, children by UID. Path
+# is the chain of zero-padded UIDs from the root, so sorting on it puts every
+# task right after its parent. A task has one row per assignment.
+SELECT_SUBTREE_SQL = """
+    WITH RECURSIVE subtree(UID, Depth, Path) AS (
+        SELECT UID, 0, printf('%010d', UID) FROM omniplan_tasks WHERE UID = ?
+        UNION ALL
+        SELECT t.UID, subtree.Depth + 1, subtree.Path || printf('%010d', t.UID)
+        FROM omniplan_tasks t
+        JOIN subtree ON t.ParentUID = subtree.UID
+    )
+    SELECT t.UID, t.ParentUID, subtree.Depth, t.Name, t.OutlineLevel, t.Milestone,
+    t.Summary, t.Start, t.Finish, t.Work, t.WorkDays, t.PercentComplete,
+    (SELECT JiraKey FROM omniplan_task_jira_keys WHERE TaskUID = t.UID),
+    r.UID, r.Name, a.Units
+    FROM subtree
+    JOIN omniplan_tasks t ON t.UID = subtree.UID
+    LEFT JOIN omniplan_assignments a ON a.TaskUID = t.UID
+    LEFT JOIN omniplan_resources r ON r.UID = a.ResourceUID
+    ORDER BY subtree.Path, a.UID
+"""
+
+SELECT_JIRA_NUMBER_SQL = """
+    SELECT JiraKey FROM omniplan_task_jira_keys WHERE TaskUID = ?
+"""
+
+# The bulk lookups take their keys as one JSON array, so any number of them is
+# resolved by a single query.
+SELECT_JIRA_NUMBERS_SQL = """
+    SELECT k.TaskUID, k.JiraKey
+    FROM json_each(?) j
+    JOIN omniplan_task_jira_keys k ON k.TaskUID = j.value
+"""
+
+SELECT_TASK_UIDS_BY_JIRA_KEYS_SQL = """
+    SELECT k.NormalizedKey, MIN(k.TaskUID)
+    FROM json_each(?) j
+    JOIN omniplan_task_jira_keys k ON k.NormalizedKey = j.value
+    GROUP BY k.NormalizedKey
+"""
+
+SELECT_WORK_SECONDS_SQL = """
+    SELECT t.UID, t.WorkSeconds, t.ActualWorkSeconds
+    FROM json_each(?) j
+    JOIN omniplan_tasks t ON t.UID = j.value
+"""
+
+SELECT_TASK_SCHEDULES_SQL = """
+    SELECT s.TaskUID, s.EarlyStart, s.EarlyFinish, s.LateStart, s.LateFinish,
+    s.TotalFloat, s.FreeFloat, s.TotalFloatDays, s.FreeFloatDays, s.Critical
+    FROM json_each(?) j
+    JOIN omniplan_task_schedule s ON s.TaskUID = j.value
+"""
+
+# The transitive dependencies are walked through the links on demand: the
+# recursive CTEs follow idx_predecessor_links_task_uid or
+# idx_predecessor_links_predecessor_uid one link at a time, and UNION drops the
+# pairs already reached, so dependency cycles end the walk.
+SELECT_TRANSITIVE_PREDECESSORS_SQL = """
+    WITH RECURSIVE reached(TaskUID, UID) AS (
+        SELECT l.TaskUID, l.PredecessorUID
+        FROM json_each(?) j
+        JOIN omniplan_predecessor_links l ON l.TaskUID = j.value
+        UNION
+        SELECT reached.TaskUID, l.PredecessorUID
+        FROM reached
+        JOIN omniplan_predecessor_links l ON l.TaskUID = reached.UID
+    )
+    SELECT reached.TaskUID, t.UID, t.Name, t.Milestone, EXISTS (
+        SELECT 1 FROM omniplan_predecessor_links d
+        WHERE d.TaskUID = reached.TaskUID AND d.PredecessorUID = reached.UID
+    )
+    FROM reached
+    JOIN omniplan_tasks t ON t.UID = reached.UID
+    WHERE reached.UID != reached.TaskUID
+    ORDER BY reached.TaskUID, reached.UID
+"""
+
+SELECT_TRANSITIVE_SUCCESSORS_SQL = """
+    WITH RECURSIVE reached(PredecessorUID, UID) AS (
+        SELECT l.PredecessorUID, l.TaskUID
+        FROM json_each(?) j
+        JOIN omniplan_predecessor_links l ON l.PredecessorUID = j.value
+        UNION
+        SELECT reached.PredecessorUID, l.TaskUID
+        FROM reached
+        JOIN omniplan_predecessor_links l ON l.PredecessorUID = reached.UID
+    )
+    SELECT reached.PredecessorUID, t.UID, t.Name, t.Milestone, EXISTS (
+        SELECT 1 FROM omniplan_predecessor_links d
+        WHERE d.PredecessorUID = reached.PredecessorUID AND d.TaskUID = reached.UID
+    )
+    FROM reached
+    JOIN omniplan_tasks t ON t.UID = reached.UID
+    WHERE reached.UID != reached.PredecessorUID
+    ORDER BY reached.PredecessorUID, reached.UID
+"""
+
+SELECT_DEPENDENCY_LABELS_SQL = """
+    SELECT TaskUID, Post, TreeLow, Low, Cyclic
+    FROM omniplan_dependency_labels
+    WHERE TaskUID IN (?, ?)
+"""
+
+# For the pairs the labels cannot decide (see reachability.reaches): a walk from
+# the predecessor (?1) towards the component of the task (ranked ?2) that only
+# enters tasks whose labels still allow reaching it. Ranks fall along every
+# link, so taking the lowest ranked task first heads straight for the target,
+# and the walk runs as a coroutine that stops as soon as it gets there.
+SELECT_DEPENDS_ON_SQL = """
+    WITH RECURSIVE reached(UID, Post) AS (
+        SELECT TaskUID, Post FROM omniplan_dependency_labels WHERE TaskUID = ?1
+        UNION
+        SELECT l.TaskUID, d.Post
+        FROM reached
+        JOIN omniplan_predecessor_links l ON l.PredecessorUID = reached.UID
+        JOIN omniplan_dependency_labels d ON d.TaskUID = l.TaskUID
+        WHERE d.Low <= ?2 AND ?2 <= d.Post
+        ORDER BY 2
+    )
+    SELECT 1 FROM reached WHERE Post = ?2 LIMIT 1
+"""
+
+SELECT_TASK_ROLLUPS_SQL = """
+    SELECT r.TaskUID, r.WorkSeconds, r.ActualWorkSeconds, r.RemainingWorkSeconds,
+    r.WorkDays, r.ActualWorkDays, r.RemainingWorkDays, r.PercentComplete, r.Start,
+    r.Finish, r.Descendants, r.LeafDescendants
+    FROM json_each(?) j
+    JOIN omniplan_task_rollup r ON r.TaskUID = j.value
+"""
+
+SELECT_CRITICAL_PATH_SQL = """
+    SELECT s.TaskUID, t.Name, s.EarlyStart, s.EarlyFinish
+    FROM omniplan_task_schedule s
+    JOIN omniplan_tasks t ON t.UID = s.TaskUID
+    WHERE s.Critical = 1
+    ORDER BY s.EarlyStart, s.EarlyFinish
+"""
+
+SELECT_OVERALLOCATED_RESOURCES_SQL = """
+    SELECT u.ResourceUID, r.Name, u.MaxUnits, u.PeakUnits, u.PeakStartEpoch,
+    u.LoadedSeconds, u.OverAllocatedSeconds, u.OverAllocatedMinutes,
+    u.OverAllocations
+    FROM omniplan_resource_utilization u
+    JOIN omniplan_resources r ON r.UID = u.ResourceUID
+    WHERE u.OverAllocations > 0
+    ORDER BY u.OverAllocatedSeconds DESC
+"""
+
+SELECT_OVERALLOCATIONS_SQL = """
+    SELECT StartEpoch, FinishEpoch, PeakUnits, WorkingMinutes
+    FROM omniplan_resource_overallocations
+    WHERE ResourceUID = ?
+    ORDER BY StartEpoch
+"""
+
+SELECT_RESOURCE_LOAD_SQL = """
+    SELECT StartEpoch, FinishEpoch, Units
+    FROM omniplan_resource_load
+    WHERE ResourceUID = ?
+    ORDER BY StartEpoch
+"""
+
+SELECT_ASSIGNMENTS_SQL = """
+    SELECT a.ResourceUID, a.Units, r.Name
+    FROM omniplan_assignments a
+    JOIN omniplan_resources r ON a.ResourceUID = r.UID
+    WHERE a.TaskUID = ?
+"""
+
+SELECT_TASK_NAME_SQL = "SELECT Name FROM omniplan_tasks WHERE UID = ?"
+
+SELECT_DESCENDANTS_SQL = f"""
+    SELECT {TASK_COLUMNS_SQL}
+    FROM omniplan_task_closure c
+    JOIN omniplan_tasks t ON t.UID = c.DescendantUID
+    WHERE c.AncestorUID = ? AND c.Depth BETWEEN 1 AND ?
+    ORDER BY c.DescendantUID
+"""
+
+SELECT_DESCENDANT_UIDS_SQL = """
+    SELECT DescendantUID
+    FROM omniplan_task_closure
+    WHERE AncestorUID = ? AND Depth BETWEEN 1 AND ?
+    ORDER BY DescendantUID
+"""
+
+SELECT_ANCESTOR_UIDS_SQL = """
+    SELECT AncestorUID
+    FROM omniplan_task_closure
+    WHERE DescendantUID = ? AND Depth > 0
+    ORDER BY Depth
+"""
+
+SELECT_TOP_LEVEL_ANCESTOR_SQL = """
+    SELECT AncestorUID
+    FROM omniplan_task_closure
+    WHERE DescendantUID = ?
+    ORDER BY Depth DESC
+    LIMIT 1
+"""
+
+SELECT_IS_DESCENDANT_SQL = """
+    SELECT 1
+    FROM omniplan_task_closure
+    WHERE AncestorUID = ? AND DescendantUID = ? AND Depth > 0
+"""
+
+# Every lookup above with the number of its parameters. None of them may scan a
+# table, which the tests check with indexes.full_scans.
+INDEXED_QUERIES = (
+    (SELECT_PARENT_TASK_SQL, 1),
+    (SELECT_SUB_TASKS_SQL, 1),
+    (SELECT_PREDECESSOR_LINKS_SQL, 1),
+    (SELECT_TASKS_BY_OUTLINE_SQL, 2),
+    (SELECT_TASKS_BY_OUTLINE_AND_PARENTS_SQL, 3),
+    (SELECT_PREDECESSORS_SQL, 1),
+    (SELECT_SUCCESSORS_SQL, 1),
+    (SELECT_SUBTREE_SQL, 1),
+    (SELECT_JIRA_NUMBER_SQL, 1),
+    (SELECT_JIRA_NUMBERS_SQL, 1),
+    (SELECT_TASK_UIDS_BY_JIRA_KEYS_SQL, 1),
+    (SELECT_WORK_SECONDS_SQL, 1),
+    (SELECT_TASK_SCHEDULES_SQL, 1),
+    (SELECT_TRANSITIVE_PREDECESSORS_SQL, 1),
+    (SELECT_TRANSITIVE_SUCCESSORS_SQL, 1),
+    (SELECT_DEPENDENCY_LABELS_SQL, 2),
+    (SELECT_DEPENDS_ON_SQL, 2),
+    (SELECT_TASK_ROLLUPS_SQL, 1),
+    (SELECT_CRITICAL_PATH_SQL, 0),
+    (SELECT_OVERALLOCATED_RESOURCES_SQL, 0),
+    (SELECT_OVERALLOCATIONS_SQL, 1),
+    (SELECT_RESOURCE_LOAD_SQL, 1),
+    (SELECT_ASSIGNMENTS_SQL, 1),
+    (SELECT_TASK_NAME_SQL, 1),
+    (SELECT_DESCENDANTS_SQL, 2),
+    (SELECT_DESCENDANT_UIDS_SQL, 2),
+    (SELECT_ANCESTOR_UIDS_SQL, 1),
+    (SELECT_TOP_LEVEL_ANCESTOR_SQL, 1),
+    (SELECT_IS_DESCENDANT_SQL, 2),
+)
+
+
+def get_parent_task(conn, jira_task, as_of=None):
+    """
+    Retrieves the parent task based on the jira_task parameter, matched
+    case-insensitively against the Jira keys of the tasks.
+
+    Args:
+        jira_task (str): The jira_task number to search for.
+        conn (sqlite3.Connection): The SQLite database connection.
+        as_of (int, optional): Read the task as it was at this snapshot (see
+            snapshot_view). Defaults to the current import.
+
+    Returns:
+        ParentTask: The parent task UID, name, notes, start date, finish date,
+        percent complete, work, jira_task value and work in working days, or
+        None if not found.
+    """
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        cursor.execute(SELECT_PARENT_TASK_SQL, (normalize_jira_key(jira_task),))
+        result = cursor.fetchone()
     if result:
         (
             uid,
@@ -311,13 +1216,11 @@ def get_parent_task(conn, jira_task):
             percent_complete,
             work,
             jira_task_value,
+            work_days,
         ) = result
-        try:
-            start_date = datetime.fromisoformat(start).date() if start else "N/A"
-        except ValueError:
-            start_date = "N/A"
-        finish_date = datetime.fromisoformat(finish).date() if finish else "N/A"
-        return (
+        start_date = decoding.to_date(start)
+        finish_date = decoding.to_date(finish)
+        return ParentTask(
             uid,
             name,
             notes,
@@ -326,6 +1229,7 @@ def get_parent_task(conn, jira_task):
             percent_complete,
             work,
             jira_task_value,
+            work_days,
         )
     return None
 
@@ -339,26 +1243,14 @@ def get_sub_tasks(conn, parent_uid):
         conn (sqlite3.Connection): The SQLite database connection.
 
     Returns:
-        list: A list of sub-tasks.
+        tuple: A list of SubTask records and the predecessor links of the parent.
     """
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT UID, Name, Milestone, OutlineLevel, Start, PercentComplete
-        FROM omniplan_tasks
-        WHERE ParentUID = ?
-        """,
-        (parent_uid,),
-    )
-    sub_tasks = cursor.fetchall()
+    cursor.execute(SELECT_SUB_TASKS_SQL, (parent_uid,))
+    sub_tasks = [SubTask._make(row) for row in cursor.fetchall()]
 
     # Retrieve predecessor links
-    cursor.execute(
-        """
-        SELECT PredecessorUID, Type FROM omniplan_predecessor_links WHERE TaskUID = ?
-        """,
-        (parent_uid,),
-    )
+    cursor.execute(SELECT_PREDECESSOR_LINKS_SQL, (parent_uid,))
     predecessor_links = cursor.fetchall()
 
     return sub_tasks, predecessor_links
@@ -377,6 +1269,53 @@ def write_report_header(report_file, jira_task, task_name, parent_note):
     report_file.write("DoD:\n")
 
 
+def get_subtree(conn, task_uid, as_of=None):
+    """
+    Retrieves a task and all of its descendants with a single recursive query.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the root task.
+        as_of (int, optional): Read the subtree as it was at this snapshot (see
+            snapshot_view). Defaults to the current import.
+
+    Returns:
+        list: SubtreeTask records in depth-first order, the root first and the
+        children of a task ordered by UID. Empty if the task does not exist.
+    """
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        cursor.execute(SELECT_SUBTREE_SQL, (task_uid,))
+        rows = cursor.fetchall()
+    subtree = []
+    uid = None
+    for row in rows:
+        # A task with several assignments comes in consecutive rows.
+        if row[0] != uid:
+            uid = row[0]
+            assignments = []
+            subtree.append(SubtreeTask._make(row[:13] + (assignments,)))
+        if row[13] is not None:
+            assignments.append(row[14:])
+    return subtree
+
+
+def subtree_children(subtree):
+    """
+    Groups the tasks of a subtree by parent.
+
+    Args:
+        subtree (list): SubtreeTask records, as returned by get_subtree.
+
+    Returns:
+        dict: The children of each task, in subtree order, keyed by its UID.
+    """
+    children = {}
+    for task in subtree[1:]:
+        children.setdefault(task.parent_uid, []).append(task)
+    return children
+
+
 def write_subtasks(cursor, report_file, parent_uid, level):
     """
     Writes the sub-tasks to the report file.
@@ -387,31 +1326,27 @@ def write_subtasks(cursor, report_file, parent_uid, level):
         parent_uid (int): The UID of the parent task.
         level (int): The current outline level.
     """
-    cursor.execute(
-        """
-        SELECT UID, Name, Milestone, OutlineLevel, Start FROM omniplan_tasks WHERE
-        ParentUID = ?
-        """,
-        (parent_uid,),
-    )
-    sub_tasks = cursor.fetchall()
+    subtree = get_subtree(cursor.connection, parent_uid)
+    if subtree:
+        _write_subtasks(report_file, subtree_children(subtree), subtree[0].uid)
+
+
+def _write_subtasks(report_file, children, parent_uid):
+    sub_tasks = children.get(parent_uid)
 
     if sub_tasks:
         milestones = []
         for sub_task in sub_tasks:
-            uid, name, milestone, outline_level, start = sub_task
-            if milestone:
+            if sub_task.milestone:
                 # Only use the date part of start_date
-                try:
-                    start_date = (
-                        datetime.fromisoformat(start).date() if start else "N/A"
-                    )
-                except ValueError:
-                    start_date = "N/A"
-                milestones.append((name, start_date, outline_level))
+                start_date = decoding.to_date(sub_task.start)
+                milestones.append((sub_task.name, start_date, sub_task.outline_level))
             else:
-                report_file.write(f"{'    ' * (outline_level - 1)}- oppgave: {name}\n")
-                write_subtasks(cursor, report_file, uid, level + 1)
+                report_file.write(
+                    f"{'    ' * (sub_task.outline_level - 1)}- oppgave: "
+                    f"{sub_task.name}\n"
+                )
+                _write_subtasks(report_file, children, sub_task.uid)
 
         for milestone, start_date, outline_level in milestones:
             report_file.write(
@@ -427,7 +1362,9 @@ def create_report_directory():
     os.makedirs("resources/reports", exist_ok=True)
 
 
-def get_tasks_by_outline(conn, outline_level, milestone=0):
+def get_tasks_by_outline(
+    conn, outline_level, milestone=0, as_of=None, parent_uids=None
+):
     """
     Retrieves tasks with the specified OutlineLevel and optional Milestone.
 
@@ -435,21 +1372,58 @@ def get_tasks_by_outline(conn, outline_level, milestone=0):
         conn (sqlite3.Connection): The SQLite database connection.
         outline_level (int): The outline level of the tasks.
         milestone (int, optional): The milestone status of the tasks. Defaults to 0.
+        as_of (int, optional): Read the tasks as they were at this snapshot (see
+            snapshot_view). Defaults to the current import.
+        parent_uids (iterable, optional): Only return the tasks directly under
+            these parents. Defaults to tasks under any parent.
+
+    Returns:
+        list: The matching tasks as Task records.
+    """
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        if parent_uids is None:
+            cursor.execute(SELECT_TASKS_BY_OUTLINE_SQL, (outline_level, milestone))
+        else:
+            cursor.execute(
+                SELECT_TASKS_BY_OUTLINE_AND_PARENTS_SQL,
+                (outline_level, milestone, json.dumps(list(parent_uids))),
+            )
+        return [Task._make(row) for row in cursor]
+
+
+def get_tasks(conn, as_of=None):
+    """
+    Retrieves every task, ordered by UID.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        as_of (int, optional): Read the tasks as they were at this snapshot (see
+            snapshot_view). Defaults to the current import.
 
     Returns:
-        list: A list of tuples containing the task UID, name, finish date, start date,
-        work, actual work, and parent UID.
+        list: The tasks as Task records.
+    """
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {TASK_COLUMNS_SQL} FROM omniplan_tasks ORDER BY UID")
+        return [Task._make(row) for row in cursor]
+
+
+def read_task_table(conn):
+    """
+    Reads every task into a columnar TaskTable, ordered by UID. Rows are appended
+    as they are fetched, so the full result is never held as tuples.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+        TaskTable: The tasks.
     """
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT UID, Name, Finish, Start, Work, ActualWork, ParentUID
-        FROM omniplan_tasks
-        WHERE OutlineLevel=? AND Milestone=?
-        """,
-        (outline_level, milestone),
-    )
-    return cursor.fetchall()
+    cursor.execute(f"SELECT {TASK_COLUMNS_SQL} FROM omniplan_tasks ORDER BY UID")
+    return TaskTable.from_tasks(cursor)
 
 
 logger = logging.getLogger(__name__)
@@ -459,19 +1433,9 @@ def get_task_dependencies(conn, milestone_id, dependency_type):
     cursor = conn.cursor()
     try:
         if dependency_type == "predecessor":
-            query = """
-                SELECT t.Name
-                FROM omniplan_tasks t
-                JOIN omniplan_predecessor_links d ON t.UID = d.PredecessorUID
-                WHERE d.TaskUID = ?
-            """
+            query = SELECT_PREDECESSORS_SQL
         elif dependency_type == "successor":
-            query = """
-                SELECT t.Name
-                FROM omniplan_tasks t
-                JOIN omniplan_predecessor_links d ON t.UID = d.TaskUID
-                WHERE d.PredecessorUID = ?
-            """
+            query = SELECT_SUCCESSORS_SQL
         else:
             logger.warning(
                 "Invalid dependency_type. Must be 'predecessor' or 'successor'."
@@ -486,6 +1450,85 @@ def get_task_dependencies(conn, milestone_id, dependency_type):
         return []
 
 
+def _dependencies_by_task(cursor):
+    dependencies = {}
+    for task_uid, *row in cursor:
+        dependencies.setdefault(task_uid, []).append(Dependency._make(row))
+    return dependencies
+
+
+def get_transitive_predecessors(conn, task_uids):
+    """
+    Retrieves everything many tasks ultimately depend on, in a single query:
+    their predecessors, the predecessors of those, and so on.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uids (iterable): The UIDs of the tasks.
+
+    Returns:
+        dict: The Dependency records of each task by UID, keyed by task UID.
+        Tasks without predecessors are left out.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TRANSITIVE_PREDECESSORS_SQL, (json.dumps(list(task_uids)),))
+    return _dependencies_by_task(cursor)
+
+
+def get_transitive_successors(conn, task_uids):
+    """
+    Retrieves everything many tasks ultimately unblock, in a single query: their
+    successors, the successors of those, and so on.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uids (iterable): The UIDs of the tasks.
+
+    Returns:
+        dict: The Dependency records of each task by UID, keyed by task UID.
+        Tasks without successors are left out.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TRANSITIVE_SUCCESSORS_SQL, (json.dumps(list(task_uids)),))
+    return _dependencies_by_task(cursor)
+
+
+def depends_on(conn, task_uid, predecessor_uid):
+    """
+    Tells whether a task depends on another, directly or through other tasks.
+
+    Most pairs are decided from the reachability labels of the two tasks, a
+    primary-key lookup (see reachability.dependency_labels). Otherwise the links
+    are walked from the predecessor, only through the tasks whose labels still
+    allow reaching the dependent task.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the dependent task.
+        predecessor_uid (int): The UID of the task it may depend on.
+
+    Returns:
+        bool: True if task_uid cannot start or finish before predecessor_uid
+        allows it.
+    """
+    if task_uid == predecessor_uid:
+        return False
+    cursor = conn.cursor()
+    labels = {
+        uid: labels
+        for uid, *labels in cursor.execute(
+            SELECT_DEPENDENCY_LABELS_SQL, (task_uid, predecessor_uid)
+        )
+    }
+    if task_uid not in labels or predecessor_uid not in labels:
+        return False
+    reached = reachability.reaches(labels[predecessor_uid], labels[task_uid])
+    if reached is not None:
+        return reached
+    cursor.execute(SELECT_DEPENDS_ON_SQL, (predecessor_uid, labels[task_uid][0]))
+    return cursor.fetchone() is not None
+
+
 def get_sub_tasks_and_assignments(conn, task_uid):
     """
     Retrieves sub-tasks and assignments for the parent-task.
@@ -497,75 +1540,236 @@ def get_sub_tasks_and_assignments(conn, task_uid):
     Returns:
         list: A list of sub-tasks and assignments.
     """
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT UID, Name, Work, PercentComplete, Start, Finish, Summary
-        FROM omniplan_tasks
-        WHERE ParentUID = ?
-        """,
-        (task_uid,),
-    )
-    sub_tasks = cursor.fetchall()
-
-    all_sub_tasks = []
-    for sub_task in sub_tasks:
-        uid, name, work, percent_complete, start, finish, summary = sub_task
-        if not summary:
-            work_days = convert_to_work_days(work)
-            start_date = datetime.fromisoformat(start).date() if start else "N/A"
-            finish_date = datetime.fromisoformat(finish).date() if finish else "N/A"
-            all_sub_tasks.append(
-                (uid, name, work_days, percent_complete, start_date, finish_date)
-            )
-        all_sub_tasks.extend(get_sub_tasks_and_assignments(conn, uid))
-
-    return all_sub_tasks
+    return [
+        (
+            sub_task.uid,
+            sub_task.name,
+            format_work_days(sub_task.work_days),
+            sub_task.percent_complete,
+            decoding.to_date(sub_task.start),
+            decoding.to_date(sub_task.finish),
+        )
+        for sub_task in get_subtree(conn, task_uid)[1:]
+        if not sub_task.summary
+    ]
 
 
-def convert_to_work_days(duration):
+def convert_to_work_days(duration, calendar=None):
     """
-    Converts duration to number of 7.5 hours working days.
+    Converts duration to number of working days.
 
     Args:
         duration (str): The duration string.
+        calendar (WorkingCalendar, optional): The calendar whose average working
+            day to count in (see omniplan_exporter.db.calendars). Defaults to
+            working days of decoding.WORK_DAY_HOURS.
 
     Returns:
         int: The number of working days.
     """
-    if not duration:
-        return "N/A"
-    try:
-        duration_timedelta = isodate.parse_duration(duration)
-        return round(duration_timedelta.total_seconds() / (7.5 * 3600))
-    except (isodate.ISO8601Error, TypeError):
-        return "N/A"
+    seconds, work_days = decoding.duration_columns(duration)
+    if calendar is not None and calendar.day_hours and seconds is not None:
+        work_days = seconds / (calendar.day_hours * 3600)
+    return format_work_days(work_days)
 
 
-def get_jira_number(conn, task_uid):
+def format_work_days(work_days):
+    """
+    Rounds a stored work-day value (e.g., WorkDays) for reports.
+
+    Args:
+        work_days (float): The number of working days, or None.
+
+    Returns:
+        int: The number of whole working days, or "N/A" if there is none.
+    """
+    return "N/A" if work_days is None else round(work_days)
+
+
+def get_jira_number(conn, task_uid, as_of=None):
     """
     Retrieves the Jira number for a given task UID.
 
     Args:
         conn (sqlite3.Connection): The SQLite database connection.
         task_uid (int): The UID of the task.
+        as_of (int, optional): Read the Jira number as it was at this snapshot
+            (see snapshot_view). Defaults to the current import.
 
     Returns:
         str: The Jira number or None if not found.
     """
-    cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT Value
-        FROM omniplan_task_extended_attributes
-        WHERE TaskUID = ? AND FieldID = 188743731
-        """,
-        (task_uid,),
-    )
-    result = cursor.fetchone()
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        cursor.execute(SELECT_JIRA_NUMBER_SQL, (task_uid,))
+        result = cursor.fetchone()
     return result[0] if result else None
 
 
+def get_jira_numbers(conn, task_uids, as_of=None):
+    """
+    Retrieves the Jira numbers of many tasks in a single query.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uids (iterable): The UIDs of the tasks.
+        as_of (int, optional): Read the Jira numbers as they were at this
+            snapshot (see snapshot_view). Defaults to the current import.
+
+    Returns:
+        dict: The Jira number keyed by task UID. Tasks without a Jira number are
+        left out.
+    """
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        cursor.execute(SELECT_JIRA_NUMBERS_SQL, (json.dumps(list(task_uids)),))
+        return dict(cursor.fetchall())
+
+
+def get_work_seconds(conn, task_uids):
+    """
+    Retrieves the work and actual work of many tasks in a single query.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uids (iterable): The UIDs of the tasks.
+
+    Returns:
+        dict: (work, actual work) in seconds keyed by task UID. Either is None if
+        the task has no valid value. Unknown tasks are left out.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_WORK_SECONDS_SQL, (json.dumps(list(task_uids)),))
+    return {uid: (work, actual_work) for uid, work, actual_work in cursor}
+
+
+def get_task_schedules(conn, task_uids):
+    """
+    Retrieves the critical path analysis of many tasks in a single query.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uids (iterable): The UIDs of the tasks.
+
+    Returns:
+        dict: The TaskSchedule records keyed by task UID. Unknown tasks are left
+        out.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TASK_SCHEDULES_SQL, (json.dumps(list(task_uids)),))
+    return {row[0]: TaskSchedule._make(row) for row in cursor}
+
+
+def get_task_rollups(conn, task_uids):
+    """
+    Retrieves the subtree totals of many tasks in a single query.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uids (iterable): The UIDs of the tasks.
+
+    Returns:
+        dict: The TaskRollup records keyed by task UID. Unknown tasks are left
+        out.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TASK_ROLLUPS_SQL, (json.dumps(list(task_uids)),))
+    return {row[0]: TaskRollup._make(row) for row in cursor}
+
+
+def get_critical_path(conn):
+    """
+    Retrieves the critical tasks of the plan: the tasks without total float,
+    whose delay would delay the end of the project.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+        list: (UID, name, early start, early finish) tuples in the order the
+        tasks run.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_CRITICAL_PATH_SQL)
+    return cursor.fetchall()
+
+
+def get_overallocated_resources(conn):
+    """
+    Retrieves the resources allocated above their MaxUnits at some point of the
+    plan.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+        list: The ResourceUtilization records, the longest over-allocated
+        first.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_OVERALLOCATED_RESOURCES_SQL)
+    return [ResourceUtilization._make(row) for row in cursor]
+
+
+def get_overallocations(conn, resource_uid):
+    """
+    Retrieves the stretches of time a resource is allocated above its MaxUnits.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        resource_uid (int): The resource UID.
+
+    Returns:
+        list: (start, finish, peak units, working minutes) tuples in time
+        order, with times in seconds since 1970-01-01.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_OVERALLOCATIONS_SQL, (resource_uid,))
+    return cursor.fetchall()
+
+
+def get_resource_load(conn, resource_uid):
+    """
+    Retrieves the load curve of a resource: its allocation over time.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        resource_uid (int): The resource UID.
+
+    Returns:
+        list: (start, finish, units) tuples in time order, with times in
+        seconds since 1970-01-01. Stretches without allocation are left out.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_RESOURCE_LOAD_SQL, (resource_uid,))
+    return cursor.fetchall()
+
+
+def get_task_uids_by_jira_keys(conn, jira_keys):
+    """
+    Resolves Jira keys to task UIDs in a single query. Keys are matched
+    case-insensitively.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        jira_keys (iterable): The Jira keys.
+
+    Returns:
+        dict: The task UID keyed by Jira key, as given. Keys without a task are
+        left out. A key on several tasks resolves to the lowest UID.
+    """
+    jira_keys = list(jira_keys)
+    normalized = [normalize_jira_key(jira_key) for jira_key in jira_keys]
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TASK_UIDS_BY_JIRA_KEYS_SQL, (json.dumps(normalized),))
+    uids = dict(cursor.fetchall())
+    return {
+        jira_key: uids[key]
+        for jira_key, key in zip(jira_keys, normalized)
+        if key in uids
+    }
+
+
 def get_jira_link(conn, task_uid):
     """
     Constructs the Jira link for a given task UID using the Jira number.
@@ -577,7 +1781,19 @@ def get_jira_link(conn, task_uid):
     Returns:
         str: The Jira link or None if the Jira number is not found.
     """
-    jira_number = get_jira_number(conn, task_uid)
+    return format_jira_link(get_jira_number(conn, task_uid))
+
+
+def format_jira_link(jira_number):
+    """
+    Formats a Jira number as a Markdown link.
+
+    Args:
+        jira_number (str): The Jira number, or None.
+
+    Returns:
+        str: The Jira link or None if there is no Jira number.
+    """
     if jira_number:
         return f"[{jira_number}](https://jira.sits.no/browse/{jira_number})"
     return None
@@ -595,15 +1811,7 @@ def get_assignments_by_uid(conn, task_uid):
         list: A list of tuples containing the resource name and units.
     """
     cursor = conn.cursor()
-    cursor.execute(
-        """
-        SELECT a.ResourceUID, a.Units, r.Name
-        FROM omniplan_assignments a
-        JOIN omniplan_resources r ON a.ResourceUID = r.UID
-        WHERE a.TaskUID = ?
-        """,
-        (task_uid,),
-    )
+    cursor.execute(SELECT_ASSIGNMENTS_SQL, (task_uid,))
     assignments = cursor.fetchall()
     return [
         (resource_name, units) for resource_uid, units, resource_name in assignments
@@ -613,6 +1821,100 @@ def get_assignments_by_uid(conn, task_uid):
 def fetch_task_name_by_uid(conn, task_uid):
     # Modified function: Only fetch the 'Name' column from omniplan_tasks
     cursor = conn.cursor()
-    cursor.execute("SELECT Name FROM omniplan_tasks WHERE UID = ?", (task_uid,))
+    cursor.execute(SELECT_TASK_NAME_SQL, (task_uid,))
+    result = cursor.fetchone()
+    return result[0] if result else None
+
+
+# Deeper than any outline, for closure queries without a depth limit.
+_ANY_DEPTH = 2**31
+
+
+def get_descendants(conn, task_uid, max_depth=None, as_of=None):
+    """
+    Retrieves the descendants of a task from the task closure table.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the task.
+        max_depth (int, optional): Only return descendants at most this many
+            levels below the task, e.g. 1 for its children. Defaults to all.
+        as_of (int, optional): Read the descendants as they were at this
+            snapshot (see snapshot_view). Defaults to the current import.
+
+    Returns:
+        list: The descendants as Task records, ordered by UID.
+    """
+    with snapshot_view(conn, as_of):
+        cursor = conn.cursor()
+        cursor.execute(SELECT_DESCENDANTS_SQL, (task_uid, max_depth or _ANY_DEPTH))
+        return [Task._make(row) for row in cursor]
+
+
+def get_descendant_uids(conn, task_uid, max_depth=None):
+    """
+    Retrieves the UIDs of the descendants of a task.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the task.
+        max_depth (int, optional): Only return descendants at most this many
+            levels below the task. Defaults to all.
+
+    Returns:
+        list: The descendant UIDs, in ascending order.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_DESCENDANT_UIDS_SQL, (task_uid, max_depth or _ANY_DEPTH))
+    return [row[0] for row in cursor]
+
+
+def get_ancestor_uids(conn, task_uid):
+    """
+    Retrieves the UIDs of the ancestors of a task.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the task.
+
+    Returns:
+        list: The ancestor UIDs, the parent first and the top-level task last.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_ANCESTOR_UIDS_SQL, (task_uid,))
+    return [row[0] for row in cursor]
+
+
+def get_top_level_ancestor(conn, task_uid):
+    """
+    Retrieves the top-level task (outline level 1) that a task belongs to.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the task.
+
+    Returns:
+        int: The UID of the top-level task, the task itself if it is top-level,
+        or None if the task does not exist.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_TOP_LEVEL_ANCESTOR_SQL, (task_uid,))
     result = cursor.fetchone()
     return result[0] if result else None
+
+
+def is_descendant(conn, task_uid, ancestor_uid):
+    """
+    Checks whether a task lies below another task.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        task_uid (int): The UID of the task.
+        ancestor_uid (int): The UID of the possible ancestor.
+
+    Returns:
+        bool: True if ancestor_uid is a parent, grandparent, etc. of task_uid.
+    """
+    cursor = conn.cursor()
+    cursor.execute(SELECT_IS_DESCENDANT_SQL, (ancestor_uid, task_uid))
+    return cursor.fetchone() is not None
@@ -0,0 +1,196 @@
+import logging
+import queue
+import threading
+import time
+
+from omniplan_exporter.db import operations
+
+logger = logging.getLogger(__name__)
+
+# The number of batches that may wait for the writer. Together with the batch size
+# of the producer this caps the number of extracted rows held in memory.
+QUEUE_SIZE = 8
+
+# Queue markers that end the import: commit what was written, or roll it back.
+_DONE = "done"
+_ABORT = "abort"
+
+
+class StageCounter:
+    """
+    Throughput counters of one pipeline stage.
+
+    busy is the time the stage spent on its own work and waiting the time it was
+    blocked on the other stage. A parser that mostly waits is held back by the
+    writer; a writer that mostly waits is starved by the parser.
+
+    table_rows counts the rows of each import table that went through the stage.
+
+    Args:
+        name (str): The name of the stage, used in log messages.
+    """
+
+    def __init__(self, name):
+        self.name = name
+        self.rows = 0
+        self.batches = 0
+        self.busy = 0.0
+        self.waiting = 0.0
+        self.table_rows = dict.fromkeys(operations.IMPORT_TABLES, 0)
+
+    @property
+    def rows_per_second(self):
+        return self.rows / self.busy if self.busy else 0.0
+
+    def __str__(self):
+        return (
+            f"{self.name}: {self.rows} rows in {self.batches} batches, "
+            f"{self.busy:.2f}s busy ({self.rows_per_second:,.0f} rows/s), "
+            f"{self.waiting:.2f}s waiting"
+        )
+
+
+class _Aborted(Exception):
+    """
+    Raised in the writer when the producer gives up, to roll the import back.
+    """
+
+
+class BatchWriter(threading.Thread):
+    """
+    Writer thread that drains row batches from a queue into the import tables.
+
+    Given a path, the thread opens and closes its own connection. Every import
+    table is reset and all batches are inserted in a single transaction (see
+    operations.import_transaction), which is committed when the producer puts
+    _DONE and rolled back on _ABORT or on any database error.
+
+    Args:
+        database (str or sqlite3.Connection): The path to the SQLite database
+            file, or a connection that may be used from the writer thread (see
+            operations.create_memory_connection). The caller keeps ownership of
+            a connection and must not use it until the writer is done.
+        batches (queue.Queue): The queue of (table, rows) batches.
+        bulk (bool): Whether to load in bulk-load mode.
+    """
+
+    def __init__(self, database, batches, bulk=False):
+        super().__init__(name="omniplan-writer", daemon=True)
+        self.database = database
+        self.batches = batches
+        self.bulk = bulk
+        self.counter = StageCounter("write")
+        self.error = None
+        # Whether the producer's _DONE or _ABORT has been taken off the queue.
+        self.ended = False
+
+    def run(self):
+        if isinstance(self.database, str):
+            conn = operations.create_connection(self.database)
+        else:
+            conn = self.database
+        try:
+            self._write(conn)
+        except _Aborted:
+            pass
+        except Exception as e:
+            self.error = e
+            # Keep draining so the producer never blocks on a full queue, unless
+            # the failure came after its end marker, e.g. in a derived table
+            # build or the commit: nothing more is put on the queue then.
+            while not self.ended and self._next() not in (_DONE, _ABORT):
+                pass
+        finally:
+            if conn is not self.database:
+                conn.close()
+
+    def _next(self):
+        started = time.perf_counter()
+        item = self.batches.get()
+        self.counter.waiting += time.perf_counter() - started
+        return item
+
+    def _write(self, conn):
+        with operations.import_transaction(conn, self.bulk) as cursor:
+            for table in operations.IMPORT_TABLES:
+                operations.reset_table(cursor, table)
+
+            while True:
+                item = self._next()
+                self.ended = item in (_DONE, _ABORT)
+                if item == _ABORT:
+                    raise _Aborted()
+                if item == _DONE:
+                    break
+                table, rows = item
+                started = time.perf_counter()
+                spec = operations.IMPORT_TABLES[table]
+                cursor.executemany(
+                    spec.insert, spec.prepare(rows) if spec.prepare else rows
+                )
+                self.counter.busy += time.perf_counter() - started
+                self.counter.rows += len(rows)
+                self.counter.batches += 1
+                self.counter.table_rows[table] += len(rows)
+
+            # Index builds and the commit count as write time.
+            started = time.perf_counter()
+        self.counter.busy += time.perf_counter() - started
+        for table, count in self.counter.table_rows.items():
+            logger.info(f"Inserted {count} {table} records into the database.")
+
+
+def import_pipelined(database, batches, queue_size=QUEUE_SIZE, bulk=False):
+    """
+    Replaces every import table with the given rows, overlapping their production
+    with the SQLite writes.
+
+    The batches are consumed in the calling thread and handed to a BatchWriter
+    through a bounded queue, so extraction blocks once queue_size batches are
+    waiting. Tables that receive no batches end up empty.
+
+    Args:
+        database (str or sqlite3.Connection): The path to the SQLite database
+            file, or a connection the writer thread may use (see BatchWriter).
+        batches (iterable): (table, rows) batches, e.g. from
+        extract_operations.iter_row_batches. Rows of a table must arrive in order.
+        queue_size (int): The number of batches that may wait for the writer.
+        bulk (bool): Whether to load in bulk-load mode.
+
+    Returns:
+        tuple: The StageCounter of the parse stage and of the write stage.
+
+    Raises:
+        sqlite3.Error: If the writer fails. Nothing is committed in that case.
+    """
+    batch_queue = queue.Queue(maxsize=queue_size)
+    writer = BatchWriter(database, batch_queue, bulk)
+    writer.start()
+
+    parse = StageCounter("parse")
+    end = _ABORT
+    try:
+        started = time.perf_counter()
+        for item in batches:
+            produced = time.perf_counter()
+            parse.busy += produced - started
+            parse.rows += len(item[1])
+            parse.batches += 1
+            parse.table_rows[item[0]] += len(item[1])
+            if writer.error is not None:
+                break
+            batch_queue.put(item)
+            started = time.perf_counter()
+            parse.waiting += started - produced
+        else:
+            parse.busy += time.perf_counter() - started
+            end = _DONE
+    finally:
+        batch_queue.put(end)
+        writer.join()
+
+    if writer.error is not None:
+        raise writer.error
+    logger.info(str(parse))
+    logger.info(str(writer.counter))
+    return parse, writer.counter
@@ -0,0 +1,196 @@
+import os
+import queue
+import sqlite3
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+from functools import lru_cache
+from urllib.request import pathname2url
+
+# Bytes of the database file read through a memory map instead of read() calls.
+MMAP_SIZE = 256 * 1024 * 1024
+
+# Prepared statements kept per connection. The query helpers in operations run a
+# few dozen distinct statements, so none of them is prepared twice.
+CACHED_STATEMENTS = 512
+
+# The number of connections a ReadPool opens at most.
+POOL_SIZE = 4
+
+
+def read_only_uri(db_name):
+    """
+    Returns the SQLite URI that opens a database file read-only.
+
+    Args:
+        db_name (str): The path to the SQLite database file.
+
+    Returns:
+        str: The file: URI with mode=ro.
+    """
+    return f"file:{pathname2url(os.path.abspath(db_name))}?mode=ro"
+
+
+@lru_cache(maxsize=256)
+def _record_type(columns):
+    return namedtuple("Record", columns, rename=True)
+
+
+def namedtuple_row(cursor, row):
+    """
+    Row factory that returns rows as named tuples with one field per result
+    column. The record type is built once per distinct column list, and rows
+    still unpack and index like plain tuples, so every helper in operations
+    works unchanged.
+    """
+    return _record_type(tuple(column[0] for column in cursor.description))._make(row)
+
+
+def connect_read_only(
+    db_name,
+    row_factory=None,
+    mmap_size=MMAP_SIZE,
+    cached_statements=CACHED_STATEMENTS,
+):
+    """
+    Opens a read-only connection for the query helpers.
+
+    The file is opened through a mode=ro URI and the connection is set to
+    query_only, so neither a typo in a path nor a stray statement can write to
+    the database. It may be used from another thread than the one that opened
+    it, one thread at a time.
+
+    Args:
+        db_name (str): The path to the SQLite database file, which must exist.
+        row_factory (callable, optional): The row factory, e.g. namedtuple_row or
+            sqlite3.Row. Rows are plain tuples by default.
+        mmap_size (int): The number of bytes to memory-map.
+        cached_statements (int): The size of the prepared statement cache.
+
+    Returns:
+        sqlite3.Connection: The connection.
+
+    Raises:
+        sqlite3.OperationalError: If the database file cannot be opened.
+    """
+    conn = sqlite3.connect(
+        read_only_uri(db_name),
+        uri=True,
+        detect_types=sqlite3.PARSE_DECLTYPES,
+        cached_statements=cached_statements,
+        check_same_thread=False,
+    )
+    conn.execute(f"PRAGMA mmap_size = {int(mmap_size)}")
+    conn.execute("PRAGMA query_only = ON")
+    conn.row_factory = row_factory
+    return conn
+
+
+def memory_copy(db_name, row_factory=None, cached_statements=CACHED_STATEMENTS):
+    """
+    Loads a whole database into memory with the SQLite backup API, for many
+    reads in one process, e.g. a batch of reports. The copy is a snapshot: later
+    imports into db_name are not seen.
+
+    Args:
+        db_name (str): The path to the SQLite database file, which must exist.
+        row_factory (callable, optional): The row factory, as in
+            connect_read_only.
+        cached_statements (int): The size of the prepared statement cache.
+
+    Returns:
+        sqlite3.Connection: A query_only connection to the in-memory copy.
+    """
+    source = connect_read_only(db_name)
+    try:
+        conn = sqlite3.connect(
+            ":memory:",
+            detect_types=sqlite3.PARSE_DECLTYPES,
+            cached_statements=cached_statements,
+            check_same_thread=False,
+        )
+        source.backup(conn)
+    finally:
+        source.close()
+    conn.execute("PRAGMA query_only = ON")
+    conn.row_factory = row_factory
+    return conn
+
+
+class ReadPool:
+    """
+    Pool of read-only connections to one database, shared between threads.
+
+    Connections are opened on demand, up to size, and handed to one thread at a
+    time; a thread asking for a connection while all of them are in use waits
+    for one to be returned. An open connection keeps its statement cache and
+    memory map, so repeated lookups skip both opening the file and preparing
+    their SQL.
+
+    Args:
+        db_name (str): The path to the SQLite database file.
+        size (int): The maximum number of connections.
+        **options: Passed to connect_read_only (row_factory, mmap_size,
+            cached_statements).
+    """
+
+    def __init__(self, db_name, size=POOL_SIZE, **options):
+        self.db_name = db_name
+        self.options = options
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        self._connections = []
+        self._closed = False
+
+    def _open(self):
+        conn = connect_read_only(self.db_name, **self.options)
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    @contextmanager
+    def connection(self):
+        """
+        Lends a connection for the duration of the with block.
+
+        Yields:
+            sqlite3.Connection: A read-only connection.
+
+        Raises:
+            RuntimeError: If the pool is closed.
+        """
+        if self._closed:
+            raise RuntimeError("The connection pool is closed.")
+        self._slots.acquire()
+        try:
+            try:
+                conn = self._idle.get_nowait()
+            except queue.Empty:
+                conn = self._open()
+            try:
+                yield conn
+            finally:
+                # Let go of the read snapshot, so the next user sees new imports.
+                if conn.in_transaction:
+                    conn.rollback()
+                self._idle.put(conn)
+        finally:
+            self._slots.release()
+
+    def close(self):
+        """
+        Closes every connection of the pool. Connections still lent out are
+        closed as well, so close the pool once its users are done.
+        """
+        self._closed = True
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
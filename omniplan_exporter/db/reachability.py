@@ -0,0 +1,250 @@
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+INSERT_DEPENDENCY_LABELS_SQL = """
+    INSERT INTO omniplan_dependency_labels (
+        TaskUID, Post, TreeLow, Low, Cyclic
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+
+def create_dependency_labels_table(cursor):
+    # The reachability labels of the predecessor links, rebuilt by every import:
+    # a row per task with the labels of its strongly connected component. Post
+    # is the rank of the component in a depth-first walk of the condensed graph,
+    # so it also identifies the component.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_dependency_labels (
+            TaskUID INTEGER PRIMARY KEY,
+            Post INTEGER,
+            TreeLow INTEGER,
+            Low INTEGER,
+            Cyclic INTEGER,
+            FOREIGN KEY (TaskUID) REFERENCES omniplan_tasks(UID)
+        ) WITHOUT ROWID
+        """
+    )
+
+
+def strongly_connected_components(outgoing):
+    """
+    Finds the strongly connected components of a graph with Tarjan's algorithm,
+    without recursion, in O(nodes + edges).
+
+    Args:
+        outgoing (list): The successor indexes of each node.
+
+    Returns:
+        list: The components as lists of node indexes. Every component comes
+        after all components it reaches, i.e. successors first.
+    """
+    count = len(outgoing)
+    number = [None] * count
+    lowest = [0] * count
+    on_stack = [False] * count
+    stack = []
+    components = []
+    counter = 0
+    for root in range(count):
+        if number[root] is not None:
+            continue
+        # (node, position in its successor list) pairs of the depth-first walk.
+        walk = [(root, 0)]
+        number[root] = lowest[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack[root] = True
+        while walk:
+            node, position = walk[-1]
+            successors = outgoing[node]
+            if position < len(successors):
+                walk[-1] = (node, position + 1)
+                successor = successors[position]
+                if number[successor] is None:
+                    number[successor] = lowest[successor] = counter
+                    counter += 1
+                    stack.append(successor)
+                    on_stack[successor] = True
+                    walk.append((successor, 0))
+                elif on_stack[successor] and number[successor] < lowest[node]:
+                    lowest[node] = number[successor]
+                continue
+            walk.pop()
+            if walk and lowest[node] < lowest[walk[-1][0]]:
+                lowest[walk[-1][0]] = lowest[node]
+            if lowest[node] == number[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack[member] = False
+                    component.append(member)
+                    if member == node:
+                        break
+                components.append(component)
+    return components
+
+
+def dependency_labels(uids, links):
+    """
+    Labels every task so that most "does this task depend on that one?"
+    questions are answered from the labels of the two tasks alone, whatever the
+    link types. The labels take O(tasks) space and O(tasks + links) time.
+
+    The dependency cycles are first collapsed into their strongly connected
+    components, and logged. A depth-first walk of the condensed, acyclic graph,
+    from the components nothing depends on, then ranks each component when it
+    is finished (Post). The components below it in the walk's tree have the
+    ranks TreeLow to Post, so a task reaches every task ranked in that range.
+    Low is the lowest rank of everything it reaches through any link, so a task
+    cannot reach anything ranked outside Low to Post.
+
+    Args:
+        uids (list): The UIDs of the tasks.
+        links (iterable): (TaskUID, PredecessorUID) pairs. Tasks that only
+            appear in the links are labelled too.
+
+    Returns:
+        list: (TaskUID, Post, TreeLow, Low, Cyclic) rows ordered by TaskUID,
+        Cyclic being 1 for the tasks on a dependency cycle.
+    """
+    uids = list(uids)
+    index = {uid: position for position, uid in enumerate(uids)}
+    outgoing = [[] for _ in uids]
+    for task_uid, predecessor_uid in links:
+        if task_uid is None or predecessor_uid is None or task_uid == predecessor_uid:
+            continue
+        for uid in (task_uid, predecessor_uid):
+            if uid not in index:
+                index[uid] = len(uids)
+                uids.append(uid)
+                outgoing.append([])
+        outgoing[index[predecessor_uid]].append(index[task_uid])
+
+    components = strongly_connected_components(outgoing)
+    cyclic = [component for component in components if len(component) > 1]
+    if cyclic:
+        logger.warning(
+            f"{sum(map(len, cyclic))} tasks are on {len(cyclic)} dependency cycles."
+        )
+    component_of = [0] * len(uids)
+    for position, component in enumerate(components):
+        for task in component:
+            component_of[task] = position
+    # The condensed graph, without duplicate edges.
+    successors = [set() for _ in components]
+    for task, targets in enumerate(outgoing):
+        own = component_of[task]
+        for target in targets:
+            if component_of[target] != own:
+                successors[own].add(component_of[target])
+    successors = [sorted(targets) for targets in successors]
+
+    count = len(components)
+    post = [0] * count
+    tree_low = [0] * count
+    low = [0] * count
+    visited = [False] * count
+    rank = 0
+    # Components come successors first, so the walk starts from the components
+    # nothing depends on.
+    for root in reversed(range(count)):
+        if visited[root]:
+            continue
+        visited[root] = True
+        tree_low[root] = rank
+        walk = [(root, 0)]
+        while walk:
+            node, position = walk[-1]
+            targets = successors[node]
+            if position < len(targets):
+                walk[-1] = (node, position + 1)
+                target = targets[position]
+                if not visited[target]:
+                    visited[target] = True
+                    # Its subtree is ranked from here on.
+                    tree_low[target] = rank
+                    walk.append((target, 0))
+                continue
+            walk.pop()
+            post[node] = rank
+            # Everything it reaches is finished before it.
+            low[node] = min([rank, *(low[target] for target in targets)])
+            rank += 1
+
+    rows = [
+        (
+            uid,
+            post[component_of[task]],
+            tree_low[component_of[task]],
+            low[component_of[task]],
+            int(len(components[component_of[task]]) > 1),
+        )
+        for task, uid in enumerate(uids)
+    ]
+    # In primary key order, which is the fastest to insert.
+    rows.sort()
+    return rows
+
+
+def reaches(predecessor, task):
+    """
+    Decides from their labels whether a task depends on another, directly or
+    through other tasks.
+
+    Args:
+        predecessor (tuple): The (Post, TreeLow, Low, Cyclic) labels of the task
+            that may be depended on.
+        task (tuple): The labels of the task that may depend on it.
+
+    Returns:
+        bool: Whether task depends on predecessor, or None if the labels cannot
+        tell and the links have to be walked.
+    """
+    post, tree_low, low, cyclic = predecessor
+    target = task[0]
+    if target == post:
+        # The same component: tasks on a cycle depend on each other.
+        return bool(cyclic)
+    if tree_low <= target < post:
+        return True
+    if not low <= target < post:
+        return False
+    return None
+
+
+def build_dependency_labels(cursor):
+    """
+    Labels the imported tasks for dependency lookups (see dependency_labels) and
+    replaces the rows of omniplan_dependency_labels with them. Runs in the
+    caller's transaction, e.g. operations.import_transaction; nothing is
+    committed.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+
+    Returns:
+        list: The label rows, or None if no tasks were imported.
+    """
+    tables = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    if not {"omniplan_tasks", "omniplan_predecessor_links"} <= tables:
+        return None
+    started = time.perf_counter()
+    uids = [row[0] for row in cursor.execute("SELECT UID FROM omniplan_tasks")]
+    links = cursor.execute(
+        "SELECT TaskUID, PredecessorUID FROM omniplan_predecessor_links"
+    ).fetchall()
+    rows = dependency_labels(uids, links)
+    create_dependency_labels_table(cursor)
+    cursor.execute("DELETE FROM omniplan_dependency_labels")
+    cursor.executemany(INSERT_DEPENDENCY_LABELS_SQL, rows)
+    logger.info(
+        f"Labelled {len(rows)} tasks and {len(links)} links for dependency "
+        f"lookups in {time.perf_counter() - started:.2f}s."
+    )
+    return rows
@@ -0,0 +1,227 @@
+import logging
+import time
+
+from omniplan_exporter.db import calendars
+from omniplan_exporter.utils import decoding
+
+logger = logging.getLogger(__name__)
+
+INSERT_ROLLUP_SQL = """
+    INSERT INTO omniplan_task_rollup (
+        TaskUID, WorkSeconds, ActualWorkSeconds, RemainingWorkSeconds, WorkDays,
+        ActualWorkDays, RemainingWorkDays, PercentComplete, StartEpoch,
+        FinishEpoch, Start, Finish, Descendants, LeafDescendants
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def create_rollup_table(cursor):
+    # The subtree totals of every task, rebuilt by every import.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_task_rollup (
+            TaskUID INTEGER PRIMARY KEY,
+            WorkSeconds INTEGER,
+            ActualWorkSeconds INTEGER,
+            RemainingWorkSeconds INTEGER,
+            WorkDays REAL,
+            ActualWorkDays REAL,
+            RemainingWorkDays REAL,
+            PercentComplete REAL,
+            StartEpoch INTEGER,
+            FinishEpoch INTEGER,
+            Start DATETIME,
+            Finish DATETIME,
+            Descendants INTEGER,
+            LeafDescendants INTEGER,
+            FOREIGN KEY (TaskUID) REFERENCES omniplan_tasks(UID)
+        )
+        """
+    )
+
+
+def _min(first, second):
+    if first is None:
+        return second
+    return first if second is None or first <= second else second
+
+
+def _max(first, second):
+    if first is None:
+        return second
+    return first if second is None or first >= second else second
+
+
+def compute_rollups(tasks):
+    """
+    Rolls the work, progress and dates of the leaf tasks up the ParentUID
+    hierarchy in one pass, in O(tasks).
+
+    The tasks are ordered so that every parent comes before its children, then
+    walked backwards so that every task is complete before it is added to its
+    parent. A summary task's own figures are ignored, since the export already
+    derives them from its children; a task without children counts its own.
+
+    Percent complete is weighted by work. Tasks without percent complete count
+    as not started, and a subtree without any work gets the plain average.
+
+    Args:
+        tasks (iterable): (UID, ParentUID, WorkSeconds, ActualWorkSeconds,
+            RemainingWorkSeconds, PercentComplete, StartEpoch, FinishEpoch)
+            rows, as in omniplan_tasks.
+
+    Returns:
+        list: (UID, work, actual work, remaining work, percent complete, start,
+        finish, descendants, leaf descendants) tuples, parents before their
+        children. Work is in seconds and dates in seconds since 1970-01-01.
+        Tasks whose parents form a cycle are left out.
+    """
+    tasks = list(tasks)
+    index = {task[0]: position for position, task in enumerate(tasks)}
+    children = [[] for _ in tasks]
+    order = []
+    for position, task in enumerate(tasks):
+        parent = index.get(task[1])
+        if parent is None or parent == position:
+            order.append(position)
+        else:
+            children[parent].append(position)
+    # The list grows while it is walked, like a FIFO queue.
+    for position in order:
+        order.extend(children[position])
+    if len(order) < len(tasks):
+        logger.warning(
+            f"{len(tasks) - len(order)} tasks are on a ParentUID cycle and were "
+            "left out of the rollup."
+        )
+
+    count = len(tasks)
+    work = [0] * count
+    actual = [0] * count
+    remaining = [0] * count
+    # Work times percent complete, and the percentages and leaves for subtrees
+    # without work.
+    weighted = [0] * count
+    percents = [0] * count
+    start = [None] * count
+    finish = [None] * count
+    descendants = [0] * count
+    leaves = [0] * count
+    parents = [index.get(task[1]) for task in tasks]
+    for position in reversed(order):
+        if not children[position]:
+            task = tasks[position]
+            percent = task[5] or 0
+            work[position] = task[2] or 0
+            actual[position] = task[3] or 0
+            remaining[position] = task[4] or 0
+            weighted[position] = work[position] * percent
+            percents[position] = percent
+            start[position] = task[6]
+            finish[position] = task[7]
+        parent = parents[position]
+        if parent is None or parent == position:
+            continue
+        work[parent] += work[position]
+        actual[parent] += actual[position]
+        remaining[parent] += remaining[position]
+        weighted[parent] += weighted[position]
+        percents[parent] += percents[position]
+        start[parent] = _min(start[parent], start[position])
+        finish[parent] = _max(finish[parent], finish[position])
+        descendants[parent] += descendants[position] + 1
+        leaves[parent] += leaves[position] or 1
+
+    return [
+        (
+            tasks[position][0],
+            work[position],
+            actual[position],
+            remaining[position],
+            (
+                weighted[position] / work[position]
+                if work[position]
+                else percents[position] / (leaves[position] or 1)
+            ),
+            start[position],
+            finish[position],
+            descendants[position],
+            leaves[position],
+        )
+        for position in order
+    ]
+
+
+def _days(seconds, day_hours):
+    return seconds / (day_hours * 3600)
+
+
+def _iso(seconds):
+    # As omniplan_tasks stores Start and Finish, e.g. "2023-01-02 08:00:00".
+    return None if seconds is None else decoding.from_epoch(seconds).isoformat(" ")
+
+
+def rollup_rows(rollups, day_hours=decoding.WORK_DAY_HOURS):
+    """
+    Returns the omniplan_task_rollup rows of compute_rollups' results.
+
+    Args:
+        rollups (list): The compute_rollups results.
+        day_hours (float): The hours per working day to count work days in.
+    """
+    for uid, work, actual, remaining, percent, start, finish, *counts in rollups:
+        yield (
+            uid,
+            work,
+            actual,
+            remaining,
+            _days(work, day_hours),
+            _days(actual, day_hours),
+            _days(remaining, day_hours),
+            percent,
+            start,
+            finish,
+            _iso(start),
+            _iso(finish),
+            *counts,
+        )
+
+
+def build_rollup(cursor):
+    """
+    Computes the subtree totals of the imported plan and replaces the rows of
+    omniplan_task_rollup with them. Runs in the caller's transaction, e.g.
+    operations.import_transaction; nothing is committed.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+
+    Returns:
+        list: The compute_rollups results, or None if no tasks were imported.
+    """
+    tables = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    if "omniplan_tasks" not in tables:
+        return None
+    started = time.perf_counter()
+    tasks = cursor.execute(
+        """
+        SELECT UID, ParentUID, WorkSeconds, ActualWorkSeconds,
+        RemainingWorkSeconds, PercentComplete, StartEpoch, FinishEpoch
+        FROM omniplan_tasks
+        ORDER BY UID
+        """
+    ).fetchall()
+    rollups = compute_rollups(tasks)
+    create_rollup_table(cursor)
+    cursor.execute("DELETE FROM omniplan_task_rollup")
+    cursor.executemany(
+        INSERT_ROLLUP_SQL,
+        rollup_rows(rollups, calendars.project_day_hours(cursor.connection)),
+    )
+    logger.info(
+        f"Rolled up {len(rollups)} tasks in {time.perf_counter() - started:.2f}s."
+    )
+    return rollups
@@ -0,0 +1,396 @@
+import logging
+import time
+from collections import namedtuple
+
+from omniplan_exporter.db import calendars
+from omniplan_exporter.utils import decoding
+
+logger = logging.getLogger(__name__)
+
+# The Type codes of a PredecessorLink in the MSPDI export.
+FINISH_FINISH = 0
+FINISH_START = 1
+START_FINISH = 2
+START_START = 3
+
+# The edges of the outline: the start of a summary task precedes its children
+# like a start-to-start link, and its finish follows them like a
+# finish-to-finish link. Neither limits how long a child can slip on its own.
+SUMMARY_START = 4
+SUMMARY_FINISH = 5
+
+# MSPDI stores link lags in tenths of a minute.
+LAG_SECONDS = 6
+
+INSERT_SCHEDULE_SQL = """
+    INSERT INTO omniplan_task_schedule (
+        TaskUID, EarlyStart, EarlyFinish, LateStart, LateFinish, TotalFloat,
+        FreeFloat, TotalFloatDays, FreeFloatDays, Critical
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# The network of a plan in index form. Task i has UID uids[i] and is node i. A
+# summary task has no duration of its own: node i is its start and node
+# finish[i], after the tasks, its finish. For other tasks finish[i] is i. Node n
+# lasts durations[n] seconds; incoming[n] holds a (predecessor node, type, lag
+# in seconds) tuple per edge into node n and outgoing[n] a (successor node,
+# type, lag) tuple per edge out.
+Network = namedtuple("Network", ["uids", "durations", "incoming", "outgoing", "finish"])
+
+# The result of the forward and backward passes, one list entry per task of the
+# network. Every value is in working seconds from the start of the project, and
+# None for tasks that depend on a dependency cycle. A summary task spans its
+# children and is never critical itself.
+Schedule = namedtuple(
+    "Schedule",
+    [
+        "uids",
+        "early_start",
+        "early_finish",
+        "late_start",
+        "late_finish",
+        "total_float",
+        "free_float",
+        "critical",
+    ],
+)
+
+
+def create_schedule_table(cursor):
+    # The critical path analysis of the plan, rebuilt by every import. Its index
+    # is in indexes.INDEXES.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_task_schedule (
+            TaskUID INTEGER PRIMARY KEY,
+            EarlyStart INTEGER,
+            EarlyFinish INTEGER,
+            LateStart INTEGER,
+            LateFinish INTEGER,
+            TotalFloat INTEGER,
+            FreeFloat INTEGER,
+            TotalFloatDays REAL,
+            FreeFloatDays REAL,
+            Critical INTEGER,
+            FOREIGN KEY (TaskUID) REFERENCES omniplan_tasks(UID)
+        )
+        """
+    )
+
+
+def build_network(tasks, links):
+    """
+    Builds the adjacency lists of a plan.
+
+    Summary tasks do not take part as activities: their start and finish nodes
+    enclose their children, so a link to or from a summary task applies to its
+    whole subtree. Links to or from unknown tasks and links of a task to itself
+    are left out. Links without a known type are finish-to-start, the MSPDI
+    default.
+
+    Args:
+        tasks (iterable): (UID, duration in seconds, Summary, ParentUID) rows. A
+            missing duration counts as zero. Summary and ParentUID may be left
+            out for a plan without an outline.
+        links (iterable): (TaskUID, PredecessorUID, Type, LinkLag) rows, as in
+            omniplan_predecessor_links. LinkLag is in tenths of a working minute
+            and may be left out.
+
+    Returns:
+        Network: The network.
+    """
+    uids = []
+    durations = []
+    parents = []
+    finish = []
+    summaries = []
+    for uid, duration, *outline in tasks:
+        summary, parent_uid = outline or (0, None)
+        if summary:
+            summaries.append(len(uids))
+        finish.append(len(uids))
+        uids.append(uid)
+        durations.append(0 if summary else duration or 0)
+        parents.append(parent_uid)
+    for task in summaries:
+        finish[task] = len(durations)
+        durations.append(0)
+    index = {uid: position for position, uid in enumerate(uids)}
+    incoming = [[] for _ in durations]
+    outgoing = [[] for _ in durations]
+
+    for task in summaries:
+        # An empty summary still starts before it finishes.
+        incoming[finish[task]].append((task, SUMMARY_FINISH, 0))
+        outgoing[task].append((finish[task], SUMMARY_FINISH, 0))
+    for task, parent_uid in enumerate(parents):
+        parent = index.get(parent_uid)
+        if parent is None or finish[parent] == parent:
+            continue
+        incoming[task].append((parent, SUMMARY_START, 0))
+        outgoing[parent].append((task, SUMMARY_START, 0))
+        incoming[finish[parent]].append((finish[task], SUMMARY_FINISH, 0))
+        outgoing[finish[task]].append((finish[parent], SUMMARY_FINISH, 0))
+
+    get = index.get
+    for task_uid, predecessor_uid, type_, *lag in links:
+        successor = get(task_uid)
+        predecessor = get(predecessor_uid)
+        if successor is None or predecessor is None or successor == predecessor:
+            continue
+        lag = lag[0] * LAG_SECONDS if lag and lag[0] else 0
+        # The finish or the start of the predecessor bounds the start or the
+        # finish of the successor.
+        if type_ == START_START:
+            pass
+        elif type_ == FINISH_FINISH:
+            predecessor = finish[predecessor]
+            successor = finish[successor]
+        elif type_ == START_FINISH:
+            successor = finish[successor]
+        else:
+            type_ = FINISH_START
+            predecessor = finish[predecessor]
+        incoming[successor].append((predecessor, type_, lag))
+        outgoing[predecessor].append((successor, type_, lag))
+    return Network(uids, durations, incoming, outgoing, finish)
+
+
+def topological_order(network):
+    """
+    Sorts the tasks so that every task comes after its predecessors (Kahn's
+    algorithm), in O(tasks + links).
+
+    Args:
+        network (Network): The network.
+
+    Returns:
+        list: The task indexes in dependency order. Tasks on a dependency cycle,
+        and every task after one, are left out.
+    """
+    waiting = [len(links) for links in network.incoming]
+    order = [task for task, count in enumerate(waiting) if not count]
+    outgoing = network.outgoing
+    # The list grows while it is walked, like a FIFO queue.
+    for task in order:
+        for successor, *_ in outgoing[task]:
+            waiting[successor] -= 1
+            if not waiting[successor]:
+                order.append(successor)
+    return order
+
+
+def compute_schedule(network):
+    """
+    Runs the critical path method over a network.
+
+    The forward pass finds the earliest start and finish of each task from the
+    start of the project, the backward pass the latest ones that do not delay the
+    end of the project. A link of type:
+
+    - finish-to-start lets the successor start once the predecessor finished,
+    - start-to-start lets it start once the predecessor started,
+    - finish-to-finish lets it finish once the predecessor finished,
+    - start-to-finish lets it finish once the predecessor started.
+
+    A link's lag delays the successor further, a negative lag lets it overlap.
+    Total float is how long a task can slip without delaying the project, free
+    float how long it can slip without delaying any successor. Tasks without
+    total float are critical. A summary task starts with its first child and
+    finishes with its last, and has the float of its start and finish.
+
+    Args:
+        network (Network): The network, from build_network.
+
+    Returns:
+        Schedule: The dates and floats of every task, in network order.
+    """
+    durations = network.durations
+    count = len(durations)
+    order = topological_order(network)
+    if len(order) < count:
+        logger.warning(
+            f"{count - len(order)} tasks are on or after a dependency cycle and "
+            "were left out of the schedule."
+        )
+
+    early_start = [None] * count
+    early_finish = [None] * count
+    for task in order:
+        duration = durations[task]
+        start = 0
+        for predecessor, type_, lag in network.incoming[task]:
+            if type_ == FINISH_START:
+                bound = early_finish[predecessor] + lag
+            elif type_ == START_START or type_ == SUMMARY_START:
+                bound = early_start[predecessor] + lag
+            elif type_ == FINISH_FINISH or type_ == SUMMARY_FINISH:
+                bound = early_finish[predecessor] + lag - duration
+            else:
+                bound = early_start[predecessor] + lag - duration
+            if bound > start:
+                start = bound
+        early_start[task] = start
+        early_finish[task] = start + duration
+
+    project_finish = max((early_finish[task] for task in order), default=0)
+    late_start = [None] * count
+    late_finish = [None] * count
+    total_float = [None] * count
+    free_float = [None] * count
+    for task in reversed(order):
+        duration = durations[task]
+        finish = project_finish
+        free = project_finish - early_finish[task]
+        for successor, type_, lag in network.outgoing[task]:
+            if late_start[successor] is None:
+                # Left out after a cycle.
+                continue
+            if type_ == FINISH_START:
+                bound = late_start[successor] - lag
+                slack = early_start[successor] - early_finish[task] - lag
+            elif type_ == START_START:
+                bound = late_start[successor] - lag + duration
+                slack = early_start[successor] - early_start[task] - lag
+            elif type_ == FINISH_FINISH:
+                bound = late_finish[successor] - lag
+                slack = early_finish[successor] - early_finish[task] - lag
+            elif type_ == START_FINISH:
+                bound = late_finish[successor] - lag + duration
+                slack = early_finish[successor] - early_start[task] - lag
+            elif type_ == SUMMARY_FINISH:
+                # A child delays its summary's successors only once it is the
+                # last to finish.
+                bound = late_finish[successor]
+                slack = (
+                    early_finish[successor] - early_finish[task] + free_float[successor]
+                )
+            else:
+                bound = late_start[successor] + duration
+                slack = free
+            if bound < finish:
+                finish = bound
+            if slack < free:
+                free = slack
+        late_finish[task] = finish
+        late_start[task] = finish - duration
+        total_float[task] = late_start[task] - early_start[task]
+        free_float[task] = min(free, total_float[task])
+
+    tasks = len(network.uids)
+    result = Schedule(
+        network.uids,
+        early_start[:tasks],
+        early_finish[:tasks],
+        late_start[:tasks],
+        late_finish[:tasks],
+        total_float[:tasks],
+        free_float[:tasks],
+        [None if value is None else int(value <= 0) for value in total_float[:tasks]],
+    )
+    # The summary tasks, from their start and finish nodes.
+    for task, finish in enumerate(network.finish):
+        if finish == task:
+            continue
+        if early_start[task] is None or early_start[finish] is None:
+            for values in result[1:]:
+                values[task] = None
+            continue
+        result.early_finish[task] = early_finish[finish]
+        result.late_finish[task] = late_finish[finish]
+        result.total_float[task] = min(total_float[task], total_float[finish])
+        result.free_float[task] = free_float[finish]
+        result.critical[task] = 0
+    return result
+
+
+def critical_path(schedule):
+    """
+    Returns the critical tasks in the order they run.
+
+    Args:
+        schedule (Schedule): The schedule.
+
+    Returns:
+        list: The UIDs of the critical tasks, by early start and early finish.
+    """
+    tasks = [task for task, critical in enumerate(schedule.critical) if critical]
+    tasks.sort(
+        key=lambda task: (schedule.early_start[task], schedule.early_finish[task])
+    )
+    return [schedule.uids[task] for task in tasks]
+
+
+def _days(seconds, day_hours):
+    return None if seconds is None else seconds / (day_hours * 3600)
+
+
+def schedule_rows(schedule, day_hours=decoding.WORK_DAY_HOURS):
+    """
+    Returns the omniplan_task_schedule rows of a schedule.
+
+    Args:
+        schedule (Schedule): The schedule.
+        day_hours (float): The hours per working day to count float days in.
+    """
+    return (
+        (*row[:7], _days(row[5], day_hours), _days(row[6], day_hours), row[7])
+        for row in zip(*schedule)
+    )
+
+
+def load_network(cursor):
+    """
+    Reads the tasks and their links from the import tables.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+
+    Returns:
+        Network: The network of the imported plan.
+    """
+    tasks = cursor.execute(
+        "SELECT UID, DurationSeconds, Summary, ParentUID FROM omniplan_tasks "
+        "ORDER BY UID"
+    ).fetchall()
+    links = cursor.execute(
+        "SELECT TaskUID, PredecessorUID, Type, LinkLag "
+        "FROM omniplan_predecessor_links"
+    ).fetchall()
+    return build_network(tasks, links)
+
+
+def build_schedule(cursor):
+    """
+    Computes the schedule of the imported plan and replaces the rows of
+    omniplan_task_schedule with it. Runs in the caller's transaction, e.g.
+    operations.import_transaction; nothing is committed.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+
+    Returns:
+        Schedule: The schedule, or None if no tasks were imported.
+    """
+    tables = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    if not {"omniplan_tasks", "omniplan_predecessor_links"} <= tables:
+        return None
+    started = time.perf_counter()
+    network = load_network(cursor)
+    schedule = compute_schedule(network)
+    create_schedule_table(cursor)
+    cursor.execute("DELETE FROM omniplan_task_schedule")
+    cursor.executemany(
+        INSERT_SCHEDULE_SQL,
+        schedule_rows(schedule, calendars.project_day_hours(cursor.connection)),
+    )
+    logger.info(
+        f"Scheduled {len(network.uids)} tasks and "
+        f"{sum(map(len, network.incoming))} dependencies in "
+        f"{time.perf_counter() - started:.2f}s, "
+        f"{sum(filter(None, schedule.critical))} critical."
+    )
+    return schedule
@@ -0,0 +1,223 @@
+import logging
+from collections import namedtuple
+from datetime import datetime
+
+from omniplan_exporter.db import indexes, operations
+
+logger = logging.getLogger(__name__)
+
+# A recorded snapshot: the ImportID it belongs to, when that import ran, and the
+# number of row keys whose rows were versioned by it.
+Snapshot = namedtuple("Snapshot", ["snapshot_id", "imported_at", "versioned_keys"])
+
+
+def create_snapshots_table(cursor):
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_snapshots (
+            SnapshotID INTEGER PRIMARY KEY,
+            VersionedKeys INTEGER,
+            FOREIGN KEY (SnapshotID) REFERENCES omniplan_imports(ImportID)
+        )
+        """
+    )
+
+
+def _columns(cursor, name):
+    return [
+        (row[1], row[2]) for row in cursor.execute(f"PRAGMA main.table_info({name})")
+    ]
+
+
+def history_indexes(name, key):
+    """
+    Returns the indexes of the history table of an import table: its key with
+    ValidFrom for snapshot lookups, the current versions of each key for
+    record_snapshot, and a copy of every index of the import table, so that a
+    snapshot is read through the same access paths as the current import.
+
+    Args:
+        name (str): The name of the import table, e.g. "omniplan_tasks".
+        key (str): The key column, the first column of the table.
+
+    Returns:
+        tuple: The Index records.
+    """
+    history = operations.history_table(name)
+    return (
+        indexes.Index(f"idx_{history}_key", history, f"{key}, ValidFrom"),
+        indexes.Index(f"idx_{history}_current", history, key, "ValidTo IS NULL"),
+        *(
+            indexes.Index(f"{index.name}_history", history, index.columns, index.where)
+            for index in indexes.INDEXES
+            if index.table == name
+        ),
+    )
+
+
+def create_history_table(cursor, name):
+    """
+    Creates the history table of an import table, or adds the columns the
+    import table gained since. It holds every version of every row, valid from
+    the snapshot that recorded it up to, but excluding, the snapshot that
+    replaced it (ValidTo is NULL while it is current).
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+        name (str): The name of the import table, which must exist.
+
+    Returns:
+        list: The column names of the import table.
+    """
+    columns = _columns(cursor, name)
+    history = operations.history_table(name)
+    recorded = {column for column, _ in _columns(cursor, history)}
+    if not recorded:
+        definitions = ", ".join(f"{column} {type_}" for column, type_ in columns)
+        cursor.execute(
+            f"CREATE TABLE {history} ("
+            f"{definitions}, ValidFrom INTEGER NOT NULL, ValidTo INTEGER)"
+        )
+    else:
+        for column, type_ in columns:
+            if column not in recorded:
+                cursor.execute(f"ALTER TABLE {history} ADD COLUMN {column} {type_}")
+    indexes.create_indexes(cursor, history_indexes(name, columns[0][0]))
+    return [column for column, _ in columns]
+
+
+def _version_table(cursor, name, snapshot_id):
+    """
+    Closes the current versions of the keys whose rows differ from the import
+    table and inserts their rows as the new versions. Rows are compared as a
+    set per key, like the row hashes of incremental imports.
+
+    Returns:
+        int: The number of keys versioned.
+    """
+    columns = create_history_table(cursor, name)
+    history = operations.history_table(name)
+    key = columns[0]
+    column_list = ", ".join(columns)
+    current = f"SELECT {column_list} FROM {history} WHERE ValidTo IS NULL"
+    cursor.execute("DROP TABLE IF EXISTS temp.snapshot_keys")
+    cursor.execute(
+        f"""
+        CREATE TEMP TABLE snapshot_keys AS
+        SELECT {key} AS RowKey FROM (SELECT {column_list} FROM {name} EXCEPT {current})
+        UNION
+        SELECT {key} FROM ({current} EXCEPT SELECT {column_list} FROM {name})
+        """
+    )
+    changed = cursor.execute("SELECT COUNT(*) FROM temp.snapshot_keys").fetchone()[0]
+    if changed:
+        cursor.execute(
+            f"""
+            UPDATE {history} SET ValidTo = ?
+            WHERE ValidTo IS NULL AND {key} IN (SELECT RowKey FROM temp.snapshot_keys)
+            """,
+            (snapshot_id,),
+        )
+        cursor.execute(
+            f"""
+            INSERT INTO {history} ({column_list}, ValidFrom)
+            SELECT {column_list}, ? FROM {name}
+            WHERE {key} IN (SELECT RowKey FROM temp.snapshot_keys)
+            """,
+            (snapshot_id,),
+        )
+    cursor.execute("DROP TABLE temp.snapshot_keys")
+    return changed
+
+
+def record_snapshot(conn, snapshot_id):
+    """
+    Records the current import tables as a snapshot, in a single transaction.
+
+    Only the keys whose rows changed since the previous snapshot get a new
+    version, and keys that disappeared have their version closed, so the history
+    grows with the amount of change rather than with the size of the plan. Since
+    the comparison is made against the loaded tables, imports made without a
+    snapshot in between are folded into the next one.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        snapshot_id (int): The ImportID of the import to record.
+
+    Returns:
+        dict: The number of versioned keys of each import table.
+    """
+    cursor = conn.cursor()
+    existing = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    versioned = {}
+    try:
+        if not conn.in_transaction:
+            cursor.execute("BEGIN")
+        create_snapshots_table(cursor)
+        for table, spec in operations.IMPORT_TABLES.items():
+            if spec.name in existing:
+                versioned[table] = _version_table(cursor, spec.name, snapshot_id)
+        cursor.execute(
+            "INSERT INTO omniplan_snapshots (SnapshotID, VersionedKeys) VALUES (?, ?)",
+            (snapshot_id, sum(versioned.values())),
+        )
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    logger.info(
+        f"Recorded snapshot {snapshot_id}, "
+        f"{sum(versioned.values())} row keys versioned."
+    )
+    return versioned
+
+
+def list_snapshots(conn):
+    """
+    Lists the recorded snapshots, oldest first.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+
+    Returns:
+        list: Snapshot records. Empty if no snapshot was recorded.
+    """
+    cursor = conn.cursor()
+    if not cursor.execute(
+        "SELECT 1 FROM sqlite_master WHERE name = 'omniplan_snapshots'"
+    ).fetchone():
+        return []
+    cursor.execute(
+        """
+        SELECT s.SnapshotID, i.ImportedAt, s.VersionedKeys
+        FROM omniplan_snapshots s
+        LEFT JOIN omniplan_imports i ON i.ImportID = s.SnapshotID
+        ORDER BY s.SnapshotID
+        """
+    )
+    return [Snapshot._make(row) for row in cursor]
+
+
+def snapshot_at(conn, moment):
+    """
+    Finds the snapshot that was current at a moment, to pass as as_of to the
+    query helpers.
+
+    Args:
+        conn (sqlite3.Connection): The SQLite database connection.
+        moment (datetime or str): The moment, or its ISO 8601 string.
+
+    Returns:
+        int: The ID of the last snapshot recorded at or before the moment, or
+        None if there is none.
+    """
+    if isinstance(moment, datetime):
+        moment = moment.isoformat(timespec="seconds")
+    snapshot_id = None
+    for snapshot in list_snapshots(conn):
+        if snapshot.imported_at is not None and snapshot.imported_at <= moment:
+            snapshot_id = snapshot.snapshot_id
+    return snapshot_id
@@ -0,0 +1,172 @@
+import json
+import logging
+import os
+from contextlib import contextmanager
+
+from omniplan_exporter.db import operations, snapshots
+
+logger = logging.getLogger(__name__)
+
+# The files SQLite may keep next to a database.
+_SIDE_FILES = ("", "-journal", "-wal", "-shm")
+
+
+class StagingError(Exception):
+    """
+    Raised when a staging database does not hold the rows that were extracted.
+    The live database is left untouched.
+    """
+
+
+def staging_path(db_name):
+    return f"{db_name}.staging"
+
+
+def _remove(path):
+    for suffix in _SIDE_FILES:
+        try:
+            os.remove(path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+@contextmanager
+def staging_database(db_name):
+    """
+    Provides an empty staging database next to the live one to build an import
+    in. The staging files are removed afterwards, whether the import was swapped
+    in or not.
+
+    Args:
+        db_name (str): The path to the live SQLite database file.
+
+    Yields:
+        str: The path to the staging database file.
+    """
+    path = staging_path(db_name)
+    _remove(path)
+    try:
+        yield path
+    finally:
+        _remove(path)
+
+
+def validate_counts(conn, expected):
+    """
+    Checks that every import table holds the number of rows that was extracted.
+
+    Args:
+        conn (sqlite3.Connection): The staging database connection.
+        expected (dict): The number of extracted rows keyed by table, as in
+            operations.IMPORT_TABLES.
+
+    Raises:
+        StagingError: If a table is missing or holds a different number of rows.
+    """
+    cursor = conn.cursor()
+    existing = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    for table, count in expected.items():
+        name = operations.IMPORT_TABLES[table].name
+        if name not in existing:
+            raise StagingError(f"{name} is missing from the staging database.")
+        (actual,) = cursor.execute(f"SELECT COUNT(*) FROM {name}").fetchone()
+        if actual != count:
+            raise StagingError(f"{name} holds {actual} rows, expected {count}.")
+
+
+def _carry_over_imports(conn, db_name):
+    """
+    Copies the import log and the snapshot history of the live database into
+    the staging database, so the swap keeps the history of earlier imports.
+    """
+    cursor = conn.cursor()
+    operations.create_imports_table(cursor)
+    cursor.execute("ATTACH DATABASE ? AS live", (db_name,))
+    try:
+        kept = cursor.execute(
+            r"""
+            SELECT name, sql FROM live.sqlite_master
+            WHERE type = 'table'
+            AND (name = 'omniplan_snapshots' OR name LIKE '%\_history' ESCAPE '\')
+            """
+        ).fetchall()
+        for _, sql in kept:
+            cursor.execute(sql)
+        if cursor.execute(
+            "SELECT 1 FROM live.sqlite_master WHERE name = 'omniplan_imports'"
+        ).fetchone():
+            kept.append(("omniplan_imports", None))
+        for name, _ in kept:
+            # By name, since the live import log may predate some columns.
+            columns = ", ".join(
+                row[1] for row in cursor.execute(f"PRAGMA live.table_info({name})")
+            )
+            cursor.execute(
+                f"INSERT INTO main.{name} ({columns}) SELECT {columns} FROM live.{name}"
+            )
+        # Index the copied history once it is in.
+        for (sql,) in cursor.execute(
+            """
+            SELECT sql FROM live.sqlite_master
+            WHERE type = 'index' AND sql IS NOT NULL AND tbl_name IN (
+                SELECT value FROM json_each(?)
+            )
+            """,
+            (json.dumps([name for name, _ in kept]),),
+        ).fetchall():
+            cursor.execute(sql)
+        conn.commit()
+    finally:
+        cursor.execute("DETACH DATABASE live")
+
+
+def swap_in(
+    staging_db, db_name, expected, source_path, source_fingerprint, snapshot=False
+):
+    """
+    Validates a staging database and replaces the live database with it.
+
+    The import is recorded in the staging database, then the whole database is
+    copied over the live one with the SQLite backup API in a single write
+    transaction. The live database is kept in WAL mode, so readers go on reading
+    their snapshot of the previous import during the copy and see the new one
+    once it is committed, and never block the swap. The staging database may be
+    a file or an open connection, e.g. to an import built in memory.
+
+    Args:
+        staging_db (str or sqlite3.Connection): The path to the staging database
+            file, or a connection to it. A connection is left open.
+        db_name (str): The path to the live SQLite database file.
+        expected (dict): The number of extracted rows keyed by table.
+        source_path (str): The path of the imported export.
+        source_fingerprint (Fingerprint): The fingerprint of the export.
+        snapshot (bool): Whether to record the import as a snapshot (see
+            omniplan_exporter.db.snapshots) before it is swapped in.
+
+    Raises:
+        StagingError: If the row counts do not match. Nothing is swapped in.
+    """
+    if isinstance(staging_db, str):
+        staging = operations.create_connection(staging_db)
+    else:
+        staging = staging_db
+    try:
+        validate_counts(staging, expected)
+        _carry_over_imports(staging, db_name)
+        import_id = operations.record_import(staging, source_path, source_fingerprint)
+        if snapshot:
+            snapshots.record_snapshot(staging, import_id)
+
+        live = operations.create_connection(db_name)
+        try:
+            live.execute("PRAGMA journal_mode = WAL")
+            staging.backup(live)
+        finally:
+            live.close()
+    finally:
+        if staging is not staging_db:
+            staging.close()
+    logger.info(f"Swapped the staging database into {db_name}.")
@@ -0,0 +1,358 @@
+import logging
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from omniplan_exporter.db import calendars
+from omniplan_exporter.utils import decoding
+
+logger = logging.getLogger(__name__)
+
+# The allocation of a resource without MaxUnits, as in MSPDI: 100%.
+DEFAULT_MAX_UNITS = 1.0
+
+# Units are summed and subtracted as floats; loads are rounded to this many
+# decimals so that they return to exactly zero, and compared with this margin.
+_PRECISION = 9
+_TOLERANCE = 1e-9
+
+# The tables written by build_utilization.
+UTILIZATION_TABLES = (
+    "omniplan_resource_load",
+    "omniplan_resource_overallocations",
+    "omniplan_resource_utilization",
+)
+
+INSERT_RESOURCE_LOAD_SQL = """
+    INSERT INTO omniplan_resource_load (
+        ResourceUID, StartEpoch, FinishEpoch, Units
+    ) VALUES (?, ?, ?, ?)
+"""
+
+INSERT_OVERALLOCATIONS_SQL = """
+    INSERT INTO omniplan_resource_overallocations (
+        ResourceUID, StartEpoch, FinishEpoch, PeakUnits, WorkingMinutes
+    ) VALUES (?, ?, ?, ?, ?)
+"""
+
+INSERT_RESOURCE_UTILIZATION_SQL = """
+    INSERT INTO omniplan_resource_utilization (
+        ResourceUID, MaxUnits, PeakUnits, PeakStartEpoch, LoadedSeconds,
+        OverAllocatedSeconds, OverAllocatedMinutes, OverAllocations
+    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+# A stretch of time in which a resource's allocation does not change. Times are
+# seconds since 1970-01-01 in the plan's own time, like the *Epoch columns.
+LoadSegment = namedtuple("LoadSegment", ["start", "finish", "units"])
+
+# A stretch of time in which a resource is allocated above its MaxUnits, with
+# its highest allocation and its working minutes in the resource's calendar
+# (None if unknown).
+Overallocation = namedtuple(
+    "Overallocation", ["start", "finish", "peak_units", "working_minutes"]
+)
+
+# The analysis of one resource: its load curve, over-allocations and totals.
+Utilization = namedtuple(
+    "Utilization",
+    [
+        "resource_uid",
+        "max_units",
+        "peak_units",
+        "peak_start",
+        "load",
+        "overallocations",
+    ],
+)
+
+
+def create_utilization_tables(cursor):
+    # The resource utilization of the plan, rebuilt by every import. The load
+    # curves and over-allocations are keyed by resource and start, so a
+    # resource's rows are read in order from the primary key.
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_resource_load (
+            ResourceUID INTEGER,
+            StartEpoch INTEGER,
+            FinishEpoch INTEGER,
+            Units REAL,
+            PRIMARY KEY (ResourceUID, StartEpoch),
+            FOREIGN KEY (ResourceUID) REFERENCES omniplan_resources(UID)
+        ) WITHOUT ROWID
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_resource_overallocations (
+            ResourceUID INTEGER,
+            StartEpoch INTEGER,
+            FinishEpoch INTEGER,
+            PeakUnits REAL,
+            WorkingMinutes INTEGER,
+            PRIMARY KEY (ResourceUID, StartEpoch),
+            FOREIGN KEY (ResourceUID) REFERENCES omniplan_resources(UID)
+        ) WITHOUT ROWID
+        """
+    )
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS omniplan_resource_utilization (
+            ResourceUID INTEGER PRIMARY KEY,
+            MaxUnits REAL,
+            PeakUnits REAL,
+            PeakStartEpoch INTEGER,
+            LoadedSeconds INTEGER,
+            OverAllocatedSeconds INTEGER,
+            OverAllocatedMinutes INTEGER,
+            OverAllocations INTEGER,
+            FOREIGN KEY (ResourceUID) REFERENCES omniplan_resources(UID)
+        )
+        """
+    )
+
+
+def load_curves(intervals):
+    """
+    Sweeps over the start and finish of every assignment to build the load curve
+    of each resource, in O(n log n) for n assignments.
+
+    Intervals without a start or finish, without units or that end before they
+    start are left out.
+
+    Args:
+        intervals (iterable): (ResourceUID, StartEpoch, FinishEpoch, Units)
+            rows, as in omniplan_assignments.
+
+    Returns:
+        dict: The LoadSegment lists of each resource keyed by resource UID, in
+        time order. Segments without load are left out and adjacent segments
+        with the same load are merged.
+    """
+    events = []
+    for resource_uid, start, finish, units in intervals:
+        if start is None or finish is None or finish <= start or not units:
+            continue
+        events.append((resource_uid, start, units))
+        events.append((resource_uid, finish, -units))
+    events.sort(key=lambda event: (event[0], event[1]))
+
+    curves = {}
+    curve = None
+    resource = previous = None
+    load = 0
+    for resource_uid, moment, delta in events:
+        if resource_uid != resource:
+            # Every curve returns to zero, so a new resource starts unloaded.
+            resource = resource_uid
+            curve = curves[resource_uid] = []
+            load = 0
+        elif moment != previous and load > _TOLERANCE:
+            if curve and curve[-1].finish == previous and curve[-1].units == load:
+                curve[-1] = curve[-1]._replace(finish=moment)
+            else:
+                curve.append(LoadSegment(previous, moment, load))
+        previous = moment
+        load = round(load + delta, _PRECISION)
+    return curves
+
+
+def find_overallocations(curve, max_units, calendar=None):
+    """
+    Finds the stretches of a load curve above a resource's MaxUnits.
+
+    Args:
+        curve (list): The LoadSegment records of the resource, in time order.
+        max_units (float): The allocation the resource can take.
+        calendar (WorkingCalendar): The resource's calendar, to count the
+            working minutes of each over-allocation, or None.
+
+    Returns:
+        list: The Overallocation records, in time order. Adjacent over-allocated
+        segments are one over-allocation.
+    """
+    windows = []
+    for segment in curve:
+        if segment.units <= max_units + _TOLERANCE:
+            continue
+        if windows and windows[-1].finish == segment.start:
+            windows[-1] = windows[-1]._replace(
+                finish=segment.finish,
+                peak_units=max(windows[-1].peak_units, segment.units),
+            )
+        else:
+            windows.append(Overallocation(*segment, None))
+    if calendar is not None:
+        windows = [
+            window._replace(
+                working_minutes=_working_minutes(calendar, window.start, window.finish)
+            )
+            for window in windows
+        ]
+    return windows
+
+
+def _working_minutes(calendar, start, finish):
+    try:
+        return calendar.working_minutes(
+            decoding.from_epoch(start), decoding.from_epoch(finish)
+        )
+    except ValueError:
+        return None
+
+
+def analyze_utilization(intervals, max_units, calendar_for=None):
+    """
+    Builds the load curve, over-allocations and peak of every resource.
+
+    Args:
+        intervals (iterable): (ResourceUID, StartEpoch, FinishEpoch, Units)
+            rows. Rows of resources missing from max_units are left out, e.g.
+            the unassigned resource of an export.
+        max_units (dict): The MaxUnits of each resource keyed by UID. None is
+            DEFAULT_MAX_UNITS.
+        calendar_for (callable): Returns the WorkingCalendar of a resource UID,
+            e.g. CalendarCache.for_resource, or None to leave the working
+            minutes of over-allocations out.
+
+    Returns:
+        list: The Utilization records of every resource of max_units, by UID.
+    """
+    curves = load_curves(row for row in intervals if row[0] in max_units)
+    results = []
+    for resource_uid in sorted(max_units):
+        limit = max_units[resource_uid]
+        if limit is None:
+            limit = DEFAULT_MAX_UNITS
+        curve = curves.get(resource_uid, [])
+        calendar = calendar_for(resource_uid) if calendar_for else None
+        peak = max(curve, key=lambda segment: segment.units, default=None)
+        results.append(
+            Utilization(
+                resource_uid,
+                limit,
+                peak.units if peak else 0,
+                peak.start if peak else None,
+                curve,
+                find_overallocations(curve, limit, calendar),
+            )
+        )
+    return results
+
+
+def _seconds(segments):
+    return sum(segment.finish - segment.start for segment in segments)
+
+
+def utilization_rows(utilization):
+    """
+    Returns the omniplan_resource_utilization row of a Utilization.
+    """
+    windows = utilization.overallocations
+    minutes = [window.working_minutes for window in windows]
+    return (
+        utilization.resource_uid,
+        utilization.max_units,
+        utilization.peak_units,
+        utilization.peak_start,
+        _seconds(utilization.load),
+        _seconds(windows),
+        None if None in minutes else sum(minutes),
+        len(windows),
+    )
+
+
+def build_utilization(cursor):
+    """
+    Analyzes the resource utilization of the imported plan and replaces the rows
+    of the utilization tables with it. Runs in the caller's transaction, e.g.
+    operations.import_transaction; nothing is committed.
+
+    Args:
+        cursor (sqlite3.Cursor): The database cursor.
+
+    Returns:
+        list: The Utilization records, or None if no resources were imported.
+    """
+    tables = {
+        row[0]
+        for row in cursor.execute("SELECT name FROM sqlite_master WHERE type='table'")
+    }
+    if not {"omniplan_resources", "omniplan_assignments"} <= tables:
+        return None
+    started = time.perf_counter()
+    max_units = dict(cursor.execute("SELECT UID, MaxUnits FROM omniplan_resources"))
+    intervals = cursor.execute(
+        "SELECT ResourceUID, StartEpoch, FinishEpoch, Units FROM omniplan_assignments"
+    ).fetchall()
+    calendar_for = None
+    if "omniplan_calendars" in tables:
+        calendar_for = calendars.CalendarCache(cursor.connection).for_resource
+    results = analyze_utilization(intervals, max_units, calendar_for)
+
+    create_utilization_tables(cursor)
+    for table in UTILIZATION_TABLES:
+        cursor.execute(f"DELETE FROM {table}")
+    cursor.executemany(
+        INSERT_RESOURCE_LOAD_SQL,
+        (
+            (utilization.resource_uid, *segment)
+            for utilization in results
+            for segment in utilization.load
+        ),
+    )
+    cursor.executemany(
+        INSERT_OVERALLOCATIONS_SQL,
+        (
+            (utilization.resource_uid, *window)
+            for utilization in results
+            for window in utilization.overallocations
+        ),
+    )
+    cursor.executemany(INSERT_RESOURCE_UTILIZATION_SQL, map(utilization_rows, results))
+    logger.info(
+        f"Analyzed {len(intervals)} assignments of {len(results)} resources in "
+        f"{time.perf_counter() - started:.2f}s, "
+        f"{sum(1 for utilization in results if utilization.overallocations)} "
+        "over-allocated."
+    )
+    return results
+
+
+def overallocated_weeks(overallocations, calendar=None):
+    """
+    Splits over-allocations into ISO weeks.
+
+    Args:
+        overallocations (iterable): Overallocation records, or (StartEpoch,
+            FinishEpoch, PeakUnits, ...) rows.
+        calendar (WorkingCalendar): The resource's calendar, to count working
+            hours, or None to count calendar hours.
+
+    Returns:
+        list: (ISO year, ISO week, hours, peak units) tuples in week order.
+        Weeks without working time over-allocated are left out.
+    """
+    weeks = {}
+    for start, finish, peak_units, *_ in overallocations:
+        moment = decoding.from_epoch(start)
+        end = decoding.from_epoch(finish)
+        while moment < end:
+            next_monday = moment.date() + timedelta(days=7 - moment.weekday())
+            week_end = min(end, datetime.combine(next_monday, datetime.min.time()))
+            minutes = None
+            if calendar is not None:
+                try:
+                    minutes = calendar.working_minutes(moment, week_end)
+                except ValueError:
+                    pass
+            if minutes is None:
+                minutes = (week_end - moment).total_seconds() / 60
+            # Over-allocations outside of working time do not count.
+            if minutes:
+                week = moment.isocalendar()[:2]
+                hours, peak = weeks.get(week, (0, 0))
+                weeks[week] = (hours + minutes / 60, max(peak, peak_units))
+            moment = week_end
+    return [(*week, hours, peak) for week, (hours, peak) in sorted(weeks.items())]
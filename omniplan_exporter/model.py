@@ -0,0 +1,199 @@
+import math
+from array import array
+from collections import namedtuple
+from datetime import datetime, timedelta
+from itertools import compress
+
+from omniplan_exporter.utils import decoding
+
+# One row of omniplan_tasks, in column order. Being a tuple, a Task can be passed
+# wherever the positional rows were used before, including as sqlite3 parameters.
+Task = namedtuple(
+    "Task",
+    [
+        "uid",
+        "id",
+        "name",
+        "outline_level",
+        "type",
+        "priority",
+        "start",
+        "finish",
+        "duration",
+        "work",
+        "actual_work",
+        "remaining_work",
+        "summary",
+        "milestone",
+        "notes",
+        "parent_uid",
+        "percent_complete",
+    ],
+)
+
+# The SELECT list that reads omniplan_tasks rows in Task order.
+TASK_COLUMNS_SQL = (
+    "UID, ID, Name, OutlineLevel, Type, Priority, Start, Finish, Duration, Work, "
+    "ActualWork, RemainingWork, Summary, Milestone, Notes, ParentUID, "
+    "PercentComplete"
+)
+
+# Stored in integer arrays for missing values, since arrays cannot hold None.
+MISSING = -(2**63)
+
+_EPOCH = datetime(1970, 1, 1)
+
+# Columns with few distinct values, which are shared between tasks.
+_POOLED_COLUMNS = ("duration", "work", "actual_work", "remaining_work")
+_INT_COLUMNS = (
+    "uid",
+    "id",
+    "outline_level",
+    "type",
+    "priority",
+    "summary",
+    "milestone",
+    "parent_uid",
+)
+
+
+def _to_int(value):
+    return MISSING if value is None or value == "" else int(value)
+
+
+def _from_int(value):
+    return None if value == MISSING else value
+
+
+def _from_epoch(seconds):
+    return None if seconds == MISSING else _EPOCH + timedelta(seconds=seconds)
+
+
+class TaskTable:
+    """
+    Columnar store of Task records.
+
+    Integer columns live in 64-bit arrays (MISSING marks an empty value),
+    PercentComplete in a float array (NaN when empty), Start and Finish as epoch
+    seconds, and the duration strings in lists that share one string object per
+    distinct value. A task costs a few dozen bytes plus its name and notes,
+    instead of a tuple of separately allocated objects.
+
+    Values are normalized to the omniplan_tasks column types, so tasks read back
+    from a table have integer UIDs and datetime Start/Finish whether they came
+    from the XML export or from the database.
+    """
+
+    def __init__(self):
+        for column in _INT_COLUMNS:
+            setattr(self, column, array("q"))
+        self.percent_complete = array("d")
+        self.start_epoch = array("q")
+        self.finish_epoch = array("q")
+        self.name = []
+        self.notes = []
+        for column in _POOLED_COLUMNS:
+            setattr(self, column, [])
+        self._strings = {}
+
+    @classmethod
+    def from_tasks(cls, tasks):
+        """
+        Builds a table from Task records or positional task rows.
+
+        Args:
+            tasks (iterable): The tasks, e.g. from extract_operations.stream_project
+            or operations.get_tasks.
+
+        Returns:
+            TaskTable: The table.
+        """
+        table = cls()
+        for task in tasks:
+            table.append(task)
+        return table
+
+    def append(self, task):
+        task = Task._make(task)
+        for column in _INT_COLUMNS:
+            getattr(self, column).append(_to_int(getattr(task, column)))
+        self.percent_complete.append(
+            math.nan if task.percent_complete is None else task.percent_complete
+        )
+        self.start_epoch.append(_to_int(decoding.date_columns(task.start)[0]))
+        self.finish_epoch.append(_to_int(decoding.date_columns(task.finish)[0]))
+        self.name.append(task.name)
+        self.notes.append(task.notes)
+        strings = self._strings
+        for column in _POOLED_COLUMNS:
+            value = getattr(task, column)
+            getattr(self, column).append(strings.setdefault(value, value))
+
+    def __len__(self):
+        return len(self.uid)
+
+    def __getitem__(self, index):
+        percent_complete = self.percent_complete[index]
+        return Task(
+            _from_int(self.uid[index]),
+            _from_int(self.id[index]),
+            self.name[index],
+            _from_int(self.outline_level[index]),
+            _from_int(self.type[index]),
+            _from_int(self.priority[index]),
+            _from_epoch(self.start_epoch[index]),
+            _from_epoch(self.finish_epoch[index]),
+            self.duration[index],
+            self.work[index],
+            self.actual_work[index],
+            self.remaining_work[index],
+            _from_int(self.summary[index]),
+            _from_int(self.milestone[index]),
+            self.notes[index],
+            _from_int(self.parent_uid[index]),
+            None if math.isnan(percent_complete) else percent_complete,
+        )
+
+    def __iter__(self):
+        return map(self.__getitem__, range(len(self)))
+
+    def select(self, outline_level=None, milestone=None, parent_uids=None):
+        """
+        Finds the tasks matching every given condition, scanning one column at a
+        time.
+
+        Args:
+            outline_level (int, optional): The required OutlineLevel.
+            milestone (int, optional): The required Milestone flag.
+            parent_uids (iterable, optional): The allowed ParentUIDs.
+
+        Returns:
+            list: The indexes of the matching tasks, in table order.
+        """
+        # The most selective condition goes first.
+        conditions = []
+        if parent_uids is not None:
+            conditions.append((self.parent_uid, frozenset(parent_uids).__contains__))
+        if outline_level is not None:
+            conditions.append((self.outline_level, outline_level.__eq__))
+        if milestone is not None:
+            conditions.append((self.milestone, int(milestone).__eq__))
+
+        # The first condition scans the whole column, the others only the rows
+        # that are still candidates.
+        indexes = range(len(self))
+        for column, predicate in conditions:
+            values = (
+                column
+                if len(indexes) == len(column)
+                else map(column.__getitem__, indexes)
+            )
+            indexes = list(compress(indexes, map(predicate, values)))
+        return list(indexes)
+
+    def where(self, **conditions):
+        """
+        Returns the matching tasks as Task records. Takes the same conditions as
+        select.
+        """
+        return [self[index] for index in self.select(**conditions)]
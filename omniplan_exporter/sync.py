@@ -1,14 +1,21 @@
-import sqlite3
 import argparse
 import logging
-from datetime import datetime
-from omniplan_exporter.db import operations
-from omniplan_exporter.utils.conversions import convert_duration_from_iso8601_to_jira
+from collections import namedtuple
+from omniplan_exporter.db import operations, pool
+from omniplan_exporter.utils import decoding
+from omniplan_exporter.utils.conversions import format_jira_duration
 from omniplan_exporter.jira.integration import update_jira_issue
 from config import JIRA_BASE_URL
 
 logger = logging.getLogger(__name__)
 
+# A task with a Jira number, holding the fields that are synchronized to Jira.
+# work and actual_work are in seconds.
+JiraTask = namedtuple(
+    "JiraTask",
+    ["name", "jira_number", "start", "finish", "work", "actual_work"],
+)
+
 
 def sync_omniplan_with_jira(conn, bearer_token, dry_run=False):
     """
@@ -29,26 +36,13 @@ def sync_omniplan_with_jira(conn, bearer_token, dry_run=False):
 
     # Fetch tasks with outline_level=2
     tasks = operations.get_tasks_by_outline(conn, outline_level=2)
-    tasks = [
-        (uid, name, finish_date, start_date, work, actual_work)
-        for uid, name, finish_date, start_date, work, actual_work, parent_uid in tasks
-    ]
 
     # Fetch tasks with outline_level=1
     outline_level_1_tasks = operations.get_tasks_by_outline(conn, outline_level=1)
 
     # Set work and actual_work to None for outline_level=1 tasks
     outline_level_1_tasks = [
-        (uid, name, finish_date, start_date, None, None)
-        for (
-            uid,
-            name,
-            finish_date,
-            start_date,
-            work,
-            actual_work,
-            parent_uid,
-        ) in outline_level_1_tasks
+        task._replace(work=None, actual_work=None) for task in outline_level_1_tasks
     ]
 
     # Add outline_level_1_tasks to the list
@@ -58,7 +52,7 @@ def sync_omniplan_with_jira(conn, bearer_token, dry_run=False):
     fetch_tasks_with_jira_numbers(conn, tasks, tasks_with_jira)
 
     # Sort tasks by Jira number
-    tasks_with_jira.sort(key=lambda x: x[1])
+    tasks_with_jira.sort(key=lambda task: task.jira_number)
 
     # Update all tasks in Jira
     for task in tasks_with_jira:
@@ -67,23 +61,19 @@ def sync_omniplan_with_jira(conn, bearer_token, dry_run=False):
 
         # Format target_start and target_end
         target_start = (
-            datetime.fromisoformat(start_date).strftime("%Y-%m-%d")
+            decoding.parse_datetime(start_date).strftime("%Y-%m-%d")
             if start_date
             else None
         )
         target_end = (
-            datetime.fromisoformat(finish_date).strftime("%Y-%m-%d")
+            decoding.parse_datetime(finish_date).strftime("%Y-%m-%d")
             if finish_date
             else None
         )
 
         # Convert work and actual_work to Jira-supported format
-        original_estimate = (
-            convert_duration_from_iso8601_to_jira(work) if work else "0h"
-        )
-        worklog_duration = (
-            convert_duration_from_iso8601_to_jira(actual_work) if actual_work else None
-        )
+        original_estimate = format_jira_duration(work) if work is not None else "0h"
+        worklog_duration = format_jira_duration(actual_work)
 
         if dry_run:
             # Log the changes that would be made
@@ -107,12 +97,23 @@ def sync_omniplan_with_jira(conn, bearer_token, dry_run=False):
 
 
 def fetch_tasks_with_jira_numbers(conn, tasks, tasks_with_jira):
+    uids = [task.uid for task in tasks]
+    jira_numbers = operations.get_jira_numbers(conn, uids)
+    work_seconds = operations.get_work_seconds(conn, uids)
     for task in tasks:
-        uid, name, finish_date, start_date, work, actual_work = task
-        jira_number = operations.get_jira_number(conn, uid)
+        jira_number = jira_numbers.get(task.uid)
         if jira_number:
+            work, actual_work = work_seconds.get(task.uid, (None, None))
             tasks_with_jira.append(
-                (name, jira_number, start_date, finish_date, work, actual_work)
+                JiraTask(
+                    task.name,
+                    jira_number,
+                    task.start,
+                    task.finish,
+                    # Tasks whose work is cleared (outline level 1) sync none.
+                    work if task.work else None,
+                    actual_work if task.actual_work else None,
+                )
             )
 
 
@@ -141,7 +142,7 @@ def main():
 
     try:
         # Connect to the SQLite database
-        conn = sqlite3.connect(args.db_path)
+        conn = pool.connect_read_only(args.db_path)
         logger.info(f"Connected to database at {args.db_path}")
 
         # Call the synchronization function
@@ -20,3 +20,35 @@ def convert_duration_from_iso8601_to_jira(duration):
     minutes = match.group(2) or "0"
     jira_format = f"{hours}h {minutes}m".strip()
     return jira_format
+
+
+def format_jira_duration(seconds):
+    """
+    Formats a number of seconds as a Jira duration.
+
+    Args:
+        seconds (int): The duration in seconds (e.g., 5400).
+
+    Returns:
+        str: The duration in Jira format (e.g., "1h 30m"), or None if there is no
+        duration.
+    """
+    if seconds is None:
+        return None
+    return f"{seconds // 3600}h {seconds % 3600 // 60}m"
+
+
+def normalize_jira_key(jira_key):
+    """
+    Normalizes a Jira key for case-insensitive lookups.
+
+    Args:
+        jira_key (str): The Jira key (e.g., " mup-123").
+
+    Returns:
+        str: The key without surrounding whitespace in upper case (e.g.,
+        "MUP-123"), or None if there is no key.
+    """
+    if jira_key is None:
+        return None
+    return jira_key.strip().upper()
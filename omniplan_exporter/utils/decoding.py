@@ -0,0 +1,124 @@
+from datetime import datetime, timedelta
+from functools import lru_cache
+
+import isodate
+
+_EPOCH = datetime(1970, 1, 1)
+_EPOCH_ORDINAL = _EPOCH.toordinal()
+_SECONDS_PER_DAY = 86400
+
+# The length of a working day, in which effort is reported, for plans without a
+# calendar. Imports recount work days in days of the project calendar (see
+# omniplan_exporter.db.calendars.project_day_hours).
+WORK_DAY_HOURS = 7.5
+_WORK_DAY_SECONDS = WORK_DAY_HOURS * 3600
+
+
+@lru_cache(maxsize=65536)
+def parse_datetime(value):
+    """
+    Parses an MSPDI or SQLite datetime string (e.g., "2023-01-02T08:00:00" or
+    "2023-01-02 08:00:00").
+
+    Plans repeat the same start and finish timestamps over and over, so results
+    are memoized.
+
+    Args:
+        value (str): The datetime string.
+
+    Returns:
+        datetime: The parsed datetime.
+
+    Raises:
+        ValueError: If the string is not an ISO 8601 datetime.
+    """
+    return datetime.fromisoformat(value)
+
+
+@lru_cache(maxsize=65536)
+def date_columns(value):
+    """
+    Converts a datetime into the integer columns stored alongside it.
+
+    The epoch is counted in the plan's own (naive) time, so day numbers line up
+    with calendar days in the plan rather than with UTC.
+
+    Args:
+        value (datetime or str): The datetime, its ISO 8601 string, or None.
+
+    Returns:
+        tuple: Seconds and whole days since 1970-01-01, or (None, None) if the
+        value is empty or not a valid datetime.
+    """
+    if not value:
+        return None, None
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            return None, None
+    day = value.toordinal() - _EPOCH_ORDINAL
+    seconds = (
+        day * _SECONDS_PER_DAY + value.hour * 3600 + value.minute * 60 + value.second
+    )
+    return seconds, day
+
+
+def from_epoch(seconds):
+    """
+    Converts the seconds of date_columns back into a (naive) datetime.
+
+    Args:
+        seconds (int): Seconds since 1970-01-01 in the plan's own time.
+
+    Returns:
+        datetime: The datetime.
+    """
+    return _EPOCH + timedelta(seconds=seconds)
+
+
+@lru_cache(maxsize=65536)
+def duration_columns(value):
+    """
+    Converts an MSPDI duration into the numeric columns stored alongside it.
+
+    Plans repeat the same work and duration values over and over, so results are
+    memoized.
+
+    Args:
+        value (str): The ISO 8601 duration (e.g., "PT45H0M0S"), or None.
+
+    Returns:
+        tuple: Whole seconds and working days of WORK_DAY_HOURS, or (None, None)
+        if the value is empty or not a valid duration.
+    """
+    if not value:
+        return None, None
+    try:
+        duration = isodate.parse_duration(value)
+    except (isodate.ISO8601Error, TypeError):
+        return None, None
+    if isinstance(duration, isodate.Duration):
+        # Months and years have no fixed length.
+        return None, None
+    seconds = round(duration.total_seconds())
+    return seconds, seconds / _WORK_DAY_SECONDS
+
+
+def to_date(value):
+    """
+    Returns the date part of a datetime string, or "N/A" if it is empty or
+    invalid.
+
+    Args:
+        value (str): The datetime string.
+
+    Returns:
+        date or str: The date, or "N/A".
+    """
+    if not value:
+        return "N/A"
+    try:
+        return parse_datetime(value).date()
+    except ValueError:
+        return "N/A"
@@ -0,0 +1,67 @@
+import hashlib
+import os
+from collections import namedtuple
+
+# Size and modification time of a file plus a hash of its contents.
+Fingerprint = namedtuple("Fingerprint", ["size", "mtime_ns", "content_hash"])
+
+_CHUNK_SIZE = 1 << 20
+
+
+def content_hash(file_path):
+    """
+    Hashes a file in fixed-size chunks, so memory use does not depend on the
+    size of the file.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        str: The hex digest of the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=20)
+    with open(file_path, "rb") as file:
+        for chunk in iter(lambda: file.read(_CHUNK_SIZE), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def matches(file_path, previous):
+    """
+    Checks whether a file still has the fingerprint recorded earlier.
+
+    The size and modification time are compared first, which costs a single stat
+    call. The contents are only hashed when those differ, so a file that was
+    touched or copied without being changed still matches.
+
+    Args:
+        file_path (str): The path to the file.
+        previous (Fingerprint): The fingerprint recorded earlier, or None.
+
+    Returns:
+        tuple: Whether the file matches, and its current Fingerprint. The
+        content_hash of the returned fingerprint is None if it was not needed.
+    """
+    stat = os.stat(file_path)
+    if previous is None:
+        return False, Fingerprint(stat.st_size, stat.st_mtime_ns, None)
+    if (stat.st_size, stat.st_mtime_ns) == (previous.size, previous.mtime_ns):
+        return True, Fingerprint(stat.st_size, stat.st_mtime_ns, previous.content_hash)
+    if stat.st_size != previous.size:
+        return False, Fingerprint(stat.st_size, stat.st_mtime_ns, None)
+    current = Fingerprint(stat.st_size, stat.st_mtime_ns, content_hash(file_path))
+    return current.content_hash == previous.content_hash, current
+
+
+def fingerprint(file_path):
+    """
+    Computes the full fingerprint of a file.
+
+    Args:
+        file_path (str): The path to the file.
+
+    Returns:
+        Fingerprint: The size, modification time and content hash.
+    """
+    stat = os.stat(file_path)
+    return Fingerprint(stat.st_size, stat.st_mtime_ns, content_hash(file_path))
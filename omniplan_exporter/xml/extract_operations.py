@@ -1,308 +1,336 @@
-from datetime import datetime
+from collections import namedtuple
 import logging
+import xml.etree.ElementTree as ET
+from omniplan_exporter.model import Task, TaskTable
+from omniplan_exporter.utils import decoding
+from omniplan_exporter.utils.conversions import normalize_jira_key
+
+MSPDI_NAMESPACE = "http://schemas.microsoft.com/project"
+_NAMESPACE_PREFIX = "{" + MSPDI_NAMESPACE + "}"
+
+# Repeating elements that are streamed one at a time, keyed to their section.
+STREAMED_ELEMENTS = {
+    "Task": "Tasks",
+    "Resource": "Resources",
+    "Assignment": "Assignments",
+    "Calendar": "Calendars",
+}
+
+
+# Tables produced by the extractor, in the order they are loaded.
+TABLES = (
+    "tasks",
+    "resources",
+    "assignments",
+    "calendars",
+    "calendar_weekdays",
+    "calendar_exceptions",
+    "extended_attributes",
+    "predecessor_links",
+    "task_closure",
+    "jira_keys",
+)
+
+# The extended attribute that holds the Jira key of a task.
+JIRA_KEY_FIELD_ID = "188743731"
+
+# Maps an MSPDI child tag to a table column and an optional converter that is
+# applied to the element text. A tag of None marks a derived column.
+Field = namedtuple("Field", ["tag", "column", "converter"])
+
+
+TASK_FIELDS = (
+    Field("UID", "UID", None),
+    Field("ID", "ID", None),
+    Field("Name", "Name", None),
+    Field("OutlineLevel", "OutlineLevel", int),
+    Field("Type", "Type", None),
+    Field("Priority", "Priority", None),
+    Field("Start", "Start", decoding.parse_datetime),
+    Field("Finish", "Finish", decoding.parse_datetime),
+    Field("Duration", "Duration", None),
+    Field("Work", "Work", None),
+    Field("ActualWork", "ActualWork", None),
+    Field("RemainingWork", "RemainingWork", None),
+    Field("Summary", "Summary", int),
+    Field("Milestone", "Milestone", int),
+    Field("Notes", "Notes", None),
+    Field(None, "ParentUID", None),
+    Field("PercentComplete", "PercentComplete", float),
+)
+
+RESOURCE_FIELDS = (
+    Field("UID", "UID", None),
+    Field("ID", "ID", None),
+    Field("Name", "Name", None),
+    Field("Type", "Type", None),
+    Field("MaxUnits", "MaxUnits", None),
+    Field("CalendarUID", "CalendarUID", None),
+    Field("Group", "GroupName", None),
+)
+
+ASSIGNMENT_FIELDS = (
+    Field("UID", "UID", None),
+    Field("TaskUID", "TaskUID", None),
+    Field("ResourceUID", "ResourceUID", None),
+    Field("Milestone", "Milestone", None),
+    Field("PercentWorkComplete", "PercentWorkComplete", None),
+    Field("Units", "Units", None),
+    Field("Work", "Work", None),
+    Field("ActualWork", "ActualWork", None),
+    Field("RemainingWork", "RemainingWork", None),
+    Field("Start", "Start", None),
+    Field("Finish", "Finish", None),
+)
+
+CALENDAR_FIELDS = (
+    Field("UID", "UID", None),
+    Field("Name", "Name", None),
+    Field("IsBaseCalendar", "IsBaseCalendar", None),
+    Field("BaseCalendarUID", "BaseCalendarUID", None),
+)
+
+WEEKDAY_FIELDS = (
+    Field("DayType", "DayType", None),
+    Field("DayWorking", "DayWorking", None),
+)
+
+WORKING_TIME_FIELDS = (
+    Field("FromTime", "FromTime", None),
+    Field("ToTime", "ToTime", None),
+)
+
+EXCEPTION_FIELDS = (
+    Field("UID", "ExceptionUID", None),
+    Field("Name", "Name", None),
+    Field("FromDate", "FromDate", None),
+    Field("ToDate", "ToDate", None),
+    Field("DayWorking", "DayWorking", None),
+)
+
+EXTENDED_ATTRIBUTE_FIELDS = (
+    Field("FieldID", "FieldID", None),
+    Field("Value", "Value", None),
+)
+
+PREDECESSOR_LINK_FIELDS = (
+    Field("PredecessorUID", "PredecessorUID", None),
+    Field("Type", "Type", None),
+    Field("LinkLag", "LinkLag", None),
+)
+
+_TASK_PARENT_UID = [field.column for field in TASK_FIELDS].index("ParentUID")
+
+# The tables that need the task row itself.
+_TASK_ROW_TABLES = frozenset(("tasks", "task_closure", "jira_keys"))
+
+
+def _child_index(element):
+    """
+    Maps each child tag to its text in a single pass over the children. The first
+    occurrence of a tag wins, matching Element.find.
+    """
+    return {child.tag: child.text for child in reversed(element)}
+
+
+def _extract_fields(index, fields):
+    """
+    Builds a row from a child index according to a field mapping.
+
+    Args:
+        index (dict): The child tag to text mapping of an element.
+        fields (tuple): The Field mapping of the table.
+
+    Returns:
+        list: The converted column values, None where a tag is missing.
+    """
+    row = []
+    for tag, _, converter in fields:
+        value = index.get(tag)
+        if value is not None and converter is not None:
+            value = converter(value)
+        row.append(value)
+    return row
 
 
 def extract_tasks(root):
-    tasks = []
-    seen_uids = set()
-    parent_stack = []
-
-    for task in root.findall("./Tasks/Task"):
-        uid = task.find("UID").text if task.find("UID") is not None else None
-        if uid in seen_uids:
-            logging.error(f"Detected duplicate task uid: {uid}")
-            continue
-        seen_uids.add(uid)
-
-        task_id = task.find("ID").text if task.find("ID") is not None else None
-        name = task.find("Name").text if task.find("Name") is not None else None
-        task_type = task.find("Type").text if task.find("Type") is not None else None
-        priority = (
-            task.find("Priority").text if task.find("Priority") is not None else None
-        )
-        start_str = task.find("Start").text if task.find("Start") is not None else None
-        finish_str = (
-            task.find("Finish").text if task.find("Finish") is not None else None
-        )
-        start = datetime.strptime(start_str, "%Y-%m-%dT%H:%M:%S") if start_str else None
-        finish = (
-            datetime.strptime(finish_str, "%Y-%m-%dT%H:%M:%S") if finish_str else None
-        )
-        duration = (
-            task.find("Duration").text if task.find("Duration") is not None else None
-        )
-        work = task.find("Work").text if task.find("Work") is not None else None
-        actual_work = (
-            task.find("ActualWork").text
-            if task.find("ActualWork") is not None
-            else None
-        )
-        remaining_work = (
-            task.find("RemainingWork").text
-            if task.find("RemainingWork") is not None
-            else None
-        )
-        summary = (
-            int(task.find("Summary").text) if task.find("Summary") is not None else None
-        )
-        milestone = (
-            int(task.find("Milestone").text)
-            if task.find("Milestone") is not None
-            else None
-        )
-        notes = task.find("Notes").text if task.find("Notes") is not None else None
-        outline_level = (
-            int(task.find("OutlineLevel").text)
-            if task.find("OutlineLevel") is not None
-            else None
-        )
-        percent_complete = (
-            float(task.find("PercentComplete").text)
-            if task.find("PercentComplete") is not None
+    return extract_all(root, ("tasks",))["tasks"]
+
+
+def extract_task_rows(task, tables=TABLES):
+    """
+    Extracts the rows a single Task element contributes to the given tables.
+
+    The task row is returned with its ParentUID unresolved, since the parent can
+    only be determined in document order (see link_task).
+
+    Args:
+        task (Element): The Task element.
+        tables (iterable): The tables to extract rows for.
+
+    Returns:
+        tuple: The task row as a list (or None if no table derived from it is
+        requested), and the extended attribute and predecessor link rows.
+    """
+    return (
+        (
+            _extract_fields(_child_index(task), TASK_FIELDS)
+            if not _TASK_ROW_TABLES.isdisjoint(tables)
             else None
-        )
-
-        # Determine the parent UID based on the outline level
-        while parent_stack and parent_stack[-1][1] >= outline_level:
-            parent_stack.pop()
-        parent_uid = parent_stack[-1][0] if parent_stack else None
-        parent_stack.append((uid, outline_level))
-
-        # logging.info(f"Extracted task: {name}, start: {start}")
-        tasks.append(
-            (
-                uid,
-                task_id,
-                name,
-                outline_level,
-                task_type,
-                priority,
-                start,
-                finish,
-                duration,
-                work,
-                actual_work,
-                remaining_work,
-                summary,
-                milestone,
-                notes,
-                parent_uid,
-                percent_complete,
-            )
-        )
+        ),
+        (
+            _extract_extended_attributes(task)
+            if "extended_attributes" in tables or "jira_keys" in tables
+            else []
+        ),
+        _extract_predecessor_links(task) if "predecessor_links" in tables else [],
+    )
+
+
+def link_task(row, seen_uids, parent_stack):
+    """
+    Resolves the ParentUID of a task row, skipping duplicate task UIDs. Rows must
+    be linked in document order.
+
+    Args:
+        row (list): The task row from extract_task_rows.
+        seen_uids (set): The UIDs of the tasks linked so far.
+        parent_stack (list): (uid, outline_level) pairs of the open ancestors.
+
+    Returns:
+        Task: The task record, or None if the task UID is a duplicate.
+    """
+    uid = row[0]
+    if uid in seen_uids:
+        logging.error(f"Detected duplicate task uid: {uid}")
+        return None
+    seen_uids.add(uid)
+    outline_level = row[3]
+
+    # Determine the parent UID based on the outline level
+    while parent_stack and parent_stack[-1][1] >= outline_level:
+        parent_stack.pop()
+    row[_TASK_PARENT_UID] = parent_stack[-1][0] if parent_stack else None
+    parent_stack.append((uid, outline_level))
+
+    return Task._make(row)
+
 
-    return tasks
+def closure_rows(parent_stack):
+    """
+    Returns the task closure rows of the task that was linked last: one per
+    ancestor, and one for the task itself at depth 0.
+
+    Args:
+        parent_stack (list): The parent stack of link_task, with the task on top.
+
+    Returns:
+        list: (ancestor UID, task UID, depth) tuples, the top-level task first.
+    """
+    uid = parent_stack[-1][0]
+    top = len(parent_stack) - 1
+    return [
+        (ancestor, uid, top - index) for index, (ancestor, _) in enumerate(parent_stack)
+    ]
+
+
+def extract_task_closure(root):
+    return extract_all(root, ("task_closure",))["task_closure"]
+
+
+def jira_key_row(uid, extended_attributes):
+    """
+    Returns the Jira key row of a task: its UID, its first Jira key attribute as
+    exported, and that key normalized for lookups.
+
+    Args:
+        uid (str): The task UID.
+        extended_attributes (list): The extended attribute rows of the task.
+
+    Returns:
+        tuple: The (TaskUID, JiraKey, NormalizedKey) row, or None if the task has
+        no Jira key attribute.
+    """
+    for _, field_id, value in extended_attributes:
+        if field_id == JIRA_KEY_FIELD_ID:
+            return uid, value, normalize_jira_key(value)
+    return None
+
+
+def extract_jira_keys(root):
+    return extract_all(root, ("jira_keys",))["jira_keys"]
 
 
 def extract_resources(root):
-    resources = []
-    for resource in root.findall("./Resources/Resource"):
-        uid = resource.find("UID").text if resource.find("UID") is not None else None
-        resource_id = (
-            resource.find("ID").text if resource.find("ID") is not None else None
-        )
-        name = resource.find("Name").text if resource.find("Name") is not None else None
-        resource_type = (
-            resource.find("Type").text if resource.find("Type") is not None else None
-        )
-        max_units = (
-            resource.find("MaxUnits").text
-            if resource.find("MaxUnits") is not None
-            else None
-        )
-        calendar_uid = (
-            resource.find("CalendarUID").text
-            if resource.find("CalendarUID") is not None
-            else None
-        )
-        group = (
-            resource.find("Group").text if resource.find("Group") is not None else None
-        )
+    return extract_all(root, ("resources",))["resources"]
 
-        # logging.info(f"Extracted resource: {name}, group: {group}")
-        resources.append(
-            (uid, resource_id, name, resource_type, max_units, calendar_uid, group)
-        )
 
-    return resources
+def _extract_resource(resource):
+    return tuple(_extract_fields(_child_index(resource), RESOURCE_FIELDS))
 
 
 def extract_assignments(root):
-    assignments = []
-    for assignment in root.findall("./Assignments/Assignment"):
-        uid = (
-            assignment.find("UID").text if assignment.find("UID") is not None else None
-        )
-        task_uid = (
-            assignment.find("TaskUID").text
-            if assignment.find("TaskUID") is not None
-            else None
-        )
-        resource_uid = (
-            assignment.find("ResourceUID").text
-            if assignment.find("ResourceUID") is not None
-            else None
-        )
-        milestone = (
-            assignment.find("Milestone").text
-            if assignment.find("Milestone") is not None
-            else None
-        )
-        percent_work_complete = (
-            assignment.find("PercentWorkComplete").text
-            if assignment.find("PercentWorkComplete") is not None
-            else None
-        )
-        units = (
-            assignment.find("Units").text
-            if assignment.find("Units") is not None
-            else None
-        )
-        work = (
-            assignment.find("Work").text
-            if assignment.find("Work") is not None
-            else None
-        )
-        actual_work = (
-            assignment.find("ActualWork").text
-            if assignment.find("ActualWork") is not None
-            else None
-        )
-        remaining_work = (
-            assignment.find("RemainingWork").text
-            if assignment.find("RemainingWork") is not None
-            else None
-        )
-        start = (
-            assignment.find("Start").text
-            if assignment.find("Start") is not None
-            else None
-        )
-        finish = (
-            assignment.find("Finish").text
-            if assignment.find("Finish") is not None
-            else None
-        )
-
-        # logging.info(
-        #     f"Extracted assignment: UID {uid}, TaskUID {task_uid}, "
-        #     f"ResourceUID {resource_uid}"
-        # )
-        assignments.append(
-            (
-                uid,
-                task_uid,
-                resource_uid,
-                milestone,
-                percent_work_complete,
-                units,
-                work,
-                actual_work,
-                remaining_work,
-                start,
-                finish,
-            )
-        )
+    return extract_all(root, ("assignments",))["assignments"]
+
 
-    return assignments
+def _extract_assignment(assignment):
+    return tuple(_extract_fields(_child_index(assignment), ASSIGNMENT_FIELDS))
 
 
 def extract_calendars(root):
-    calendars = []
-    for calendar in root.findall("./Calendars/Calendar"):
-        uid = calendar.find("UID").text if calendar.find("UID") is not None else None
-        name = calendar.find("Name").text if calendar.find("Name") is not None else None
-        is_base_calendar = (
-            calendar.find("IsBaseCalendar").text
-            if calendar.find("IsBaseCalendar") is not None
-            else None
-        )
-        base_calendar_uid = (
-            calendar.find("BaseCalendarUID").text
-            if calendar.find("BaseCalendarUID") is not None
-            else None
-        )
+    return extract_all(root, ("calendars",))["calendars"]
 
-        # logging.info(f"Extracted calendar: {name}, UID: {uid}")
-        calendars.append((uid, name, is_base_calendar, base_calendar_uid))
 
-    return calendars
+def _extract_calendar(calendar):
+    return tuple(_extract_fields(_child_index(calendar), CALENDAR_FIELDS))
 
 
 def extract_calendar_weekdays(root):
-    calendar_weekdays = []
-    for calendar in root.findall("./Calendars/Calendar"):
-        calendar_uid = (
-            calendar.find("UID").text if calendar.find("UID") is not None else None
-        )
-        for weekday in calendar.findall("./WeekDays/WeekDay"):
-            day_type = (
-                weekday.find("DayType").text
-                if weekday.find("DayType") is not None
-                else None
-            )
-            day_working = (
-                weekday.find("DayWorking").text
-                if weekday.find("DayWorking") is not None
-                else None
-            )
+    return extract_all(root, ("calendar_weekdays",))["calendar_weekdays"]
 
-            for working_time in weekday.findall("./WorkingTimes/WorkingTime"):
-                from_time = (
-                    working_time.find("FromTime").text
-                    if working_time.find("FromTime") is not None
-                    else None
-                )
-                to_time = (
-                    working_time.find("ToTime").text
-                    if working_time.find("ToTime") is not None
-                    else None
-                )
 
-                # logging.info(
-                #     f"Extracted calendar weekday: {calendar_uid}, "
-                #     f"day type: {day_type}, "
-                #     f"day working: {day_working}, from time: {from_time}, "
-                #     f"to time: {to_time}"
-                # )
-                calendar_weekdays.append(
-                    (calendar_uid, day_type, day_working, from_time, to_time)
+def _extract_calendar_weekdays(calendar):
+    calendar_weekdays = []
+    calendar_uid = calendar.findtext("UID")
+    for weekday in calendar.findall("./WeekDays/WeekDay"):
+        day_fields = _extract_fields(_child_index(weekday), WEEKDAY_FIELDS)
+        working_times = weekday.findall("./WorkingTimes/WorkingTime")
+        for working_time in working_times:
+            calendar_weekdays.append(
+                (
+                    calendar_uid,
+                    *day_fields,
+                    *_extract_fields(_child_index(working_time), WORKING_TIME_FIELDS),
                 )
+            )
+        if not working_times:
+            # Keep days without working times, e.g. a weekend day overriding a
+            # working day of the base calendar.
+            calendar_weekdays.append((calendar_uid, *day_fields, None, None))
 
     return calendar_weekdays
 
 
 def extract_calendar_exceptions(root):
-    calendar_exceptions = []
-    for calendar in root.findall("./Calendars/Calendar"):
-        calendar_uid = (
-            calendar.find("UID").text if calendar.find("UID") is not None else None
-        )
-        for exception in calendar.findall("./Exceptions/Exception"):
-            exception_uid = (
-                exception.find("UID").text
-                if exception.find("UID") is not None
-                else None
-            )
-            name = (
-                exception.find("Name").text
-                if exception.find("Name") is not None
-                else None
-            )
-            from_date = (
-                exception.find("FromDate").text
-                if exception.find("FromDate") is not None
-                else None
-            )
-            to_date = (
-                exception.find("ToDate").text
-                if exception.find("ToDate") is not None
-                else None
-            )
+    return extract_all(root, ("calendar_exceptions",))["calendar_exceptions"]
+
 
+def _extract_calendar_exceptions(calendar):
+    calendar_exceptions = []
+    calendar_uid = calendar.findtext("UID")
+    for exception in calendar.findall("./Exceptions/Exception"):
+        exception_fields = _extract_fields(_child_index(exception), EXCEPTION_FIELDS)
+        working_times = exception.findall("./WorkingTimes/WorkingTime")
+        for working_time in working_times:
             calendar_exceptions.append(
-                (calendar_uid, exception_uid, name, from_date, to_date)
+                (
+                    calendar_uid,
+                    *exception_fields,
+                    *_extract_fields(_child_index(working_time), WORKING_TIME_FIELDS),
+                )
             )
+        if not working_times:
+            calendar_exceptions.append((calendar_uid, *exception_fields, None, None))
 
     return calendar_exceptions
 
@@ -317,22 +345,15 @@ def extract_extended_attributes(root):
     Returns:
         list: A list of tuples containing extended attribute data.
     """
-    extended_attributes = []
-    for task in root.findall(".//Task"):
-        task_uid = task.find("UID").text if task.find("UID") is not None else None
-        for ext_attr in task.findall(".//ExtendedAttribute"):
-            field_id = (
-                ext_attr.find("FieldID").text
-                if ext_attr.find("FieldID") is not None
-                else None
-            )
-            value = (
-                ext_attr.find("Value").text
-                if ext_attr.find("Value") is not None
-                else None
-            )
-            extended_attributes.append((task_uid, field_id, value))
-    return extended_attributes
+    return extract_all(root, ("extended_attributes",))["extended_attributes"]
+
+
+def _extract_extended_attributes(task):
+    task_uid = task.findtext("UID")
+    return [
+        (task_uid, *_extract_fields(_child_index(ext_attr), EXTENDED_ATTRIBUTE_FIELDS))
+        for ext_attr in task.iter("ExtendedAttribute")
+    ]
 
 
 def extract_predecessor_links(root):
@@ -345,11 +366,228 @@ def extract_predecessor_links(root):
     Returns:
         list: A list of tuples containing predecessor link data.
     """
-    predecessor_links = []
-    for task in root.findall(".//Task"):
-        task_uid = task.find("UID").text
-        for link in task.findall("PredecessorLink"):
-            predecessor_uid = link.find("PredecessorUID").text
-            link_type = link.find("Type").text
-            predecessor_links.append((task_uid, predecessor_uid, link_type))
-    return predecessor_links
+    return extract_all(root, ("predecessor_links",))["predecessor_links"]
+
+
+def _extract_predecessor_links(task):
+    task_uid = task.findtext("UID")
+    return [
+        (task_uid, *_extract_fields(_child_index(link), PREDECESSOR_LINK_FIELDS))
+        for link in task.iterfind("PredecessorLink")
+    ]
+
+
+def iter_project_elements(source):
+    """
+    Streams the repeating elements of an MSPDI export with iterparse.
+
+    The MS Project namespace is stripped from each tag as it is parsed, and every
+    Task, Resource, Assignment and Calendar element is cleared and detached from
+    its section once the caller has consumed it, so only one such element is held
+    in memory at a time regardless of the size of the export.
+
+    Args:
+        source (str or file object): The path to, or an open binary file of, the
+        XML export.
+
+    Yields:
+        tuple: The tag and the fully parsed element. The element is only valid
+        until the next item is requested.
+    """
+    return iter_project_events(ET.iterparse(source, events=("start", "end")))
+
+
+def iter_project_events(events):
+    """
+    Yields the repeating elements from a stream of ("start", "end") parse events,
+    as iter_project_elements does for a whole file.
+
+    Args:
+        events (iterable): (event, element) pairs from iterparse or XMLPullParser.
+
+    Yields:
+        tuple: The tag and the fully parsed element.
+    """
+    stack = []
+    for event, element in events:
+        if event == "start":
+            if element.tag.startswith(_NAMESPACE_PREFIX):
+                element.tag = element.tag.rpartition("}")[2]
+            stack.append(element)
+            continue
+
+        stack.pop()
+        if len(stack) == 2 and STREAMED_ELEMENTS.get(element.tag) == stack[1].tag:
+            yield element.tag, element
+            element.clear()
+            stack[1].remove(element)
+
+
+class ProjectRowExtractor:
+    """
+    Visitor that turns the repeating elements of an MSPDI export into table rows.
+
+    Each Task, Resource, Assignment and Calendar element is visited exactly once
+    and emits rows for every table that depends on it, so the document is
+    traversed a single time no matter how many tables are requested. Elements can
+    come from a parsed tree (walk) or from iter_project_elements.
+
+    Args:
+        tables (iterable): The tables to collect rows for. Defaults to all TABLES.
+    """
+
+    def __init__(self, tables=TABLES):
+        self.rows = {table: [] for table in tables}
+        self._seen_uids = set()
+        self._parent_stack = []
+        self._visitors = {
+            "Task": self.visit_task,
+            "Resource": self.visit_resource,
+            "Assignment": self.visit_assignment,
+            "Calendar": self.visit_calendar,
+        }
+
+    def visit(self, tag, element):
+        visitor = self._visitors.get(tag)
+        if visitor is not None:
+            visitor(element)
+
+    def visit_task(self, task):
+        self.add_task_rows(*extract_task_rows(task, self.rows))
+
+    def add_task_rows(self, row, extended_attributes, predecessor_links):
+        """
+        Adds the rows of one task as returned by extract_task_rows. Tasks must be
+        added in document order so that parents resolve correctly.
+        """
+        rows = self.rows
+        if row is not None:
+            row = link_task(row, self._seen_uids, self._parent_stack)
+            if row is not None:
+                if "tasks" in rows:
+                    rows["tasks"].append(row)
+                if "task_closure" in rows:
+                    rows["task_closure"].extend(closure_rows(self._parent_stack))
+                if "jira_keys" in rows:
+                    jira_key = jira_key_row(row.uid, extended_attributes)
+                    if jira_key is not None:
+                        rows["jira_keys"].append(jira_key)
+        if extended_attributes and "extended_attributes" in rows:
+            rows["extended_attributes"].extend(extended_attributes)
+        if predecessor_links:
+            rows["predecessor_links"].extend(predecessor_links)
+
+    def visit_resource(self, resource):
+        if "resources" in self.rows:
+            self.rows["resources"].append(_extract_resource(resource))
+
+    def visit_assignment(self, assignment):
+        if "assignments" in self.rows:
+            self.rows["assignments"].append(_extract_assignment(assignment))
+
+    def visit_calendar(self, calendar):
+        rows = self.rows
+        if "calendars" in rows:
+            rows["calendars"].append(_extract_calendar(calendar))
+        if "calendar_weekdays" in rows:
+            rows["calendar_weekdays"].extend(_extract_calendar_weekdays(calendar))
+        if "calendar_exceptions" in rows:
+            rows["calendar_exceptions"].extend(_extract_calendar_exceptions(calendar))
+
+    def walk(self, root):
+        """
+        Visits the repeating elements of a parsed tree in document order.
+
+        Args:
+            root (Element): The root element of the XML tree.
+
+        Returns:
+            dict: The extracted rows keyed by table name.
+        """
+        for section in root:
+            for element in section:
+                if STREAMED_ELEMENTS.get(element.tag) == section.tag:
+                    self.visit(element.tag, element)
+        return self.rows
+
+
+def extract_all(root, tables=TABLES):
+    """
+    Extracts the rows of the given tables from a parsed XML tree in a single
+    traversal.
+
+    Args:
+        root (Element): The root element of the XML tree.
+        tables (iterable): The tables to extract. Defaults to all TABLES.
+
+    Returns:
+        dict: The extracted rows keyed by table name.
+    """
+    return ProjectRowExtractor(tables).walk(root)
+
+
+def stream_project(source, tables=TABLES):
+    """
+    Extracts the rows of the given tables from an MSPDI export in a single
+    streaming pass.
+
+    Args:
+        source (str or file object): The path to, or an open binary file of, the
+        XML export.
+        tables (iterable): The tables to extract. Defaults to all TABLES.
+
+    Returns:
+        dict: The extracted rows keyed by table name, identical to what
+        extract_all returns for the parsed tree.
+    """
+    extractor = ProjectRowExtractor(tables)
+    for tag, element in iter_project_elements(source):
+        extractor.visit(tag, element)
+    return extractor.rows
+
+
+def iter_row_batches(source, tables=TABLES, batch_size=5000):
+    """
+    Streams an MSPDI export like stream_project, but hands rows over in batches as
+    soon as they are extracted instead of collecting every row first.
+
+    Args:
+        source (str or file object): The path to, or an open binary file of, the
+        XML export.
+        tables (iterable): The tables to extract. Defaults to all TABLES.
+        batch_size (int): The number of rows per batch. The last batch of each
+        table may be smaller.
+
+    Yields:
+        tuple: The table name and a list of its rows, in document order per table.
+    """
+    extractor = ProjectRowExtractor(tables)
+    rows = extractor.rows
+    for tag, element in iter_project_elements(source):
+        extractor.visit(tag, element)
+        for table, batch in rows.items():
+            # A task can add several rows at once, e.g. its closure rows.
+            while len(batch) >= batch_size:
+                rows[table], batch = batch[batch_size:], batch[:batch_size]
+                yield table, batch
+                batch = rows[table]
+    for table, batch in rows.items():
+        if batch:
+            yield table, batch
+
+
+def stream_task_table(source):
+    """
+    Streams the tasks of an MSPDI export into a columnar TaskTable, without
+    holding all task records at once.
+
+    Args:
+        source (str or file object): The path to, or an open binary file of, the
+        XML export.
+
+    Returns:
+        TaskTable: The tasks in document order.
+    """
+    return TaskTable.from_tasks(
+        task for _, batch in iter_row_batches(source, ("tasks",)) for task in batch
+    )
@@ -0,0 +1,158 @@
+import logging
+import mmap
+import os
+import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
+
+from omniplan_exporter.xml import extract_operations
+
+logger = logging.getLogger(__name__)
+
+TASKS_START_TAG = b"<Tasks>"
+TASKS_END_TAG = b"</Tasks>"
+TASK_END_TAG = b"</Task>"
+
+# Chunks per worker, so that uneven chunks still keep every worker busy.
+CHUNKS_PER_WORKER = 4
+_FEED_SIZE = 1 << 20
+
+
+def split_task_chunks(data, chunk_count):
+    """
+    Splits the content of the <Tasks> section into byte ranges that each hold a
+    whole number of Task elements.
+
+    Args:
+        data (bytes or mmap): The raw XML export.
+        chunk_count (int): The number of chunks to aim for.
+
+    Returns:
+        tuple: The (start, end) byte range of the section content and a list of
+        (start, end) chunk ranges covering it, or None if the export has no
+        plain <Tasks> section (e.g. it is not UTF-8 or uses a namespace prefix).
+    """
+    section = data.find(TASKS_START_TAG)
+    if section < 0:
+        return None
+    start = section + len(TASKS_START_TAG)
+    end = data.find(TASKS_END_TAG, start)
+    if end < 0:
+        return None
+
+    step = max((end - start) // max(chunk_count, 1), 1)
+    bounds = [start]
+    while bounds[-1] + step < end:
+        cut = data.find(TASK_END_TAG, bounds[-1] + step, end)
+        if cut < 0:
+            break
+        bounds.append(cut + len(TASK_END_TAG))
+    if bounds[-1] < end:
+        bounds.append(end)
+    return (start, end), list(zip(bounds, bounds[1:]))
+
+
+def _xml_declaration(data):
+    """
+    Returns the XML declaration of the export, so that chunks are decoded with
+    the same encoding.
+    """
+    if data[:5] != b"<?xml":
+        return b""
+    end = data.find(b"?>") + 2
+    return bytes(data[:end])
+
+
+def extract_task_chunk(file_path, start, end, declaration, tables):
+    """
+    Extracts the task rows of one chunk of the <Tasks> section. Runs in a worker
+    process.
+
+    Args:
+        file_path (str): The path to the XML export.
+        start (int): The byte offset of the first Task element in the chunk.
+        end (int): The byte offset just past the last Task element in the chunk.
+        declaration (bytes): The XML declaration of the export.
+        tables (tuple): The tables to extract rows for.
+
+    Returns:
+        list: One extract_task_rows result per Task element, in document order.
+    """
+    with open(file_path, "rb") as file:
+        file.seek(start)
+        chunk = file.read(end - start)
+    root = ET.fromstring(declaration + TASKS_START_TAG + chunk + TASKS_END_TAG)
+    return [extract_operations.extract_task_rows(task, tables) for task in root]
+
+
+def _pull_events(data, ranges):
+    """
+    Parses the given byte ranges of the export as one document with an
+    XMLPullParser, yielding ("start", "end") events.
+    """
+    parser = ET.XMLPullParser(events=("start", "end"))
+    for start, end in ranges:
+        for offset in range(start, end, _FEED_SIZE):
+            stop = min(offset + _FEED_SIZE, end)
+            parser.feed(data[offset:stop])
+            yield from parser.read_events()
+    parser.close()
+    yield from parser.read_events()
+
+
+def stream_project_parallel(file_path, workers=None, tables=None):
+    """
+    Extracts the rows of every table from an MSPDI export, converting the <Tasks>
+    section in a process pool.
+
+    The Tasks section is split into chunks on </Task> boundaries and converted by
+    the workers, while this process streams the rest of the document. The task
+    hierarchy (ParentUID) and duplicate detection depend on document order, so
+    they are resolved afterwards by feeding the chunk results back in order. The
+    output is identical to extract_operations.stream_project.
+
+    Args:
+        file_path (str): The path to the XML export.
+        workers (int, optional): The number of worker processes. Defaults to the
+        number of CPUs.
+        tables (iterable, optional): The tables to extract. Defaults to all
+        extract_operations.TABLES.
+
+    Returns:
+        dict: The extracted rows keyed by table name.
+    """
+    tables = tuple(tables or extract_operations.TABLES)
+    workers = workers or os.cpu_count() or 1
+
+    with open(file_path, "rb") as file, mmap.mmap(
+        file.fileno(), 0, access=mmap.ACCESS_READ
+    ) as data:
+        split = split_task_chunks(data, workers * CHUNKS_PER_WORKER)
+        if split is None:
+            logger.warning(
+                "No plain <Tasks> section found, falling back to serial parsing."
+            )
+            return extract_operations.stream_project(file_path, tables)
+
+        (section_start, section_end), chunks = split
+        declaration = _xml_declaration(data)
+        extractor = extract_operations.ProjectRowExtractor(tables)
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [
+                executor.submit(
+                    extract_task_chunk, file_path, start, end, declaration, tables
+                )
+                for start, end in chunks
+            ]
+
+            # Stream everything outside the Tasks section while the pool works.
+            events = _pull_events(data, [(0, section_start), (section_end, len(data))])
+            for tag, element in extract_operations.iter_project_events(events):
+                extractor.visit(tag, element)
+
+            for future in futures:
+                for task_rows in future.result():
+                    extractor.add_task_rows(*task_rows)
+
+    logger.info(f"Extracted {len(chunks)} task chunks using {workers} workers.")
+    return extractor.rows
@@ -1,14 +1,14 @@
 import os
 import sys
-import sqlite3
 import logging
 import requests
 import datetime
 from dotenv import load_dotenv
+from omniplan_exporter.db import pool
 from omniplan_exporter.db.operations import (
     get_parent_task,
-    get_sub_tasks,
-    get_jira_number,
+    get_subtree,
+    subtree_children,
 )
 from omniplan_exporter.jira.integration import fetch_jira_issue
 
@@ -103,20 +103,24 @@ def fetch_omniplan_task_tree(conn, jira_task):
     if not parent_task:
         return {}
 
+    children = subtree_children(get_subtree(conn, parent_task.uid))
+
     def fetch_children(task_uid):
-        sub_tasks, _ = get_sub_tasks(conn, task_uid)
         return {
-            f"{get_jira_number(conn, sub_task[0]) or '<No Jira>'} - "
-            f"{sub_task[1]} [PercentWorkComplete: {sub_task[5] or 0}%]": fetch_children(
-                sub_task[0]
+            f"{sub_task.jira_key or '<No Jira>'} - "
+            f"{sub_task.name} "
+            f"[PercentWorkComplete: {sub_task.percent_complete or 0}%]": fetch_children(
+                sub_task.uid
             )
-            for sub_task in sub_tasks
+            for sub_task in children.get(task_uid, ())
         }
 
-    jira_number = parent_task[7] or "<No Jira>"
+    jira_number = parent_task.jira_task or "<No Jira>"
     return {
-        f"{jira_number} - {parent_task[1]} "
-        f"[PercentWorkComplete: {parent_task[5] or 0}%]": fetch_children(parent_task[0])
+        f"{jira_number} - {parent_task.name} "
+        f"[PercentWorkComplete: {parent_task.percent_complete or 0}%]": (
+            fetch_children(parent_task.uid)
+        )
     }
 
 
@@ -255,7 +259,7 @@ if __name__ == "__main__":
     bearer_token = sys.argv[2]
 
     # Connect to the database
-    conn = sqlite3.connect(DB_FILE_PATH)
+    conn = pool.connect_read_only(DB_FILE_PATH)
 
     # Fetch task trees
     jira_tree = fetch_jira_task_tree(jira_task, bearer_token)
@@ -4,7 +4,7 @@ import sqlite3
 import logging
 from datetime import datetime
 
-from omniplan_exporter.db import operations
+from omniplan_exporter.db import operations, pool
 
 logger = logging.getLogger(__name__)
 
@@ -15,7 +15,7 @@ def generate_report(jira_task, db_path, output_dir="resources/reports"):
     including nested sub-tasks.
     """
     try:
-        conn = sqlite3.connect(db_path)
+        conn = pool.connect_read_only(db_path)
         parent_task = operations.get_parent_task(conn, jira_task)
         if parent_task:
             (
@@ -27,6 +27,7 @@ def generate_report(jira_task, db_path, output_dir="resources/reports"):
                 _,
                 _,
                 _,
+                _,
             ) = parent_task
 
             operations.create_report_directory()
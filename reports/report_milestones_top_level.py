@@ -2,55 +2,80 @@ import sys
 import os
 import sqlite3
 import logging
-from datetime import datetime
+from datetime import date, datetime
 
-from omniplan_exporter.db import operations
+from omniplan_exporter.db import operations, pool
+from omniplan_exporter.utils import decoding
 
 logger = logging.getLogger(__name__)
 
 
+def _direct(dependencies):
+    return "<br>".join([f"- {dep.name}" for dep in dependencies if dep.direct])
+
+
+def _transitive(dependencies):
+    """
+    Summarizes the transitive dependencies of a milestone: how many tasks there
+    are, and which of them are milestones.
+    """
+    if not dependencies:
+        return ""
+    count = len(dependencies)
+    milestones = [f"- {dep.name}" for dep in dependencies if dep.milestone]
+    return "<br>".join(
+        [f"{count} {'oppgave' if count == 1 else 'oppgaver'}", *milestones]
+    )
+
+
 def generate_milestones_top_level_report(db_path, output_dir="resources/reports"):
-    conn = sqlite3.connect(db_path)
+    conn = pool.connect_read_only(db_path)
     try:
         milestones = operations.get_tasks_by_outline(conn, outline_level=1, milestone=1)
-        milestones = [
-            (uid, name, finish, start, work, actual_work)
-            for uid, name, finish, start, work, actual_work, parent_uid in milestones
-        ]
-
         milestones = sorted(
             milestones,
-            key=lambda x: datetime.fromisoformat(x[2]).date() if x[2] else datetime.max,
+            key=lambda milestone: (
+                decoding.parse_datetime(milestone.finish).date()
+                if milestone.finish
+                else date.max
+            ),
         )
+        uids = [milestone.uid for milestone in milestones]
+        schedules = operations.get_task_schedules(conn, uids)
+        # Everything each milestone depends on and unblocks, in two queries.
+        predecessors = operations.get_transitive_predecessors(conn, uids)
+        successors = operations.get_transitive_successors(conn, uids)
 
         operations.create_report_directory()
         report_filename = os.path.join(output_dir, "milestones-top-level.md")
         with open(report_filename, "w") as report_file:
             report_file.write("# Milepæler Modernisert Utvikleropplevelse\n\n")
-            report_file.write("| Milepæl | Forutsetter | Muliggjør | Dato       |\n")
-            report_file.write("|-----------|-------------|-----------|------------|\n")
+            report_file.write(
+                "| Milepæl | Forutsetter | Muliggjør | Forutsetter totalt | "
+                "Muliggjør totalt | Dato       | Slakk (dager) |\n"
+            )
+            report_file.write(
+                "|-----------|-------------|-----------|--------------------|"
+                "------------------|------------|---------------|\n"
+            )
             for milestone in milestones:
-                uid, name, finish, _, _, _ = milestone
-                finish_date = datetime.fromisoformat(finish).date() if finish else "N/A"
-
-                dependencies = operations.get_task_dependencies(
-                    conn, milestone_id=uid, dependency_type="predecessor"
-                )
-                dependents = operations.get_task_dependencies(
-                    conn, milestone_id=uid, dependency_type="successor"
+                finish_date = decoding.to_date(milestone.finish)
+                schedule = schedules.get(milestone.uid)
+                total_float = operations.format_work_days(
+                    schedule.total_float_days if schedule else None
                 )
+                if schedule and schedule.critical:
+                    total_float = f"{total_float} (kritisk)"
 
-                dependencies_names = "<br>".join(
-                    [f"- {dep['Name']}" for dep in dependencies]
-                )
-                dependents_names = "<br>".join(
-                    [f"- {dep['Name']}" for dep in dependents]
-                )
+                dependencies = predecessors.get(milestone.uid, [])
+                dependents = successors.get(milestone.uid, [])
 
                 report_file.write(
                     (
-                        f"| {name} | {dependencies_names} | {dependents_names} | "
-                        f"{finish_date} |\n"
+                        f"| {milestone.name} | {_direct(dependencies)} | "
+                        f"{_direct(dependents)} | {_transitive(dependencies)} | "
+                        f"{_transitive(dependents)} | {finish_date} | "
+                        f"{total_float} |\n"
                     )
                 )
 
@@ -0,0 +1,79 @@
+import sys
+import os
+import sqlite3
+import logging
+from datetime import datetime
+
+from omniplan_exporter.db import calendars, operations, pool, utilization
+from omniplan_exporter.utils import decoding
+
+logger = logging.getLogger(__name__)
+
+
+def _percent(units):
+    return f"{units * 100:.0f}%"
+
+
+def _hours(minutes):
+    return "N/A" if minutes is None else f"{minutes / 60:.1f}"
+
+
+def generate_resource_utilization_report(db_path, output_dir="resources/reports"):
+    conn = pool.connect_read_only(db_path)
+    try:
+        resources = operations.get_overallocated_resources(conn)
+        calendar_cache = calendars.CalendarCache(conn)
+
+        operations.create_report_directory()
+        report_filename = os.path.join(output_dir, "resource-utilization.md")
+        with open(report_filename, "w") as report_file:
+            report_file.write("# Overbookede ressurser\n\n")
+            report_file.write(
+                "| Ressurs | Maks | Topp | Topp fra | Overbooket (timer) | Perioder |\n"
+            )
+            report_file.write(
+                "|---------|------|------|----------|--------------------|----------|\n"
+            )
+            for resource in resources:
+                report_file.write(
+                    f"| {resource.name} | {_percent(resource.max_units)} | "
+                    f"{_percent(resource.peak_units)} | "
+                    f"{decoding.from_epoch(resource.peak_start).date()} | "
+                    f"{_hours(resource.overallocated_minutes)} | "
+                    f"{resource.overallocations} |\n"
+                )
+
+            report_file.write("\n## Overbooking per uke\n\n")
+            report_file.write("| Ressurs | Uke | Overbooket (timer) | Topp |\n")
+            report_file.write("|---------|-----|--------------------|------|\n")
+            for resource in resources:
+                weeks = utilization.overallocated_weeks(
+                    operations.get_overallocations(conn, resource.uid),
+                    calendar_cache.for_resource(resource.uid),
+                )
+                for year, week, hours, peak_units in weeks:
+                    report_file.write(
+                        f"| {resource.name} | {year}-W{week:02d} | {hours:.1f} | "
+                        f"{_percent(peak_units)} |\n"
+                    )
+
+            report_file.write(f"\nDenne rapporten ble generert {datetime.now().date()}")
+
+        logger.info(f"Report generated: {report_filename}")
+
+    except sqlite3.Error as e:
+        logger.error(f"Database error: {e}")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    db_path = os.path.join(os.path.dirname(__file__), "../resources/omniplan.db")
+    output_dir = "resources/reports"
+    if len(sys.argv) > 1:
+        output_dir = sys.argv[1]
+    generate_resource_utilization_report(db_path, output_dir)
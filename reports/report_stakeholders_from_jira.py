@@ -1,9 +1,8 @@
 import os
 import sys
 import logging
-import sqlite3
 from dotenv import load_dotenv  # Import dotenv to load environment variables
-from omniplan_exporter.db import operations  # Import operations for fetching tasks
+from omniplan_exporter.db import operations, pool
 from omniplan_exporter.jira.integration import fetch_jira_issue
 from datetime import datetime
 
@@ -26,11 +25,10 @@ def generate_stakeholders_report(bearer_token, conn, output_dir="resources/repor
         output_dir (str): The directory where the report will be saved.
     """
     try:
-        # Fetch tasks with outline_level=2
-        tasks = operations.get_tasks_by_outline(conn, outline_level=2)
-
-        # Filter tasks by ParentUID
-        tasks = [task for task in tasks if task[-1] in (32, 261)]
+        # Fetch tasks with outline_level=2 under the stakeholder parents
+        tasks = operations.get_tasks_by_outline(
+            conn, outline_level=2, parent_uids=(32, 261)
+        )
 
         # Ensure output directory exists
         os.makedirs(output_dir, exist_ok=True)
@@ -40,9 +38,10 @@ def generate_stakeholders_report(bearer_token, conn, output_dir="resources/repor
         all_names = set()
         task_data = []  # Collect task data with start_date for sorting
 
+        jira_numbers = operations.get_jira_numbers(conn, [task.uid for task in tasks])
         for task in tasks:
-            uid, name, _, start, _, _, parent_uid = task  # Include start field
-            jira_number = operations.get_jira_number(conn, uid)
+            uid, name, start = task.uid, task.name, task.start
+            jira_number = jira_numbers.get(uid)
             if jira_number:
                 issue_details = fetch_jira_issue(
                     jira_number, JIRA_BASE_URL, bearer_token
@@ -159,6 +158,6 @@ if __name__ == "__main__":
         logger.error("Usage: python report_stakeholders_from_jira.py <bearer_token>")
     else:
         bearer_token = sys.argv[1]
-        conn = sqlite3.connect(DB_FILE_PATH)  # Use DB_FILE_PATH from .env
+        conn = pool.connect_read_only(DB_FILE_PATH)  # Use DB_FILE_PATH from .env
         generate_stakeholders_report(bearer_token, conn)
         conn.close()
@@ -1,10 +1,10 @@
 import sys
 import os
-import sqlite3
 import logging
 from datetime import datetime
 
-from omniplan_exporter.db import operations
+from omniplan_exporter.db import operations, pool
+from omniplan_exporter.utils import decoding
 
 logger = logging.getLogger(__name__)
 
@@ -29,18 +29,34 @@ def generate_assignments_report(conn, jira_task, output_dir="resources/reports")
             task_percent_complete,
             task_work,
             task_jira_task,
+            task_work_days,
         ) = parent_task
+        # The effort and progress of the whole subtree, as rolled up on import,
+        # next to the figures of the export.
+        task_rollup = operations.get_task_rollups(conn, [task_uid]).get(task_uid)
+        subtree_effort = subtree_complete = "N/A"
+        if task_rollup:
+            subtree_effort = f"{operations.format_work_days(task_rollup.work_days)}d"
+            subtree_complete = f"{round(task_rollup.percent_complete)}%"
         jira_link = operations.get_jira_link(conn, task_uid)
         report_file.write(f"# Assignments and status for {jira_link}\n\n")
-        report_file.write("| Jira | Task Name | Effort | Complete | Start | Finish |\n")
-        report_file.write("|------|-----------|--------|----------|-------|--------|\n")
+        report_file.write(
+            "| Jira | Task Name | Effort | Complete | Subtree Effort "
+            "| Subtree Complete | Start | Finish |\n"
+        )
+        report_file.write(
+            "|------|-----------|--------|----------|----------------"
+            "|------------------|-------|--------|\n"
+        )
         report_file.write(
             f"| {jira_link} | {task_name} | "
-            f"{operations.convert_to_work_days(task_work)}d | "
-            f"{task_percent_complete or 0}% | {task_start} | {task_finish} |\n\n"
+            f"{operations.format_work_days(task_work_days)}d | "
+            f"{task_percent_complete or 0}% | {subtree_effort} | "
+            f"{subtree_complete} | {task_start} | {task_finish} |\n\n"
         )
         report_file.write("## Sub-tasks\n\n")
-        sub_tasks = operations.get_sub_tasks_and_assignments(conn, task_uid)
+        # The sub-tasks with their Jira numbers and assignments, in one query.
+        sub_tasks = operations.get_subtree(conn, task_uid)[1:]
         report_file.write(
             "| Jira | Task Name | Effort | Complete | Start | Finish | Assignments |\n"
         )
@@ -48,26 +64,21 @@ def generate_assignments_report(conn, jira_task, output_dir="resources/reports")
             "|------|-----------|--------|----------|-------|--------|-------------|\n"
         )
         for sub_task in sub_tasks:
-            (
-                sub_task_uid,
-                name,
-                work_days,
-                percent_complete,
-                start_date,
-                finish_date,
-            ) = sub_task
-            jira_link = operations.get_jira_link(conn, sub_task_uid)
+            if sub_task.summary:
+                continue
+            jira_link = operations.format_jira_link(sub_task.jira_key)
             report_file.write(
-                f"| {jira_link} | {name} | {work_days}d | "
-                f"{percent_complete or 0}% | {start_date} | {finish_date} | "
+                f"| {jira_link} | {sub_task.name} | "
+                f"{operations.format_work_days(sub_task.work_days)}d | "
+                f"{sub_task.percent_complete or 0}% | "
+                f"{decoding.to_date(sub_task.start)} | "
+                f"{decoding.to_date(sub_task.finish)} | "
             )
-            # Fetch assignments for the sub-task
-            assignments = operations.get_assignments_by_uid(conn, sub_task_uid)
-            if assignments:
+            if sub_task.assignments:
                 assignment_list = ", ".join(
                     [
                         f"{resource_name} ({units * 100:.1f}%)"
-                        for resource_name, units in assignments
+                        for resource_name, units in sub_task.assignments
                     ]
                 )
                 report_file.write(f"{assignment_list}")
@@ -98,6 +109,6 @@ if __name__ == "__main__":
     if len(sys.argv) > 2:
         output_dir = sys.argv[2]
     db_path = os.path.join(os.path.dirname(__file__), "../resources/omniplan.db")
-    conn = sqlite3.connect(db_path)
+    conn = pool.connect_read_only(db_path)
     generate_assignments_report(conn, jira_task, output_dir)
     conn.close()
@@ -0,0 +1,78 @@
+import filecmp
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import main
+from benchmarks import synthetic
+from omniplan_exporter.db import schedule
+from omniplan_exporter.xml import extract_operations
+
+
+class TestSyntheticProject(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write(self, name, **options):
+        path = os.path.join(self.directory.name, name)
+        counts = synthetic.write_project(path, 200, **options)
+        return path, counts
+
+    def test_export_is_deterministic(self):
+        first, _ = self.write("first.xml", seed=7)
+        second, _ = self.write("second.xml", seed=7)
+        third, _ = self.write("third.xml", seed=8)
+        self.assertTrue(filecmp.cmp(first, second, shallow=False))
+        self.assertFalse(filecmp.cmp(first, third, shallow=False))
+
+    def test_options_shape_the_export(self):
+        path, counts = self.write(
+            "project.xml",
+            max_depth=3,
+            assignment_density=2.0,
+            extended_attributes=3,
+            predecessor_links=2,
+            calendars=2,
+        )
+        tables = extract_operations.stream_project(path)
+        self.assertEqual(len(tables["tasks"]), 200)
+        self.assertEqual(len(tables["resources"]), counts["resources"])
+        self.assertEqual(len(tables["assignments"]), counts["assignments"])
+        self.assertEqual(len(tables["calendars"]), 2)
+        self.assertEqual(len(tables["calendar_exceptions"]), 2)
+        self.assertEqual(len(tables["extended_attributes"]), 600)
+        self.assertLessEqual(len(tables["predecessor_links"]), 2 * 199)
+        self.assertEqual(max(task.outline_level for task in tables["tasks"]), 3)
+
+        leaf_tasks = sum(1 for task in tables["tasks"] if not task.summary)
+        self.assertEqual(counts["assignments"], 2 * leaf_tasks)
+
+    def test_links_do_not_form_cycles(self):
+        path, _ = self.write("project.xml", predecessor_links=3)
+        db_path = os.path.join(self.directory.name, "omniplan.db")
+        main.process_xml(path, db_path)
+        conn = sqlite3.connect(db_path)
+        try:
+            network = schedule.load_network(conn.cursor())
+            ancestor_links = conn.execute(
+                """
+                SELECT COUNT(*) FROM omniplan_predecessor_links l
+                JOIN omniplan_task_closure c
+                ON c.AncestorUID = l.PredecessorUID AND c.DescendantUID = l.TaskUID
+                """
+            ).fetchone()[0]
+        finally:
+            conn.close()
+        self.assertEqual(ancestor_links, 0)
+        # Every task and summary node is scheduled, none is left on a cycle.
+        self.assertEqual(
+            len(schedule.topological_order(network)), len(network.durations)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
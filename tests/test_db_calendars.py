@@ -0,0 +1,348 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+import xml.etree.ElementTree as ET
+from datetime import date, datetime
+
+import main
+from omniplan_exporter.db import calendars, operations
+from omniplan_exporter.xml import extract_operations
+from tests.test_xml_extract_operations import PROJECT_XML
+
+WEEKDAYS = [
+    (1, day_type, "1", from_time, to_time)
+    for day_type in range(2, 7)
+    for from_time, to_time in (("08:00:00", "12:00:00"), ("13:00:00", "16:30:00"))
+]
+
+
+class TestCalendars(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        cursor = self.conn.cursor()
+        for table in ("calendars", "calendar_weekdays", "calendar_exceptions"):
+            operations.IMPORT_TABLES[table].create(cursor)
+        operations.create_resources_table(cursor)
+        cursor.executemany(
+            operations.INSERT_CALENDARS_SQL,
+            [
+                (1, "Standard", 1, -1),
+                (2, "Four days", 0, 1),
+                (3, "Loop A", 0, 4),
+                (4, "Loop B", 0, 3),
+            ],
+        )
+        cursor.executemany(
+            operations.INSERT_CALENDAR_WEEKDAYS_SQL,
+            WEEKDAYS
+            + [
+                (1, 1, "0", None, None),
+                (1, 7, "0", None, None),
+                # Fridays off.
+                (2, 6, "0", None, None),
+            ],
+        )
+        cursor.executemany(
+            operations.INSERT_CALENDAR_EXCEPTIONS_SQL,
+            [
+                (
+                    1,
+                    1,
+                    "Christmas",
+                    "2024-12-25T00:00:00",
+                    "2024-12-25T23:59:00",
+                    "0",
+                    None,
+                    None,
+                ),
+                (
+                    1,
+                    2,
+                    "Working Saturday",
+                    "2024-12-14T00:00:00",
+                    "2024-12-14T23:59:00",
+                    "1",
+                    "09:00:00",
+                    "13:00:00",
+                ),
+                (
+                    2,
+                    1,
+                    "Leave",
+                    "2024-12-30T00:00:00",
+                    "2025-01-01T00:00:00",
+                    "0",
+                    None,
+                    None,
+                ),
+            ],
+        )
+        cursor.executemany(
+            operations.INSERT_RESOURCES_SQL,
+            [
+                (1, 1, "Kari", 1, 1, 1, None),
+                (2, 2, "Ola", 1, 1, 2, None),
+                (3, 3, "Per", 1, 1, 2, None),
+                (4, 4, "Contractor", 1, 1, None, None),
+            ],
+        )
+        self.conn.commit()
+        self.cache = calendars.CalendarCache(self.conn)
+        self.standard = self.cache.calendar_for(1)
+        self.four_days = self.cache.calendar_for(2)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_working_minutes(self):
+        monday = datetime(2024, 12, 2)
+        self.assertEqual(
+            self.standard.working_minutes(monday, datetime(2024, 12, 9)), 5 * 450
+        )
+        self.assertEqual(
+            self.standard.working_minutes(
+                datetime(2024, 12, 2, 10), datetime(2024, 12, 2, 14)
+            ),
+            180,
+        )
+        self.assertEqual(
+            self.standard.working_minutes(datetime(2024, 12, 9), monday), -5 * 450
+        )
+        # Christmas day is off.
+        self.assertEqual(
+            self.standard.working_minutes(date(2024, 12, 23), date(2024, 12, 30)),
+            4 * 450,
+        )
+        self.assertFalse(self.standard.is_working_day(date(2024, 12, 25)))
+        self.assertEqual(self.standard.day_hours, 7.5)
+
+    def test_working_exceptions(self):
+        # Saturday the 14th is worked from 09:00 to 13:00, in the derived
+        # calendar as well.
+        self.assertTrue(self.standard.is_working_day(date(2024, 12, 14)))
+        for calendar, weekdays in ((self.standard, 5), (self.four_days, 4)):
+            with self.subTest(calendar=calendar.name):
+                self.assertEqual(
+                    calendar.working_minutes(date(2024, 12, 9), date(2024, 12, 16)),
+                    weekdays * 450 + 240,
+                )
+        self.assertEqual(
+            self.standard.add_working_hours(datetime(2024, 12, 13, 16), 1),
+            datetime(2024, 12, 14, 9, 30),
+        )
+
+    def test_base_calendar_inheritance(self):
+        # Fridays are off, the base calendar's Christmas day as well.
+        self.assertEqual(
+            self.four_days.working_minutes(date(2024, 12, 2), date(2024, 12, 9)),
+            4 * 450,
+        )
+        self.assertEqual(
+            self.four_days.working_minutes(date(2024, 12, 23), date(2024, 12, 30)),
+            3 * 450,
+        )
+        # Its own leave ends at midnight of January 1st.
+        self.assertFalse(self.four_days.is_working_day(date(2024, 12, 31)))
+        self.assertTrue(self.four_days.is_working_day(date(2025, 1, 1)))
+
+    def test_add_working_hours(self):
+        cases = (
+            (datetime(2024, 12, 2, 8), 4, datetime(2024, 12, 2, 12)),
+            (datetime(2024, 12, 2, 8), 4.5, datetime(2024, 12, 2, 13, 30)),
+            (datetime(2024, 12, 6, 15), 2, datetime(2024, 12, 9, 8, 30)),
+            (datetime(2024, 12, 24, 16), 1, datetime(2024, 12, 26, 8, 30)),
+            (datetime(2024, 12, 7, 10), 0, datetime(2024, 12, 7, 10)),
+            (date(2024, 12, 2), 7.5, datetime(2024, 12, 2, 16, 30)),
+        )
+        for start, hours, finish in cases:
+            with self.subTest(start=start, hours=hours):
+                self.assertEqual(self.standard.add_working_hours(start, hours), finish)
+
+    def test_adding_is_the_inverse_of_counting(self):
+        rng = random.Random(0)
+        for _ in range(200):
+            start = (
+                datetime(2024, 1, 1)
+                + (datetime(2025, 1, 1) - datetime(2024, 1, 1)) * rng.random()
+            )
+            start = start.replace(second=0, microsecond=0)
+            minutes = rng.randrange(0, 20000)
+            finish = self.four_days.add_working_minutes(start, minutes)
+            self.assertEqual(self.four_days.working_minutes(start, finish), minutes)
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            self.standard.working_minutes(datetime(1999, 1, 1), datetime(2024, 1, 1))
+        with self.assertRaises(ValueError):
+            self.standard.add_working_minutes(datetime(2024, 1, 1), -1)
+        with self.assertRaises(ValueError):
+            self.standard.add_working_hours(datetime(2099, 12, 1), 1000)
+
+    def test_resource_calendars_are_shared(self):
+        self.assertIs(self.cache.for_resource(2), self.cache.for_resource(3))
+        self.assertIs(self.cache.for_resource(2), self.four_days)
+        self.assertIs(self.cache.for_resource(1), self.standard)
+        # No or an unknown calendar: the default base calendar.
+        self.assertIs(self.cache.for_resource(4), self.standard)
+        self.assertIs(self.cache.for_resource(99), self.standard)
+
+    def test_inheritance_cycle(self):
+        with self.assertLogs(calendars.logger, "WARNING"):
+            loop = self.cache.calendar_for(3)
+        self.assertEqual(loop.working_minutes(date(2024, 12, 2), date(2024, 12, 9)), 0)
+
+    def test_convert_to_work_days_with_a_calendar(self):
+        six_hours = calendars.WorkingCalendar(
+            9, "Six hours", {day: ((9 * 60, 15 * 60),) for day in range(5)}, {}
+        )
+        self.assertEqual(operations.convert_to_work_days("PT30H0M0S"), 4)
+        self.assertEqual(operations.convert_to_work_days("PT30H0M0S", six_hours), 5)
+
+
+class TestProjectDayLength(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def _import(self, calendar_rows, weekday_rows):
+        tasks = [
+            (1, 1, "Epic", 1, 1, 500, None, None, "", "", "", "", 0, 0, "", None, 0),
+            (
+                2,
+                2,
+                "Story",
+                2,
+                0,
+                500,
+                "2024-12-02T09:00:00",
+                "2024-12-04T15:00:00",
+                "PT18H0M0S",
+                "PT18H0M0S",
+                "PT6H0M0S",
+                "PT12H0M0S",
+                0,
+                0,
+                "",
+                1,
+                33,
+            ),
+        ]
+        with operations.import_transaction(self.conn) as cursor:
+            for table in operations.IMPORT_TABLES:
+                operations.reset_table(cursor, table)
+            cursor.executemany(operations.INSERT_CALENDARS_SQL, calendar_rows)
+            cursor.executemany(operations.INSERT_CALENDAR_WEEKDAYS_SQL, weekday_rows)
+            spec = operations.IMPORT_TABLES["tasks"]
+            cursor.executemany(spec.insert, spec.prepare(tasks))
+
+    def test_work_days_count_days_of_the_project_calendar(self):
+        self._import(
+            [(1, "Six hours", 1, -1)],
+            [(1, day_type, "1", "09:00:00", "15:00:00") for day_type in range(2, 7)],
+        )
+        self.assertEqual(calendars.project_day_hours(self.conn), 6)
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT DurationDays, WorkDays, ActualWorkDays, RemainingWorkDays "
+                "FROM omniplan_tasks WHERE UID = 2"
+            ).fetchone(),
+            (3.0, 3.0, 1.0, 2.0),
+        )
+        self.assertEqual(operations.get_task_rollups(self.conn, [1])[1].work_days, 3)
+
+    def test_plans_without_a_calendar_count_days_of_seven_and_a_half_hours(self):
+        self._import([], [])
+        self.assertEqual(calendars.project_day_hours(self.conn), 7.5)
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT WorkDays FROM omniplan_tasks WHERE UID = 2"
+            ).fetchone(),
+            (2.4,),
+        )
+
+
+class TestImportedCalendars(unittest.TestCase):
+    def test_days_without_working_times_are_extracted(self):
+        root = ET.fromstring(
+            """
+            <Project><Calendars><Calendar><UID>1</UID><WeekDays>
+                <WeekDay><DayType>1</DayType><DayWorking>0</DayWorking></WeekDay>
+            </WeekDays></Calendar></Calendars></Project>
+            """
+        )
+        self.assertEqual(
+            extract_operations.extract_calendar_weekdays(root),
+            [("1", "1", "0", None, None)],
+        )
+
+    def test_working_times_of_exceptions_are_extracted(self):
+        root = ET.fromstring(
+            """
+            <Project><Calendars><Calendar><UID>1</UID><Exceptions>
+                <Exception>
+                    <UID>1</UID><Name>Saturday</Name>
+                    <FromDate>2024-12-14T00:00:00</FromDate>
+                    <ToDate>2024-12-14T23:59:00</ToDate>
+                    <DayWorking>1</DayWorking>
+                    <WorkingTimes>
+                        <WorkingTime>
+                            <FromTime>09:00:00</FromTime><ToTime>12:00:00</ToTime>
+                        </WorkingTime>
+                        <WorkingTime>
+                            <FromTime>13:00:00</FromTime><ToTime>15:00:00</ToTime>
+                        </WorkingTime>
+                    </WorkingTimes>
+                </Exception>
+                <Exception>
+                    <UID>2</UID><Name>Holiday</Name>
+                    <FromDate>2024-12-25T00:00:00</FromDate>
+                    <ToDate>2024-12-25T23:59:00</ToDate>
+                    <DayWorking>0</DayWorking>
+                </Exception>
+            </Exceptions></Calendar></Calendars></Project>
+            """
+        )
+        saturday = ("1", "1", "Saturday", "2024-12-14T00:00:00", "2024-12-14T23:59:00")
+        self.assertEqual(
+            extract_operations.extract_calendar_exceptions(root),
+            [
+                (*saturday, "1", "09:00:00", "12:00:00"),
+                (*saturday, "1", "13:00:00", "15:00:00"),
+                (
+                    "1",
+                    "2",
+                    "Holiday",
+                    "2024-12-25T00:00:00",
+                    "2024-12-25T23:59:00",
+                    "0",
+                    None,
+                    None,
+                ),
+            ],
+        )
+
+    def test_calendars_of_an_import(self):
+        with tempfile.TemporaryDirectory() as directory:
+            xml_path = os.path.join(directory, "project.xml")
+            db_path = os.path.join(directory, "omniplan.db")
+            with open(xml_path, "w") as file:
+                file.write(PROJECT_XML)
+            main.process_xml(xml_path, db_path)
+            conn = sqlite3.connect(db_path)
+            try:
+                calendar = calendars.CalendarCache(conn).for_resource(1)
+            finally:
+                conn.close()
+        # Only Mondays are defined, and January 2nd is a holiday.
+        self.assertEqual(calendar.name, "Standard")
+        self.assertEqual(
+            calendar.working_minutes(date(2023, 1, 2), date(2023, 1, 16)), 450
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import unittest
+import sqlite3
+from unittest.mock import patch
+
+from omniplan_exporter.db import incremental, operations
+
+
+def make_task(uid, name, parent_uid=None):
+    return (
+        uid,
+        uid,
+        name,
+        1 if parent_uid is None else 2,
+        "0",
+        "500",
+        None,
+        None,
+        None,
+        None,
+        None,
+        None,
+        0,
+        0,
+        None,
+        parent_uid,
+        0.0,
+    )
+
+
+def make_tables(tasks, extended_attributes=(), predecessor_links=()):
+    tables = {table: [] for table in operations.IMPORT_TABLES}
+    tables["tasks"] = list(tasks)
+    tables["extended_attributes"] = list(extended_attributes)
+    tables["predecessor_links"] = list(predecessor_links)
+    return tables
+
+
+class TestIncrementalImport(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+
+    def tearDown(self):
+        self.conn.close()
+
+    def task_names(self):
+        return self.conn.execute(
+            "SELECT UID, Name FROM omniplan_tasks ORDER BY UID"
+        ).fetchall()
+
+    def test_first_import_inserts_everything(self):
+        deltas = incremental.import_incrementally(
+            self.conn,
+            make_tables(
+                [make_task("1", "A"), make_task("2", "B", "1")],
+                [("1", "188743731", "MUP-1")],
+            ),
+        )
+        self.assertEqual(deltas["tasks"], (2, 0, 0))
+        self.assertEqual(deltas["extended_attributes"], (1, 0, 0))
+        self.assertEqual(self.task_names(), [(1, "A"), (2, "B")])
+
+    def test_reimport_applies_only_changes(self):
+        incremental.import_incrementally(
+            self.conn,
+            make_tables(
+                [make_task("1", "A"), make_task("2", "B", "1"), make_task("3", "C")],
+                [("1", "188743731", "MUP-1"), ("2", "188743731", "MUP-2")],
+            ),
+        )
+        deltas = incremental.import_incrementally(
+            self.conn,
+            make_tables(
+                [make_task("1", "A"), make_task("2", "B2", "1"), make_task("4", "D")],
+                [("1", "188743731", "MUP-1"), ("2", "188743731", "MUP-20")],
+            ),
+        )
+        self.assertEqual(deltas["tasks"], (1, 1, 1))
+        self.assertEqual(deltas["extended_attributes"], (0, 1, 0))
+        self.assertEqual(self.task_names(), [(1, "A"), (2, "B2"), (4, "D")])
+        self.assertEqual(
+            self.conn.execute(
+                "SELECT Value FROM omniplan_task_extended_attributes ORDER BY TaskUID"
+            ).fetchall(),
+            [("MUP-1",), ("MUP-20",)],
+        )
+
+    def test_full_import_invalidates_row_hashes(self):
+        incremental.import_incrementally(self.conn, make_tables([make_task("1", "A")]))
+        operations.insert_tasks_into_db(self.conn, [make_task("1", "Changed")])
+        deltas = incremental.import_incrementally(
+            self.conn, make_tables([make_task("1", "A")])
+        )
+        self.assertEqual(deltas["tasks"], (1, 0, 0))
+        self.assertEqual(self.task_names(), [(1, "A")])
+
+    def count(self, table):
+        return self.conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_only_derived_tables_of_changed_sources_are_rebuilt(self):
+        tasks = [make_task("1", "A"), make_task("2", "B")]
+        incremental.import_incrementally(
+            self.conn, make_tables(tasks, predecessor_links=[("2", "1", "1", None)])
+        )
+        self.assertEqual(self.count("omniplan_task_schedule"), 2)
+        self.conn.execute("DELETE FROM omniplan_task_schedule")
+        self.conn.execute("DELETE FROM omniplan_task_rollup")
+        self.conn.commit()
+
+        # Nothing changed: nothing is rebuilt.
+        incremental.import_incrementally(
+            self.conn, make_tables(tasks, predecessor_links=[("2", "1", "1", None)])
+        )
+        self.assertEqual(self.count("omniplan_task_schedule"), 0)
+        self.assertEqual(self.count("omniplan_task_rollup"), 0)
+
+        # A changed link reschedules, but does not roll the tasks up again.
+        incremental.import_incrementally(
+            self.conn, make_tables(tasks, predecessor_links=[("2", "1", "3", None)])
+        )
+        self.assertEqual(self.count("omniplan_task_schedule"), 2)
+        self.assertEqual(self.count("omniplan_task_rollup"), 0)
+
+    def test_missing_derived_tables_are_built(self):
+        tasks = [make_task("1", "A")]
+        incremental.import_incrementally(self.conn, make_tables(tasks))
+        self.conn.execute("DROP TABLE omniplan_task_rollup")
+        self.conn.commit()
+        incremental.import_incrementally(self.conn, make_tables(tasks))
+        self.assertEqual(self.count("omniplan_task_rollup"), 1)
+        self.assertIn(
+            ("idx_tasks_parent_uid",),
+            self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            ).fetchall(),
+        )
+
+    def test_failure_after_a_table_rebuild_keeps_the_previous_import(self):
+        tasks = [make_task("1", "A"), make_task("2", "B", "1")]
+        incremental.import_incrementally(self.conn, make_tables(tasks))
+        # A schema change makes the next import drop and rebuild the tasks.
+        self.conn.execute("ALTER TABLE omniplan_tasks ADD COLUMN Obsolete TEXT")
+        self.conn.commit()
+
+        import_table = incremental.import_table_incrementally
+
+        def fail_after_tasks(conn, table, rows):
+            if table != "tasks":
+                raise sqlite3.OperationalError("disk I/O error")
+            return import_table(conn, table, rows)
+
+        with patch.object(
+            incremental, "import_table_incrementally", side_effect=fail_after_tasks
+        ):
+            with self.assertRaises(sqlite3.OperationalError):
+                incremental.import_incrementally(
+                    self.conn, make_tables([make_task("1", "Changed")])
+                )
+        self.assertFalse(self.conn.in_transaction)
+        self.assertEqual(self.task_names(), [(1, "A"), (2, "B")])
+        self.assertIn(
+            "Obsolete",
+            [row[1] for row in self.conn.execute("PRAGMA table_info(omniplan_tasks)")],
+        )
+
+    def test_work_days_follow_a_calendar_change(self):
+        task = list(make_task("1", "A"))
+        task[9] = "PT32H0M0S"
+        tables = make_tables([tuple(task)])
+        tables["calendars"] = [("1", "Standard", "1", "-1")]
+
+        for finish, work_days in (("16:00:00", 4.0), ("15:30:00", 32 / 7.5)):
+            with self.subTest(finish=finish):
+                tables["calendar_weekdays"] = [
+                    ("1", str(day_type), "1", "08:00:00", finish)
+                    for day_type in range(2, 7)
+                ]
+                incremental.import_incrementally(self.conn, tables)
+                self.assertEqual(
+                    self.conn.execute(
+                        "SELECT WorkDays FROM omniplan_tasks WHERE UID = 1"
+                    ).fetchone(),
+                    (work_days,),
+                )
+
+
+if __name__ == "__main__":
+    unittest.main()
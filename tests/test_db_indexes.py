@@ -0,0 +1,102 @@
+import sqlite3
+import unittest
+
+from omniplan_exporter.db import (
+    incremental,
+    indexes,
+    operations,
+    reachability,
+    rollup,
+    schedule,
+    utilization,
+)
+from omniplan_exporter.xml import extract_operations
+from tests.test_model import project_source
+
+
+class TestIndexes(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        self.cursor = self.conn.cursor()
+        for spec in operations.IMPORT_TABLES.values():
+            spec.create(self.cursor)
+        schedule.create_schedule_table(self.cursor)
+        reachability.create_dependency_labels_table(self.cursor)
+        rollup.create_rollup_table(self.cursor)
+        utilization.create_utilization_tables(self.cursor)
+        indexes.create_indexes(self.cursor)
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_every_query_uses_an_index(self):
+        for sql, parameter_count in operations.INDEXED_QUERIES:
+            with self.subTest(sql=sql):
+                plan = indexes.query_plan(self.cursor, sql, (1,) * parameter_count)
+                self.assertTrue(plan)
+                self.assertEqual(
+                    indexes.full_scans(self.cursor, sql, (1,) * parameter_count), []
+                )
+
+    def test_queries_scan_without_the_indexes(self):
+        indexes.drop_indexes(self.cursor)
+        self.assertEqual(
+            indexes.full_scans(self.cursor, operations.SELECT_SUB_TASKS_SQL, (1,)),
+            ["SCAN omniplan_tasks"],
+        )
+
+    def test_jira_key_lookups_search_the_normalized_key(self):
+        for sql in (
+            operations.SELECT_PARENT_TASK_SQL,
+            operations.SELECT_TASK_UIDS_BY_JIRA_KEYS_SQL,
+        ):
+            with self.subTest(sql=sql):
+                plan = indexes.query_plan(self.cursor, sql, ('["MUP-1"]',))
+                self.assertTrue(
+                    any("idx_task_jira_keys_normalized_key" in step for step in plan),
+                    plan,
+                )
+
+    def test_incremental_deletes_use_an_index(self):
+        for table, spec in operations.IMPORT_TABLES.items():
+            key_column = incremental.expected_columns(table)[0]
+            sql = f"DELETE FROM {spec.name} WHERE {key_column} = ?"
+            with self.subTest(table=table):
+                self.assertEqual(indexes.full_scans(self.cursor, sql, (1,)), [])
+
+    def test_indexes_are_skipped_for_missing_tables(self):
+        conn = sqlite3.connect(":memory:")
+        operations.create_tasks_table(conn.cursor())
+        indexes.create_indexes(conn.cursor())
+        names = {
+            row[0]
+            for row in conn.execute("SELECT name FROM sqlite_master WHERE type='index'")
+        }
+        conn.close()
+        self.assertEqual(names, {"idx_tasks_parent_uid", "idx_tasks_outline_milestone"})
+
+    def test_lookups_return_the_same_rows_through_the_indexes(self):
+        tables = extract_operations.stream_project(project_source())
+        with operations.import_transaction(self.conn) as cursor:
+            for table, spec in operations.IMPORT_TABLES.items():
+                operations.reset_table(cursor, table)
+                rows = tables[table]
+                cursor.executemany(
+                    spec.insert, spec.prepare(rows) if spec.prepare else rows
+                )
+        parent = operations.get_parent_task(self.conn, "mup-1")
+        self.assertEqual(parent.uid, 1)
+        self.assertEqual(operations.get_jira_number(self.conn, 1), parent.jira_task)
+        jira_numbers = {
+            uid: operations.get_jira_number(self.conn, uid) for uid in (1, 2, 3)
+        }
+        self.assertEqual(
+            operations.get_jira_numbers(self.conn, [1, 2, 3]),
+            {uid: key for uid, key in jira_numbers.items() if key is not None},
+        )
+        sub_tasks, _ = operations.get_sub_tasks(self.conn, 1)
+        self.assertEqual([task.uid for task in sub_tasks], [2, 3])
+
+
+if __name__ == "__main__":
+    unittest.main()
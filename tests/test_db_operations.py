@@ -1,7 +1,14 @@
-import unittest
+import io
+import os
 import sqlite3
+import tempfile
+import unittest
 from dotenv import load_dotenv
+
+import main
+from benchmarks import synthetic
 from omniplan_exporter.db import operations
+from omniplan_exporter.xml import extract_operations
 
 # Load environment variables
 load_dotenv()
@@ -17,6 +24,7 @@ class TestDBOperations(unittest.TestCase):
         operations.create_predecessor_links_table(cursor)
         operations.create_resources_table(cursor)
         operations.create_assignments_table(cursor)
+        operations.create_jira_keys_table(cursor)
 
     def tearDown(self):
         self.conn.close()
@@ -49,6 +57,51 @@ class TestDBOperations(unittest.TestCase):
         result = cursor.fetchall()
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0][2], "Task 1")
+        cursor.execute(
+            "SELECT StartEpoch, StartDay, FinishEpoch, FinishDay FROM omniplan_tasks"
+        )
+        self.assertEqual(cursor.fetchone(), (1672531200, 19358, 1672617600, 19359))
+        # Values that are not ISO 8601 durations are kept, nothing is derived.
+        cursor.execute(
+            "SELECT Duration, Work, DurationSeconds, WorkDays FROM omniplan_tasks"
+        )
+        self.assertEqual(cursor.fetchone(), ("1d", "8h", None, None))
+
+    def test_insert_tasks_derives_seconds_and_work_days(self):
+        tasks = [
+            (
+                1,
+                1,
+                "Task 1",
+                1,
+                0,
+                500,
+                "2023-01-01T00:00:00",
+                "2023-01-02T00:00:00",
+                "PT7H30M0S",
+                "PT15H0M0S",
+                "PT3H45M0S",
+                "",
+                0,
+                0,
+                "Notes",
+                None,
+                50,
+            )
+        ]
+        operations.insert_tasks_into_db(self.conn, tasks)
+        cursor = self.conn.cursor()
+        cursor.execute(
+            "SELECT DurationSeconds, DurationDays, WorkSeconds, WorkDays, "
+            "ActualWorkSeconds, ActualWorkDays, RemainingWorkSeconds, "
+            "RemainingWorkDays FROM omniplan_tasks"
+        )
+        self.assertEqual(
+            cursor.fetchone(), (27000, 1.0, 54000, 2.0, 13500, 0.5, None, None)
+        )
+        self.assertEqual(
+            operations.get_work_seconds(self.conn, [1, 2]), {1: (54000, 13500)}
+        )
 
     def test_insert_assignments_into_db(self):
         self.conn.execute('INSERT INTO omniplan_tasks (UID, Name) VALUES (1, "Task 1")')
@@ -76,30 +129,57 @@ class TestDBOperations(unittest.TestCase):
         result = cursor.fetchall()
         self.assertEqual(len(result), 1)
         self.assertEqual(result[0][1], 1)
+        # The work columns are not ISO 8601 durations, so nothing is derived.
+        cursor.execute("SELECT WorkSeconds, WorkDays FROM omniplan_assignments")
+        self.assertEqual(cursor.fetchone(), (None, None))
 
     def test_get_parent_task(self):
         self.conn.execute(
-            'INSERT INTO omniplan_tasks '
-            '(UID, Name, Notes, Start, Finish) VALUES '
+            "INSERT INTO omniplan_tasks "
+            "(UID, Name, Notes, Start, Finish) VALUES "
             '(1, "Task 1", "Notes", "2023-01-01T00:00:00", "2023-01-02T00:00:00")'
         )
-        self.conn.execute(
-            'INSERT INTO omniplan_task_extended_attributes '
-            '(TaskUID, FieldID, Value) VALUES (1, 188743731, "jira_task")'
-        )
+        operations.insert_jira_keys_into_db(self.conn, [(1, "jira_task", "JIRA_TASK")])
         result = operations.get_parent_task(self.conn, "jira_task")
         self.assertIsNotNone(result)
         self.assertEqual(result[1], "Task 1")
+        self.assertEqual(result.jira_task, "jira_task")
+        self.assertEqual(operations.get_parent_task(self.conn, " JIRA_Task"), result)
+        self.assertIsNone(operations.get_parent_task(self.conn, "other"))
+
+    def test_bulk_jira_key_lookups(self):
+        for uid in (1, 2, 3):
+            self.conn.execute(
+                "INSERT INTO omniplan_tasks (UID, Name) VALUES (?, ?)",
+                (uid, f"Task {uid}"),
+            )
+        operations.insert_jira_keys_into_db(
+            self.conn,
+            [(1, "MUP-1", "MUP-1"), (2, "mup-2", "MUP-2"), (3, "MUP-2 ", "MUP-2")],
+        )
+        self.assertEqual(
+            operations.get_jira_numbers(self.conn, [1, 2, 4]), {1: "MUP-1", 2: "mup-2"}
+        )
+        self.assertEqual(operations.get_jira_numbers(self.conn, []), {})
+        self.assertEqual(
+            operations.get_task_uids_by_jira_keys(self.conn, ["mup-1", "MUP-2", "X"]),
+            {"mup-1": 1, "MUP-2": 2},
+        )
+        for uid in (1, 2, 3, 4):
+            self.assertEqual(
+                operations.get_jira_numbers(self.conn, [uid]).get(uid),
+                operations.get_jira_number(self.conn, uid),
+            )
 
     def test_get_sub_tasks(self):
         self.conn.execute(
-            'INSERT INTO omniplan_tasks '
-            '(UID, Name, Notes, Start, Finish, PercentComplete) VALUES '
+            "INSERT INTO omniplan_tasks "
+            "(UID, Name, Notes, Start, Finish, PercentComplete) VALUES "
             '(1, "Task 1", "Notes", "2023-01-01T00:00:00", "2023-01-02T00:00:00", 50)'
         )
         self.conn.execute(
-            'INSERT INTO omniplan_tasks '
-            '(UID, Name, Notes, Start, Finish, ParentUID, Milestone, PercentComplete) '
+            "INSERT INTO omniplan_tasks "
+            "(UID, Name, Notes, Start, Finish, ParentUID, Milestone, PercentComplete) "
             'VALUES (2, "Sub Task 1", "Notes", "2023-01-01T00:00:00", '
             '"2023-01-02T00:00:00", 1, 0, 75)'
         )
@@ -174,7 +254,7 @@ class TestDBOperations(unittest.TestCase):
         self.conn.execute('INSERT INTO omniplan_tasks (UID, Name) VALUES (1, "Task 1")')
         self.conn.execute('INSERT INTO omniplan_tasks (UID, Name) VALUES (2, "Task 2")')
         links = [
-            (1, 2, "1d"),
+            (1, 2, "1d", None),
         ]
         operations.insert_predecessor_links_into_db(self.conn, links)
         cursor = self.conn.cursor()
@@ -210,5 +290,175 @@ class TestDBOperations(unittest.TestCase):
             self.assertEqual(units, 1.0)
 
 
+class TestImportTransaction(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.conn = sqlite3.connect(os.path.join(self.directory.name, "omniplan.db"))
+
+    def tearDown(self):
+        self.conn.close()
+        self.directory.cleanup()
+
+    def load(self, names, bulk=False):
+        with operations.import_transaction(self.conn, bulk):
+            operations.insert_resources_into_db(
+                self.conn,
+                [(uid, uid, name, 1, 1, 1, None) for uid, name in enumerate(names)],
+            )
+
+    def resource_names(self):
+        return [
+            row[0] for row in self.conn.execute("SELECT Name FROM omniplan_resources")
+        ]
+
+    def test_failed_import_is_rolled_back(self):
+        self.load(["Kari"])
+        with self.assertRaises(RuntimeError):
+            with operations.import_transaction(self.conn):
+                operations.insert_resources_into_db(self.conn, [])
+                raise RuntimeError("extraction failed")
+        self.assertEqual(self.resource_names(), ["Kari"])
+
+    def test_bulk_load(self):
+        synchronous = self.conn.execute("PRAGMA synchronous").fetchone()[0]
+        self.load(["Kari", "Ola"], bulk=True)
+        self.assertEqual(self.resource_names(), ["Kari", "Ola"])
+        self.assertEqual(self.conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(
+            self.conn.execute("PRAGMA synchronous").fetchone()[0], synchronous
+        )
+        self.assertIsNotNone(
+            self.conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            ).fetchone()
+        )
+        self.assertNotIn("idx_tasks_parent_uid", self.index_names())
+
+        operations.create_tasks_table(self.conn.cursor())
+        self.load(["Kari"], bulk=True)
+        self.assertIn("idx_tasks_parent_uid", self.index_names())
+
+    def index_names(self):
+        return [
+            row[0]
+            for row in self.conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index'"
+            )
+        ]
+
+
+class TestSubtree(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        xml_path = os.path.join(self.directory.name, "synthetic.xml")
+        synthetic.write_project(xml_path, 300, max_depth=6, assignment_density=1.5)
+        self.conn = operations.create_connection(":memory:")
+        main.load_tables(self.conn, extract_operations.stream_project(xml_path))
+
+    def tearDown(self):
+        self.conn.close()
+        self.directory.cleanup()
+
+    def walk(self, task_uid, depth=1):
+        # The per-node recursion the subtree query replaces.
+        sub_tasks, _ = operations.get_sub_tasks(self.conn, task_uid)
+        for sub_task in sub_tasks:
+            yield sub_task.uid, depth, operations.get_jira_number(
+                self.conn, sub_task.uid
+            ), operations.get_assignments_by_uid(self.conn, sub_task.uid)
+            yield from self.walk(sub_task.uid, depth + 1)
+
+    def test_subtree_matches_per_node_queries(self):
+        roots = [task.uid for task in operations.get_tasks_by_outline(self.conn, 1)]
+        self.assertGreater(len(roots), 1)
+        for root in roots:
+            subtree = operations.get_subtree(self.conn, root)
+            self.assertEqual((subtree[0].uid, subtree[0].depth), (root, 0))
+            self.assertEqual(
+                [
+                    (task.uid, task.depth, task.jira_key, task.assignments)
+                    for task in subtree[1:]
+                ],
+                list(self.walk(root)),
+            )
+
+    def test_missing_task_has_no_subtree(self):
+        self.assertEqual(operations.get_subtree(self.conn, 10**6), [])
+        self.assertEqual(
+            operations.get_sub_tasks_and_assignments(self.conn, 10**6), []
+        )
+
+    def test_report_helpers(self):
+        root = operations.get_tasks_by_outline(self.conn, 1)[0].uid
+        subtree = operations.get_subtree(self.conn, root)
+        sub_tasks = operations.get_sub_tasks_and_assignments(self.conn, root)
+        self.assertEqual(
+            [sub_task[0] for sub_task in sub_tasks],
+            [task.uid for task in subtree[1:] if not task.summary],
+        )
+        self.assertEqual(
+            [sub_task[2] for sub_task in sub_tasks],
+            [
+                operations.convert_to_work_days(task.work)
+                for task in subtree[1:]
+                if not task.summary
+            ],
+        )
+
+        report = io.StringIO()
+        operations.write_subtasks(self.conn.cursor(), report, root, 1)
+        tasks = report.getvalue().count("- oppgave:")
+        milestones = report.getvalue().count("* Milepæl:")
+        self.assertEqual(
+            (tasks, milestones),
+            (
+                sum(not task.milestone for task in subtree[1:]),
+                sum(bool(task.milestone) for task in subtree[1:]),
+            ),
+        )
+
+    def test_closure_lookups_match_subtree(self):
+        for root in operations.get_tasks_by_outline(self.conn, 1)[:5]:
+            subtree = operations.get_subtree(self.conn, root.uid)
+            self.assertEqual(
+                operations.get_descendant_uids(self.conn, root.uid),
+                sorted(task.uid for task in subtree[1:]),
+            )
+            self.assertEqual(
+                [
+                    task.uid
+                    for task in operations.get_descendants(self.conn, root.uid, 1)
+                ],
+                [task.uid for task in subtree if task.depth == 1],
+            )
+            self.assertEqual(
+                operations.get_top_level_ancestor(self.conn, root.uid), root.uid
+            )
+
+            parents = {task.uid: task.parent_uid for task in subtree}
+            for task in subtree[1:]:
+                ancestors = [task.parent_uid]
+                while ancestors[-1] != root.uid:
+                    ancestors.append(parents[ancestors[-1]])
+                self.assertEqual(
+                    operations.get_ancestor_uids(self.conn, task.uid), ancestors
+                )
+                self.assertEqual(
+                    operations.get_top_level_ancestor(self.conn, task.uid), root.uid
+                )
+                self.assertTrue(operations.is_descendant(self.conn, task.uid, root.uid))
+                self.assertFalse(
+                    operations.is_descendant(self.conn, root.uid, task.uid)
+                )
+                self.assertFalse(
+                    operations.is_descendant(self.conn, task.uid, task.uid)
+                )
+
+    def test_closure_of_missing_task(self):
+        self.assertEqual(operations.get_descendants(self.conn, 10**6), [])
+        self.assertEqual(operations.get_ancestor_uids(self.conn, 10**6), [])
+        self.assertIsNone(operations.get_top_level_ancestor(self.conn, 10**6))
+
+
 if __name__ == "__main__":
     unittest.main()
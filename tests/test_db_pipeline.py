@@ -0,0 +1,95 @@
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from unittest.mock import patch
+
+import main
+from omniplan_exporter.db import operations, pipeline, rollup
+from omniplan_exporter.xml import extract_operations
+from tests.test_xml_extract_operations import PROJECT_XML
+
+
+def project_batches(batch_size=2):
+    return extract_operations.iter_row_batches(
+        io.BytesIO(PROJECT_XML.encode("utf-8")), batch_size=batch_size
+    )
+
+
+def table_contents(db_name):
+    conn = sqlite3.connect(db_name)
+    try:
+        return {
+            spec.name: conn.execute(f"SELECT * FROM {spec.name}").fetchall()
+            for spec in operations.IMPORT_TABLES.values()
+        }
+    finally:
+        conn.close()
+
+
+class TestImportPipeline(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.db_name = os.path.join(self.directory.name, "omniplan.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_matches_sequential_import(self):
+        parse, write = pipeline.import_pipelined(
+            self.db_name, project_batches(), queue_size=1
+        )
+        self.assertEqual(parse.rows, write.rows)
+        self.assertEqual(parse.batches, write.batches)
+
+        sequential = os.path.join(self.directory.name, "sequential.db")
+        conn = operations.create_connection(sequential)
+        main.load_tables(
+            conn,
+            extract_operations.stream_project(io.BytesIO(PROJECT_XML.encode("utf-8"))),
+        )
+        conn.close()
+        self.assertEqual(table_contents(self.db_name), table_contents(sequential))
+
+    def test_failed_parse_keeps_previous_import(self):
+        pipeline.import_pipelined(self.db_name, project_batches())
+
+        def failing_batches():
+            yield from project_batches()
+            raise ValueError("truncated export")
+
+        with self.assertRaises(ValueError):
+            pipeline.import_pipelined(self.db_name, failing_batches())
+        self.assertEqual(len(table_contents(self.db_name)["omniplan_tasks"]), 3)
+
+    def test_writer_error_is_raised(self):
+        with self.assertRaises(sqlite3.Error):
+            pipeline.import_pipelined(
+                self.db_name, [("calendars", [("1",)])] + list(project_batches())
+            )
+
+    def test_error_after_the_last_batch_is_raised(self):
+        pipeline.import_pipelined(self.db_name, project_batches())
+        errors = []
+
+        def run():
+            try:
+                pipeline.import_pipelined(self.db_name, project_batches())
+            except sqlite3.Error as e:
+                errors.append(e)
+
+        # The derived tables are built after the writer took _DONE off the queue.
+        failure = sqlite3.OperationalError("disk I/O error")
+        with patch.object(rollup, "build_rollup", side_effect=failure):
+            importer = threading.Thread(target=run, daemon=True)
+            importer.start()
+            importer.join(10)
+        self.assertFalse(importer.is_alive(), "The import hangs.")
+        self.assertEqual(errors, [failure])
+        self.assertEqual(len(table_contents(self.db_name)["omniplan_tasks"]), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
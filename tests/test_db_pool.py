@@ -0,0 +1,104 @@
+import os
+import sqlite3
+import tempfile
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+import main
+from omniplan_exporter.db import operations, pool
+from tests.test_xml_extract_operations import PROJECT_XML
+
+
+class TestReadPool(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project #1.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan #1.db")
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML)
+        main.process_xml(self.xml_path, self.db_path)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_connection_is_read_only(self):
+        conn = pool.connect_read_only(self.db_path)
+        try:
+            self.assertEqual(conn.execute("PRAGMA query_only").fetchone(), (1,))
+            self.assertEqual(operations.get_parent_task(conn, "mup-1").uid, 1)
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM omniplan_tasks")
+        finally:
+            conn.close()
+
+    def test_missing_database_is_not_created(self):
+        path = os.path.join(self.directory.name, "missing.db")
+        with self.assertRaises(sqlite3.OperationalError):
+            pool.connect_read_only(path)
+        self.assertFalse(os.path.exists(path))
+
+    def test_namedtuple_rows_work_with_the_helpers(self):
+        plain = pool.connect_read_only(self.db_path)
+        named = pool.connect_read_only(self.db_path, row_factory=pool.namedtuple_row)
+        try:
+            row = named.execute("SELECT UID, Name FROM omniplan_tasks").fetchone()
+            self.assertEqual((row.UID, row.Name), tuple(row))
+            for helper, args in (
+                (operations.get_parent_task, ("mup-1",)),
+                (operations.get_subtree, (1,)),
+                (operations.get_jira_numbers, ([1, 2, 3],)),
+                (operations.get_tasks_by_outline, (2,)),
+            ):
+                with self.subTest(helper=helper.__name__):
+                    self.assertEqual(helper(named, *args), helper(plain, *args))
+        finally:
+            plain.close()
+            named.close()
+
+    def test_memory_copy_is_a_snapshot(self):
+        conn = pool.memory_copy(self.db_path)
+        try:
+            self.assertEqual(operations.fetch_task_name_by_uid(conn, 2), "Build")
+            with open(self.xml_path, "w") as file:
+                file.write(PROJECT_XML.replace("Build", "Rebuild"))
+            main.process_xml(self.xml_path, self.db_path)
+            self.assertEqual(operations.fetch_task_name_by_uid(conn, 2), "Build")
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute("DELETE FROM omniplan_tasks")
+        finally:
+            conn.close()
+
+    def test_pool_is_shared_between_threads(self):
+        in_use = []
+        lock = threading.Lock()
+
+        def lookup(uid):
+            with read_pool.connection() as conn:
+                with lock:
+                    in_use.append(conn)
+                name = operations.fetch_task_name_by_uid(conn, uid)
+            return name
+
+        with pool.ReadPool(self.db_path, size=2) as read_pool:
+            with ThreadPoolExecutor(max_workers=4) as executor:
+                names = list(executor.map(lookup, [1, 2, 3] * 20))
+            self.assertEqual(names, ["Epic", "Build", "Release"] * 20)
+            self.assertLessEqual(len({id(conn) for conn in in_use}), 2)
+        with self.assertRaises(RuntimeError):
+            with read_pool.connection():
+                pass
+
+    def test_pooled_connection_sees_new_imports(self):
+        with pool.ReadPool(self.db_path, size=1) as read_pool:
+            with read_pool.connection() as conn:
+                self.assertEqual(operations.fetch_task_name_by_uid(conn, 2), "Build")
+            with open(self.xml_path, "w") as file:
+                file.write(PROJECT_XML.replace("Build", "Rebuild"))
+            main.process_xml(self.xml_path, self.db_path)
+            with read_pool.connection() as conn:
+                self.assertEqual(operations.fetch_task_name_by_uid(conn, 2), "Rebuild")
+
+
+if __name__ == "__main__":
+    unittest.main()
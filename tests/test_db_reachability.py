@@ -0,0 +1,237 @@
+import os
+import random
+import sqlite3
+import tempfile
+import unittest
+
+import main
+from omniplan_exporter.db import indexes, operations, reachability
+from reports import report_milestones_top_level
+
+# Three top-level milestones in a chain behind a task: Design -> Alpha -> Beta
+# -> Launch.
+MILESTONES_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Project xmlns="http://schemas.microsoft.com/project">
+    <Tasks>
+        <Task>
+            <UID>1</UID><ID>1</ID><Name>Design</Name><OutlineLevel>1</OutlineLevel>
+            <Start>2023-01-02T08:00:00</Start><Finish>2023-01-06T16:00:00</Finish>
+            <Milestone>0</Milestone>
+        </Task>
+        <Task>
+            <UID>2</UID><ID>2</ID><Name>Alpha</Name><OutlineLevel>1</OutlineLevel>
+            <Start>2023-01-06T16:00:00</Start><Finish>2023-01-06T16:00:00</Finish>
+            <Milestone>1</Milestone>
+            <PredecessorLink><PredecessorUID>1</PredecessorUID></PredecessorLink>
+        </Task>
+        <Task>
+            <UID>3</UID><ID>3</ID><Name>Beta</Name><OutlineLevel>1</OutlineLevel>
+            <Start>2023-01-13T16:00:00</Start><Finish>2023-01-13T16:00:00</Finish>
+            <Milestone>1</Milestone>
+            <PredecessorLink><PredecessorUID>2</PredecessorUID></PredecessorLink>
+        </Task>
+        <Task>
+            <UID>4</UID><ID>4</ID><Name>Launch</Name><OutlineLevel>1</OutlineLevel>
+            <Start>2023-01-20T16:00:00</Start><Finish>2023-01-20T16:00:00</Finish>
+            <Milestone>1</Milestone>
+            <PredecessorLink><PredecessorUID>3</PredecessorUID></PredecessorLink>
+        </Task>
+    </Tasks>
+</Project>
+"""
+
+
+def _reachable(uids, links):
+    # The reference closure: a walk from every task.
+    successors = {uid: set() for uid in uids}
+    for task_uid, predecessor_uid, _ in links:
+        if task_uid != predecessor_uid:
+            successors[predecessor_uid].add(task_uid)
+    pairs = set()
+    for uid in uids:
+        seen = set()
+        stack = list(successors[uid])
+        while stack:
+            task = stack.pop()
+            if task not in seen:
+                seen.add(task)
+                stack.extend(successors[task])
+        pairs.update((task, uid) for task in seen if task != uid)
+    return pairs
+
+
+def _plan(uids, links):
+    conn = sqlite3.connect(":memory:")
+    cursor = conn.cursor()
+    operations.create_tasks_table(cursor)
+    operations.create_predecessor_links_table(cursor)
+    cursor.executemany(
+        "INSERT INTO omniplan_tasks (UID, Name, Milestone) VALUES (?, ?, 0)",
+        [(uid, f"Task {uid}") for uid in uids],
+    )
+    cursor.executemany(
+        operations.INSERT_PREDECESSOR_LINKS_SQL, [(*link, None) for link in links]
+    )
+    reachability.build_dependency_labels(cursor)
+    indexes.create_indexes(cursor)
+    conn.commit()
+    return conn
+
+
+class TestReachability(unittest.TestCase):
+    def test_cycles(self):
+        links = [(6, 5, 1), (5, 6, 1), (7, 6, 1), (5, 5, 1)]
+        conn = _plan([5, 6, 7], links)
+        try:
+            self.assertEqual(
+                operations.get_transitive_predecessors(conn, [5, 7]),
+                {
+                    5: [(6, "Task 6", 0, 1)],
+                    7: [(5, "Task 5", 0, 0), (6, "Task 6", 0, 1)],
+                },
+            )
+            # Tasks on a cycle depend on each other, but not on themselves.
+            self.assertTrue(operations.depends_on(conn, 5, 6))
+            self.assertTrue(operations.depends_on(conn, 6, 5))
+            self.assertFalse(operations.depends_on(conn, 5, 5))
+            self.assertFalse(operations.depends_on(conn, 6, 7))
+        finally:
+            conn.close()
+
+    def test_matches_a_walk_from_every_task(self):
+        rng = random.Random(0)
+        uids = list(range(1, 201))
+        links = [
+            (rng.choice(uids), rng.choice(uids), rng.randrange(4)) for _ in range(300)
+        ]
+        expected = _reachable(uids, links)
+        conn = _plan(uids, links)
+        try:
+            predecessors = operations.get_transitive_predecessors(conn, uids)
+            successors = operations.get_transitive_successors(conn, uids)
+            pairs = {
+                (task_uid, dependency.uid)
+                for task_uid, dependencies in predecessors.items()
+                for dependency in dependencies
+            }
+            self.assertEqual(pairs, expected)
+            self.assertEqual(
+                {
+                    (dependency.uid, predecessor_uid)
+                    for predecessor_uid, dependencies in successors.items()
+                    for dependency in dependencies
+                },
+                expected,
+            )
+            direct = {
+                (task_uid, predecessor_uid) for task_uid, predecessor_uid, _ in links
+            }
+            for task_uid, dependencies in predecessors.items():
+                for dependency in dependencies:
+                    self.assertEqual(
+                        dependency.direct, int((task_uid, dependency.uid) in direct)
+                    )
+            for _ in range(500):
+                task_uid, predecessor_uid = rng.choice(uids), rng.choice(uids)
+                self.assertEqual(
+                    operations.depends_on(conn, task_uid, predecessor_uid),
+                    (task_uid, predecessor_uid) in expected,
+                )
+        finally:
+            conn.close()
+
+    def test_cycles_are_logged(self):
+        with self.assertLogs(reachability.logger, "WARNING") as logs:
+            reachability.dependency_labels([5, 6, 7], [(6, 5), (5, 6), (7, 6)])
+        self.assertIn("2 tasks are on 1 dependency cycles", logs.output[0])
+
+    def test_labels_decide_without_a_walk(self):
+        rng = random.Random(1)
+        uids = list(range(1, 301))
+        links = [(task_uid, rng.randrange(1, task_uid)) for task_uid in uids[1:]] + [
+            (rng.choice(uids), rng.choice(uids)) for _ in range(150)
+        ]
+        expected = _reachable(uids, [(*link, 1) for link in links])
+        labels = {
+            uid: rest for uid, *rest in reachability.dependency_labels(uids, links)
+        }
+        undecided = 0
+        for task_uid in uids:
+            for predecessor_uid in uids:
+                if task_uid == predecessor_uid:
+                    continue
+                reached = reachability.reaches(
+                    labels[predecessor_uid], labels[task_uid]
+                )
+                if reached is None:
+                    undecided += 1
+                else:
+                    self.assertEqual(reached, (task_uid, predecessor_uid) in expected)
+        self.assertLess(undecided, len(uids) ** 2 // 10)
+
+        # A chain is a single tree: every pair is decided.
+        chain = [(uid, uid - 1) for uid in uids[1:]]
+        labels = {
+            uid: rest for uid, *rest in reachability.dependency_labels(uids, chain)
+        }
+        for task_uid, predecessor_uid in ((300, 1), (1, 300), (150, 149)):
+            self.assertEqual(
+                reachability.reaches(labels[predecessor_uid], labels[task_uid]),
+                task_uid > predecessor_uid,
+            )
+
+
+class TestImportedReachability(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+        with open(self.xml_path, "w") as file:
+            file.write(MILESTONES_XML)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_imported_dependencies(self):
+        for options in ({}, {"streaming": False}, {"incremental": True}):
+            with self.subTest(**options):
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)
+                main.process_xml(self.xml_path, self.db_path, **options)
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    self.assertTrue(operations.depends_on(conn, 4, 1))
+                    self.assertFalse(operations.depends_on(conn, 1, 4))
+                    predecessors = operations.get_transitive_predecessors(conn, [1, 4])
+                    successors = operations.get_transitive_successors(conn, [2])
+                finally:
+                    conn.close()
+                self.assertEqual(list(predecessors), [4])
+                self.assertEqual(
+                    predecessors[4],
+                    [(1, "Design", 0, 0), (2, "Alpha", 1, 0), (3, "Beta", 1, 1)],
+                )
+                self.assertEqual(
+                    successors[2], [(3, "Beta", 1, 1), (4, "Launch", 1, 0)]
+                )
+
+    def test_milestone_report(self):
+        main.process_xml(self.xml_path, self.db_path)
+        report_milestones_top_level.generate_milestones_top_level_report(
+            self.db_path, self.directory.name
+        )
+        with open(os.path.join(self.directory.name, "milestones-top-level.md")) as file:
+            report = file.read()
+        self.assertIn(
+            "| Launch | - Beta |  | 3 oppgaver<br>- Alpha<br>- Beta |  | 2023-01-20 |",
+            report,
+        )
+        self.assertIn(
+            "| Alpha | - Design | - Beta | 1 oppgave | "
+            "2 oppgaver<br>- Beta<br>- Launch |",
+            report,
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
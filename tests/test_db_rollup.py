@@ -0,0 +1,115 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import main
+from omniplan_exporter.db import operations, pool, rollup
+from reports import report_task_assignments_and_status
+from tests.test_xml_extract_operations import PROJECT_XML
+
+HOUR = 3600
+
+
+def _by_uid(rollups):
+    return {row[0]: row[1:] for row in rollups}
+
+
+class TestRollup(unittest.TestCase):
+    def test_compute_rollups(self):
+        # 1 -> 2 -> (3, 4) and 1 -> 5. The summaries' own figures are ignored.
+        tasks = [
+            (1, None, 99 * HOUR, 99 * HOUR, 0, 99, 0, 99),
+            (2, 1, 99 * HOUR, 99 * HOUR, 0, 99, 0, 99),
+            (3, 2, 10 * HOUR, 10 * HOUR, 0, 100, 10, 20),
+            (4, 2, 30 * HOUR, None, 30 * HOUR, None, 15, 40),
+            (5, 1, None, None, None, 50, 5, 30),
+        ]
+        result = _by_uid(rollup.compute_rollups(tasks))
+        self.assertEqual(
+            result[1], (40 * HOUR, 10 * HOUR, 30 * HOUR, 25.0, 5, 40, 4, 3)
+        )
+        self.assertEqual(
+            result[2], (40 * HOUR, 10 * HOUR, 30 * HOUR, 25.0, 10, 40, 2, 2)
+        )
+        self.assertEqual(result[5], (0, 0, 0, 50, 5, 30, 0, 0))
+
+    def test_parents_come_first(self):
+        tasks = [(3, 2, HOUR, 0, HOUR, 0, 0, 1), (2, 1, 0, 0, 0, 0, 0, 0)]
+        tasks.append((1, None, 0, 0, 0, 0, 0, 0))
+        self.assertEqual([row[0] for row in rollup.compute_rollups(tasks)], [1, 2, 3])
+
+    def test_subtree_without_work_averages(self):
+        tasks = [
+            (1, None, None, None, None, None, None, None),
+            (2, 1, None, None, None, 100, None, None),
+            (3, 1, None, None, None, None, None, None),
+        ]
+        result = _by_uid(rollup.compute_rollups(tasks))
+        self.assertEqual(result[1][3], 50)
+        self.assertEqual(result[1][4:6], (None, None))
+
+    def test_cycles_are_left_out(self):
+        tasks = [
+            (1, None, HOUR, 0, HOUR, 0, 0, 1),
+            (2, 3, HOUR, 0, HOUR, 0, 0, 1),
+            (3, 2, HOUR, 0, HOUR, 0, 0, 1),
+        ]
+        with self.assertLogs(rollup.logger, "WARNING"):
+            result = _by_uid(rollup.compute_rollups(tasks))
+        self.assertEqual(sorted(result), [1])
+
+
+class TestImportedRollup(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_import_builds_the_rollup(self):
+        for options in ({}, {"streaming": False}, {"incremental": True}):
+            with self.subTest(**options):
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)
+                main.process_xml(self.xml_path, self.db_path, **options)
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    rollups = operations.get_task_rollups(conn, [1, 2, 9])
+                finally:
+                    conn.close()
+                self.assertEqual(sorted(rollups), [1, 2])
+                epic = rollups[1]
+                # The build's work; the release has none.
+                self.assertEqual(epic.work_seconds, 45 * HOUR)
+                self.assertEqual(epic.work_days, 6.0)
+                self.assertEqual(epic.percent_complete, 50)
+                self.assertEqual(epic.start, "2023-01-02 08:00:00")
+                self.assertEqual(epic.finish, "2023-01-06 16:00:00")
+                self.assertEqual((epic.descendants, epic.leaf_descendants), (2, 2))
+
+    def test_report_uses_the_rollup(self):
+        main.process_xml(self.xml_path, self.db_path)
+        conn = pool.connect_read_only(self.db_path)
+        try:
+            report_task_assignments_and_status.generate_assignments_report(
+                conn, "mup-1", self.directory.name
+            )
+        finally:
+            conn.close()
+        report_path = os.path.join(
+            self.directory.name, "task-assignments-and-status-MUP-1.md"
+        )
+        with open(report_path) as file:
+            report = file.read()
+        # The export's figures for the epic, then its subtree's: its only task
+        # with work is half done.
+        self.assertIn("| Epic | 10d | 40.0% | 6d | 50% |", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
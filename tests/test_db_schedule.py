@@ -0,0 +1,236 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import main
+from omniplan_exporter.db import operations, schedule
+from tests.test_xml_extract_operations import PROJECT_XML
+
+DAY = 27000
+
+
+def _by_uid(result):
+    return {
+        uid: dict(zip(schedule.Schedule._fields[1:], values))
+        for uid, *values in zip(*result)
+    }
+
+
+class TestSchedule(unittest.TestCase):
+    def _schedule(self, tasks, links):
+        return _by_uid(schedule.compute_schedule(schedule.build_network(tasks, links)))
+
+    def test_finish_to_start(self):
+        # 1 -> 2 -> 4 is the long branch, 3 -> 4 has three days of float.
+        tasks = [(1, 2 * DAY), (2, 3 * DAY), (3, 2 * DAY), (4, 0)]
+        links = [(2, 1, 1), (4, 2, 1), (4, 3, 1)]
+        result = self._schedule(tasks, links)
+        self.assertEqual(
+            [result[uid]["early_start"] for uid in (1, 2, 3, 4)],
+            [0, 2 * DAY, 0, 5 * DAY],
+        )
+        self.assertEqual(result[3]["late_start"], 3 * DAY)
+        self.assertEqual(result[3]["total_float"], 3 * DAY)
+        self.assertEqual(result[3]["free_float"], 3 * DAY)
+        self.assertEqual([uid for uid in result if result[uid]["critical"]], [1, 2, 4])
+
+    def test_link_types(self):
+        cases = (
+            # type, successor early start, late finish of the predecessor
+            (schedule.START_START, 0, 2 * DAY),
+            (schedule.FINISH_FINISH, 0, 4 * DAY),
+            (schedule.START_FINISH, 0, 4 * DAY),
+        )
+        for type_, early_start, late_finish in cases:
+            with self.subTest(type_=type_):
+                result = self._schedule([(1, 2 * DAY), (2, 4 * DAY)], [(2, 1, type_)])
+                self.assertEqual(result[2]["early_start"], early_start)
+                self.assertEqual(result[1]["late_finish"], late_finish)
+
+    def test_start_to_start_delays_successor(self):
+        # 3 waits for 1 to finish and 2 may only start with 3.
+        tasks = [(1, 2 * DAY), (2, DAY), (3, DAY)]
+        links = [(3, 1, schedule.FINISH_START), (2, 3, schedule.START_START)]
+        result = self._schedule(tasks, links)
+        self.assertEqual(result[2]["early_start"], 2 * DAY)
+        self.assertEqual(result[2]["total_float"], 0)
+
+    def test_finish_to_finish_free_float(self):
+        # 2 must not finish before 1; 1 may slip until 2 finishes.
+        tasks = [(1, DAY), (2, 4 * DAY)]
+        result = self._schedule(tasks, [(2, 1, schedule.FINISH_FINISH)])
+        self.assertEqual(result[2]["early_finish"], 4 * DAY)
+        self.assertEqual(result[1]["free_float"], 3 * DAY)
+        self.assertEqual(result[1]["total_float"], 3 * DAY)
+
+    def test_unknown_tasks_and_types(self):
+        network = schedule.build_network(
+            [(1, DAY), (2, None)], [(2, 1, None), (2, 9, 1), (1, 1, 1)]
+        )
+        self.assertEqual(network.durations, [DAY, 0])
+        self.assertEqual(network.incoming, [[], [(0, schedule.FINISH_START, 0)]])
+
+    def test_cycles_are_left_out(self):
+        tasks = [(1, DAY), (2, DAY), (3, DAY), (4, DAY)]
+        links = [(2, 1, 1), (3, 2, 1), (2, 3, 1), (4, 3, 1)]
+        with self.assertLogs(schedule.logger, "WARNING"):
+            result = self._schedule(tasks, links)
+        self.assertEqual(result[1]["early_finish"], DAY)
+        for uid in (2, 3, 4):
+            self.assertIsNone(result[uid]["early_start"])
+
+    def test_summary_tasks_span_their_children(self):
+        # Summary 10 holds 1 -> 2; 3 follows the summary. Its own duration of
+        # 40 days is the export's rollup and is not scheduled.
+        tasks = [
+            (1, 2 * DAY, 0, 10),
+            (2, 3 * DAY, 0, 10),
+            (3, DAY, 0, None),
+            (10, 40 * DAY, 1, None),
+        ]
+        links = [(2, 1, 1), (3, 10, 1)]
+        result = self._schedule(tasks, links)
+        self.assertEqual(result[10]["early_start"], 0)
+        self.assertEqual(result[10]["early_finish"], 5 * DAY)
+        self.assertEqual(result[3]["early_start"], 5 * DAY)
+        self.assertEqual(result[3]["late_finish"], 6 * DAY)
+        self.assertEqual(result[10]["total_float"], 0)
+        # The summary is not an activity of the critical path.
+        self.assertEqual([uid for uid in result if result[uid]["critical"]], [1, 2, 3])
+
+    def test_links_of_a_summary_apply_to_its_children(self):
+        # 1 -> summary 10 holding 2 and 3, and summary 10 -> 4 as start-to-start.
+        tasks = [
+            (1, 2 * DAY, 0, None),
+            (2, DAY, 0, 10),
+            (3, 3 * DAY, 0, 10),
+            (4, DAY, 0, None),
+            (10, 0, 1, None),
+        ]
+        links = [(10, 1, 1), (4, 10, schedule.START_START)]
+        result = self._schedule(tasks, links)
+        self.assertEqual(result[2]["early_start"], 2 * DAY)
+        self.assertEqual(result[3]["early_start"], 2 * DAY)
+        self.assertEqual(result[4]["early_start"], 2 * DAY)
+        # 2 can slip until 3 finishes, and then until the end of the project.
+        self.assertEqual(result[2]["free_float"], 2 * DAY)
+        self.assertEqual(result[4]["free_float"], 2 * DAY)
+        self.assertEqual(result[10]["early_finish"], 5 * DAY)
+
+    def test_free_float_through_a_summary(self):
+        # Summary 10 holds 1 and 2, and 3 follows the summary.
+        tasks = [
+            (1, DAY, 0, 10),
+            (2, 3 * DAY, 0, 10),
+            (3, DAY, 0, None),
+            (10, 0, 1, None),
+        ]
+        result = self._schedule(tasks, [(3, 10, 1)])
+        self.assertEqual(result[1]["free_float"], 2 * DAY)
+        self.assertEqual(result[2]["free_float"], 0)
+
+    def test_link_lag(self):
+        # LinkLag is in tenths of a minute: 4500 is a 7.5-hour day.
+        cases = (
+            (schedule.FINISH_START, 4500, 3 * DAY),
+            (schedule.FINISH_START, -4500, DAY),
+            (schedule.START_START, 4500, DAY),
+            (schedule.FINISH_FINISH, 4500, 2 * DAY),
+        )
+        for type_, lag, early_start in cases:
+            with self.subTest(type_=type_, lag=lag):
+                result = self._schedule([(1, 2 * DAY), (2, DAY)], [(2, 1, type_, lag)])
+                self.assertEqual(result[2]["early_start"], early_start)
+                self.assertEqual(result[1]["total_float"], 0)
+        result = self._schedule([(1, 2 * DAY), (2, DAY)], [(2, 1, 1, None)])
+        self.assertEqual(result[2]["early_start"], 2 * DAY)
+
+    def test_critical_path_order(self):
+        tasks = [(3, DAY), (1, DAY), (2, 0)]
+        links = [(1, 3, 1), (2, 1, 1)]
+        result = schedule.compute_schedule(schedule.build_network(tasks, links))
+        self.assertEqual(schedule.critical_path(result), [3, 1, 2])
+
+
+class TestImportedSchedule(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _import(self, xml, **options):
+        with open(self.xml_path, "w") as file:
+            file.write(xml)
+        main.process_xml(self.xml_path, self.db_path, **options)
+
+    def test_import_builds_the_schedule(self):
+        durations = PROJECT_XML.replace(
+            "<Name>Build</Name>", "<Name>Build</Name><Duration>PT15H0M0S</Duration>"
+        )
+        for options in ({}, {"streaming": False}, {"incremental": True}):
+            with self.subTest(**options):
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)
+                self._import(durations, **options)
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    schedules = operations.get_task_schedules(conn, [2, 3, 9])
+                    self.assertEqual(sorted(schedules), [2, 3])
+                    self.assertEqual(schedules[3].early_start, 2 * DAY)
+                    self.assertEqual(schedules[2].total_float_days, 0)
+                    self.assertEqual(
+                        [row[:2] for row in operations.get_critical_path(conn)],
+                        [(2, "Build"), (3, "Release")],
+                    )
+                finally:
+                    conn.close()
+
+    def test_import_applies_link_lags_and_outlines(self):
+        lagged = PROJECT_XML.replace(
+            "<Name>Build</Name>", "<Name>Build</Name><Duration>PT15H0M0S</Duration>"
+        ).replace(
+            "<Type>1</Type>\n            </PredecessorLink>",
+            "<Type>1</Type><LinkLag>4500</LinkLag></PredecessorLink>",
+        )
+        self._import(lagged)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(
+                conn.execute(
+                    "SELECT LinkLag FROM omniplan_predecessor_links"
+                ).fetchall(),
+                [(4500,)],
+            )
+            schedules = operations.get_task_schedules(conn, [1, 3])
+        finally:
+            conn.close()
+        self.assertEqual(schedules[3].early_start, 3 * DAY)
+        # The Epic summary spans Build and Release.
+        self.assertEqual(schedules[1].early_start, 0)
+        self.assertEqual(schedules[1].early_finish, 3 * DAY)
+        self.assertEqual(schedules[1].critical, 0)
+
+    def test_incremental_import_rebuilds_the_schedule(self):
+        self._import(PROJECT_XML, incremental=True)
+        self._import(
+            PROJECT_XML.replace(
+                "<Name>Build</Name>",
+                "<Name>Build</Name><Duration>PT7H30M0S</Duration>",
+            ),
+            incremental=True,
+        )
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(
+                operations.get_task_schedules(conn, [3])[3].early_start, DAY
+            )
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
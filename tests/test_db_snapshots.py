@@ -0,0 +1,167 @@
+import os
+import re
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import main
+from omniplan_exporter.db import indexes, operations, pool, snapshots
+from tests.test_xml_extract_operations import PROJECT_XML
+
+# The export without the Release milestone.
+WITHOUT_RELEASE_XML = re.sub(
+    r"\s*<Task>\s*<UID>3</UID>.*?</Task>", "", PROJECT_XML, flags=re.DOTALL
+)
+
+
+class TestSnapshots(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _import(self, xml, **options):
+        with open(self.xml_path, "w") as file:
+            file.write(xml)
+        main.process_xml(self.xml_path, self.db_path, snapshot=True, **options)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return snapshots.list_snapshots(conn)[-1].snapshot_id
+        finally:
+            conn.close()
+
+    def _history_rows(self, conn, table="omniplan_tasks"):
+        history = operations.history_table(table)
+        return conn.execute(f"SELECT COUNT(*) FROM {history}").fetchone()[0]
+
+    def test_as_of_reads_an_earlier_import(self):
+        first = self._import(PROJECT_XML)
+        second = self._import(PROJECT_XML.replace("Build", "Rebuild"))
+        self.assertGreater(second, first)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for as_of, name in (
+                (first, "Build"),
+                (second, "Rebuild"),
+                (None, "Rebuild"),
+            ):
+                with self.subTest(as_of=as_of):
+                    tasks = operations.get_tasks_by_outline(conn, 2, as_of=as_of)
+                    self.assertIn(name, [task[2] for task in tasks])
+                    subtree = operations.get_subtree(conn, 1, as_of=as_of)
+                    self.assertEqual(subtree[1].name, name)
+                    self.assertEqual(
+                        operations.get_parent_task(conn, "MUP-1", as_of=as_of).uid, 1
+                    )
+            # Only the renamed task was versioned.
+            self.assertEqual(self._history_rows(conn), 4)
+            # The views are gone after the query.
+            self.assertEqual(
+                conn.execute("SELECT COUNT(*) FROM sqlite_temp_master").fetchone(),
+                (0,),
+            )
+        finally:
+            conn.close()
+
+    def test_unchanged_import_adds_no_versions(self):
+        self._import(PROJECT_XML)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            rows = self._history_rows(conn)
+        finally:
+            conn.close()
+        self._import(PROJECT_XML, force=True)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(self._history_rows(conn), rows)
+            self.assertEqual(
+                [
+                    snapshot.versioned_keys
+                    for snapshot in snapshots.list_snapshots(conn)
+                ][1:],
+                [0],
+            )
+        finally:
+            conn.close()
+
+    def test_deleted_task_is_closed(self):
+        first = self._import(PROJECT_XML)
+        second = self._import(WITHOUT_RELEASE_XML)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(
+                [row[0] for row in operations.get_tasks(conn, as_of=first)], [1, 2, 3]
+            )
+            self.assertEqual(
+                [row[0] for row in operations.get_tasks(conn, as_of=second)], [1, 2]
+            )
+            self.assertEqual(
+                conn.execute(
+                    "SELECT ValidFrom, ValidTo FROM omniplan_tasks_history "
+                    "WHERE UID = 3"
+                ).fetchall(),
+                [(first, second)],
+            )
+        finally:
+            conn.close()
+
+    def test_history_survives_imports_without_snapshot(self):
+        first = self._import(PROJECT_XML)
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML.replace("Build", "Rebuild"))
+        main.process_xml(self.xml_path, self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(operations.fetch_task_name_by_uid(conn, 2), "Rebuild")
+            subtree = operations.get_subtree(conn, 1, as_of=first)
+            self.assertEqual(subtree[1].name, "Build")
+            self.assertEqual(len(snapshots.list_snapshots(conn)), 1)
+        finally:
+            conn.close()
+
+    def test_snapshots_on_every_import_path(self):
+        for options in ({"incremental": True}, {"in_memory": True}, {}):
+            with self.subTest(**options):
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)
+                first = self._import(PROJECT_XML, **options)
+                self._import(PROJECT_XML.replace("Build", "Rebuild"), **options)
+                conn = pool.connect_read_only(self.db_path)
+                try:
+                    self.assertEqual(
+                        operations.get_subtree(conn, 1, as_of=first)[1].name, "Build"
+                    )
+                    self.assertEqual(operations.get_subtree(conn, 1)[1].name, "Rebuild")
+                    self.assertEqual(conn.execute("PRAGMA query_only").fetchone(), (1,))
+                finally:
+                    conn.close()
+
+    def test_snapshot_at(self):
+        first = self._import(PROJECT_XML)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertIsNone(snapshots.snapshot_at(conn, "2000-01-01T00:00:00"))
+            self.assertEqual(snapshots.snapshot_at(conn, datetime.now()), first)
+        finally:
+            conn.close()
+
+    def test_snapshot_queries_use_indexes(self):
+        first = self._import(PROJECT_XML)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            with operations.snapshot_view(conn, first):
+                cursor = conn.cursor()
+                for sql, parameter_count in operations.INDEXED_QUERIES:
+                    with self.subTest(sql=sql):
+                        params = (1,) * parameter_count
+                        self.assertEqual(indexes.full_scans(cursor, sql, params), [])
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+
+import main
+from omniplan_exporter.db import operations, staging
+from omniplan_exporter.utils import fingerprint
+from tests.test_db_pipeline import table_contents
+from tests.test_xml_extract_operations import PROJECT_XML
+
+
+class TestStagedImport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def task_names(self, conn):
+        return [row[0] for row in conn.execute("SELECT Name FROM omniplan_tasks")]
+
+    def rewrite_export(self):
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML.replace("Build", "Rebuild"))
+
+    def test_reader_keeps_its_snapshot_during_swap(self):
+        main.process_xml(self.xml_path, self.db_path)
+        reader = sqlite3.connect(self.db_path, isolation_level=None)
+        try:
+            reader.execute("BEGIN")
+            before = self.task_names(reader)
+            self.assertIn("Build", before)
+
+            self.rewrite_export()
+            main.process_xml(self.xml_path, self.db_path)
+
+            self.assertEqual(self.task_names(reader), before)
+            reader.execute("COMMIT")
+            self.assertIn("Rebuild", self.task_names(reader))
+        finally:
+            reader.close()
+        self.assertEqual(os.listdir(self.directory.name).count("omniplan.db"), 1)
+        self.assertFalse(os.path.exists(staging.staging_path(self.db_path)))
+
+    def test_swapped_database_is_in_wal_mode(self):
+        for streaming in (True, False):
+            with self.subTest(streaming=streaming):
+                main.process_xml(
+                    self.xml_path, self.db_path, streaming=streaming, force=True
+                )
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    mode = conn.execute("PRAGMA journal_mode").fetchone()[0]
+                    self.assertEqual(mode, "wal")
+                    self.assertEqual(len(self.task_names(conn)), 3)
+                finally:
+                    conn.close()
+
+    def test_in_memory_import_matches_staged_import(self):
+        staged = os.path.join(self.directory.name, "staged.db")
+        main.process_xml(self.xml_path, staged)
+        for streaming, workers in ((True, None), (False, None), (True, 2)):
+            with self.subTest(streaming=streaming, workers=workers):
+                main.process_xml(
+                    self.xml_path,
+                    self.db_path,
+                    streaming=streaming,
+                    workers=workers,
+                    force=True,
+                    in_memory=True,
+                )
+                self.assertEqual(table_contents(self.db_path), table_contents(staged))
+                self.assertFalse(
+                    os.path.exists(staging.staging_path(self.db_path)), streaming
+                )
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(conn.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            index_names = {
+                row[0]
+                for row in conn.execute(
+                    "SELECT name FROM sqlite_master WHERE type='index'"
+                )
+            }
+            self.assertIn("idx_task_closure_ancestor", index_names)
+            imports = conn.execute("SELECT COUNT(*) FROM omniplan_imports")
+            self.assertEqual(imports.fetchone()[0], 3)
+        finally:
+            conn.close()
+
+    def test_count_mismatch_is_not_swapped_in(self):
+        main.process_xml(self.xml_path, self.db_path)
+        with staging.staging_database(self.db_path) as staging_db:
+            conn = operations.create_connection(staging_db)
+            main.load_tables(conn, {table: [] for table in operations.IMPORT_TABLES})
+            conn.close()
+            expected = dict.fromkeys(operations.IMPORT_TABLES, 0)
+            expected["tasks"] = 3
+            with self.assertRaises(staging.StagingError):
+                staging.swap_in(
+                    staging_db,
+                    self.db_path,
+                    expected,
+                    self.xml_path,
+                    fingerprint.fingerprint(self.xml_path),
+                )
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(len(self.task_names(conn)), 3)
+            imports = conn.execute("SELECT COUNT(*) FROM omniplan_imports")
+            self.assertEqual(imports.fetchone()[0], 1)
+        finally:
+            conn.close()
+
+    def test_missing_table_fails_validation(self):
+        conn = sqlite3.connect(":memory:")
+        try:
+            with self.assertRaises(staging.StagingError):
+                staging.validate_counts(conn, {"tasks": 0})
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
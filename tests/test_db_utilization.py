@@ -0,0 +1,166 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime
+
+import main
+from omniplan_exporter.db import calendars, operations, utilization
+from omniplan_exporter.utils import decoding
+from reports import report_resource_utilization
+from tests.test_xml_extract_operations import PROJECT_XML
+
+HOUR = 3600
+
+# Half of Kari's time on the epic, on top of full time on the build.
+OVERLAPPING_XML = PROJECT_XML.replace(
+    "</Assignments>",
+    """    <Assignment>
+            <UID>2</UID>
+            <TaskUID>1</TaskUID>
+            <ResourceUID>1</ResourceUID>
+            <Units>0.5</Units>
+            <Start>2023-01-03T12:00:00</Start>
+            <Finish>2023-01-06T16:00:00</Finish>
+        </Assignment>
+    </Assignments>""",
+)
+
+
+def _epoch(*args):
+    return decoding.date_columns(datetime(*args))[0]
+
+
+class TestUtilization(unittest.TestCase):
+    def test_load_curves(self):
+        intervals = [
+            (1, 0, 10 * HOUR, 1),
+            (1, 5 * HOUR, 15 * HOUR, 0.5),
+            (1, 15 * HOUR, 20 * HOUR, 0.5),
+            (2, 0, HOUR, 0.1),
+            (2, 0, HOUR, 0.2),
+            (2, 2 * HOUR, 2 * HOUR, 1),
+            (2, 3 * HOUR, None, 1),
+        ]
+        curves = utilization.load_curves(intervals)
+        self.assertEqual(
+            curves[1],
+            [(0, 5 * HOUR, 1), (5 * HOUR, 10 * HOUR, 1.5), (10 * HOUR, 20 * HOUR, 0.5)],
+        )
+        self.assertEqual(curves[2], [(0, HOUR, 0.3)])
+
+    def test_find_overallocations(self):
+        curve = [
+            utilization.LoadSegment(0, HOUR, 1.5),
+            utilization.LoadSegment(HOUR, 2 * HOUR, 2),
+            utilization.LoadSegment(2 * HOUR, 3 * HOUR, 1),
+            utilization.LoadSegment(4 * HOUR, 5 * HOUR, 1.25),
+        ]
+        self.assertEqual(
+            utilization.find_overallocations(curve, 1),
+            [(0, 2 * HOUR, 2, None), (4 * HOUR, 5 * HOUR, 1.25, None)],
+        )
+        self.assertEqual(utilization.find_overallocations(curve, 2), [])
+
+    def test_analyze_utilization(self):
+        intervals = [
+            (1, 0, 2 * HOUR, 1),
+            (1, HOUR, 3 * HOUR, 1),
+            (2, 0, HOUR, 0.5),
+            (-65535, 0, HOUR, 5),
+        ]
+        results = utilization.analyze_utilization(intervals, {1: None, 2: 0.25, 3: 1})
+        self.assertEqual([result.resource_uid for result in results], [1, 2, 3])
+        first, second, third = results
+        self.assertEqual((first.max_units, first.peak_units), (1.0, 2))
+        self.assertEqual(first.peak_start, HOUR)
+        self.assertEqual(first.overallocations, [(HOUR, 2 * HOUR, 2, None)])
+        self.assertEqual(len(second.overallocations), 1)
+        self.assertEqual((third.peak_units, third.load), (0, []))
+        self.assertEqual(
+            utilization.utilization_rows(first),
+            (1, 1.0, 2, HOUR, 3 * HOUR, HOUR, None, 1),
+        )
+
+    def test_working_minutes_and_weeks(self):
+        # 08:00 to 16:00 on weekdays.
+        calendar = calendars.WorkingCalendar(
+            1, "Weekdays", {day: ((8 * 60, 16 * 60),) for day in range(5)}, {}
+        )
+        # From Friday noon to Monday noon of the next week.
+        start, finish = _epoch(2024, 12, 6, 12), _epoch(2024, 12, 9, 12)
+        curve = [utilization.LoadSegment(start, finish, 1.5)]
+        windows = utilization.find_overallocations(curve, 1, calendar)
+        self.assertEqual(windows[0].working_minutes, 8 * 60)
+        self.assertEqual(
+            utilization.overallocated_weeks(windows, calendar),
+            [(2024, 49, 4.0, 1.5), (2024, 50, 4.0, 1.5)],
+        )
+        # Without a calendar every hour counts.
+        self.assertEqual(
+            utilization.overallocated_weeks(windows),
+            [(2024, 49, 60.0, 1.5), (2024, 50, 12.0, 1.5)],
+        )
+
+
+class TestImportedUtilization(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def _import(self, xml, **options):
+        with open(self.xml_path, "w") as file:
+            file.write(xml)
+        main.process_xml(self.xml_path, self.db_path, **options)
+
+    def test_import_builds_the_utilization(self):
+        for options in ({}, {"streaming": False}, {"incremental": True}):
+            with self.subTest(**options):
+                if os.path.exists(self.db_path):
+                    os.remove(self.db_path)
+                self._import(OVERLAPPING_XML, **options)
+                conn = sqlite3.connect(self.db_path)
+                try:
+                    (resource,) = operations.get_overallocated_resources(conn)
+                    self.assertEqual(resource.name, "Kari")
+                    self.assertEqual(resource.peak_units, 1.5)
+                    self.assertEqual(resource.overallocated_seconds, 28 * HOUR)
+                    # Only Mondays are working days in the fixture's calendar.
+                    self.assertEqual(resource.overallocated_minutes, 0)
+                    self.assertEqual(
+                        operations.get_overallocations(conn, 1),
+                        [(_epoch(2023, 1, 3, 12), _epoch(2023, 1, 4, 16), 1.5, 0)],
+                    )
+                    self.assertEqual(len(operations.get_resource_load(conn, 1)), 3)
+                finally:
+                    conn.close()
+
+    def test_incremental_import_rebuilds_the_utilization(self):
+        self._import(OVERLAPPING_XML, incremental=True)
+        self._import(PROJECT_XML, incremental=True)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(operations.get_overallocated_resources(conn), [])
+            self.assertEqual(
+                operations.get_resource_load(conn, 1),
+                [(_epoch(2023, 1, 2, 8), _epoch(2023, 1, 4, 16), 1.0)],
+            )
+        finally:
+            conn.close()
+
+    def test_report(self):
+        self._import(OVERLAPPING_XML)
+        report_resource_utilization.generate_resource_utilization_report(
+            self.db_path, self.directory.name
+        )
+        with open(os.path.join(self.directory.name, "resource-utilization.md")) as file:
+            report = file.read()
+        self.assertIn("| Kari | 100% | 150% | 2023-01-03 | 0.0 | 1 |", report)
+
+
+if __name__ == "__main__":
+    unittest.main()
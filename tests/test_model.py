@@ -0,0 +1,97 @@
+import io
+import sqlite3
+import unittest
+from datetime import datetime
+
+import main
+from omniplan_exporter.db import operations
+from omniplan_exporter.model import Task, TaskTable
+from omniplan_exporter.xml import extract_operations
+from tests.test_xml_extract_operations import PROJECT_XML
+
+
+def project_source():
+    return io.BytesIO(PROJECT_XML.encode("utf-8"))
+
+
+class TestTaskModel(unittest.TestCase):
+    def setUp(self):
+        self.conn = sqlite3.connect(":memory:")
+        main.load_tables(self.conn, extract_operations.stream_project(project_source()))
+
+    def tearDown(self):
+        self.conn.close()
+
+    def test_extracted_tasks_are_records(self):
+        tasks = extract_operations.stream_project(project_source(), ("tasks",))
+        release = tasks["tasks"][2]
+        self.assertIsInstance(release, Task)
+        self.assertEqual((release.name, release.parent_uid), ("Release", "1"))
+        self.assertEqual(release[15], release.parent_uid)
+
+    def test_table_from_export_matches_table_from_database(self):
+        from_export = extract_operations.stream_task_table(project_source())
+        from_database = operations.read_task_table(self.conn)
+        self.assertEqual(list(from_export), list(from_database))
+        self.assertEqual(
+            from_export[0],
+            Task(
+                1,
+                1,
+                "Epic",
+                1,
+                None,
+                None,
+                datetime(2023, 1, 2, 8),
+                datetime(2023, 1, 6, 16),
+                None,
+                "PT75H0M0S",
+                None,
+                None,
+                1,
+                0,
+                None,
+                None,
+                40.0,
+            ),
+        )
+
+    def test_select_scans_columns(self):
+        table = operations.read_task_table(self.conn)
+        self.assertEqual(table.select(outline_level=2), [1, 2])
+        self.assertEqual(table.select(outline_level=2, milestone=0), [1])
+        self.assertEqual(table.select(parent_uids=(1, 32)), [1, 2])
+        self.assertEqual(table.select(parent_uids=(261,)), [])
+        self.assertEqual(
+            [task.name for task in table.where(outline_level=2, milestone=1)],
+            ["Release"],
+        )
+
+    def test_pooled_strings_are_shared(self):
+        table = TaskTable.from_tasks(
+            (uid, uid, f"Task {uid}", 1, 0, 500, None, None)
+            + ("".join(["PT8H", "0M0S"]),) * 4
+            + (0, 0, None, None, None)
+            for uid in range(3)
+        )
+        self.assertIs(table.work[0], table.work[2])
+        self.assertIsNone(table[1].start)
+        self.assertIsNone(table[1].percent_complete)
+
+    def test_get_tasks_by_outline_returns_records(self):
+        milestones = operations.get_tasks_by_outline(
+            self.conn, outline_level=2, milestone=1
+        )
+        self.assertEqual([(task.uid, task.parent_uid) for task in milestones], [(3, 1)])
+
+    def test_get_tasks_by_outline_under_parents(self):
+        for parent_uids, expected in (([1], [3]), ([2, 99], []), ([], [])):
+            with self.subTest(parent_uids=parent_uids):
+                tasks = operations.get_tasks_by_outline(
+                    self.conn, outline_level=2, milestone=1, parent_uids=parent_uids
+                )
+                self.assertEqual([task.uid for task in tasks], expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+from datetime import date, datetime
+
+from omniplan_exporter.utils import decoding
+
+
+class TestDecoding(unittest.TestCase):
+    def test_parse_datetime(self):
+        self.assertEqual(
+            decoding.parse_datetime("2023-01-02T08:00:00"),
+            datetime(2023, 1, 2, 8, 0, 0),
+        )
+        self.assertEqual(
+            decoding.parse_datetime("2023-01-02 08:00:00"),
+            datetime(2023, 1, 2, 8, 0, 0),
+        )
+
+    def test_date_columns(self):
+        self.assertEqual(decoding.date_columns("1970-01-02T01:00:00"), (90000, 1))
+        self.assertEqual(
+            decoding.date_columns(datetime(2023, 1, 2, 8, 0, 0)),
+            (1672646400, 19359),
+        )
+        self.assertEqual(decoding.date_columns(None), (None, None))
+        self.assertEqual(decoding.date_columns("not a date"), (None, None))
+
+    def test_from_epoch(self):
+        self.assertEqual(decoding.from_epoch(90000), datetime(1970, 1, 2, 1))
+        moment = datetime(2023, 1, 2, 8, 0, 0)
+        self.assertEqual(decoding.from_epoch(decoding.date_columns(moment)[0]), moment)
+
+    def test_duration_columns(self):
+        self.assertEqual(decoding.duration_columns("PT45H0M0S"), (162000, 6.0))
+        self.assertEqual(decoding.duration_columns("PT3H45M0S"), (13500, 0.5))
+        self.assertEqual(decoding.duration_columns(None), (None, None))
+        self.assertEqual(decoding.duration_columns(""), (None, None))
+        self.assertEqual(decoding.duration_columns("invalid"), (None, None))
+        self.assertEqual(decoding.duration_columns("P1M"), (None, None))
+
+    def test_to_date(self):
+        self.assertEqual(decoding.to_date("2023-01-02 08:00:00"), date(2023, 1, 2))
+        self.assertEqual(decoding.to_date(None), "N/A")
+        self.assertEqual(decoding.to_date("invalid"), "N/A")
+
+
+if __name__ == "__main__":
+    unittest.main()
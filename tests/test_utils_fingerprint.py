@@ -0,0 +1,136 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from unittest.mock import patch
+
+import main
+from omniplan_exporter.db import operations
+from omniplan_exporter.utils import fingerprint
+from tests.test_xml_extract_operations import PROJECT_XML
+
+
+class TestFingerprint(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.directory.name, "project.xml")
+        with open(self.path, "w") as file:
+            file.write("<Project/>")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_unchanged_file_matches_without_hashing(self):
+        previous = fingerprint.fingerprint(self.path)
+        with patch.object(fingerprint, "content_hash") as content_hash:
+            self.assertEqual(fingerprint.matches(self.path, previous), (True, previous))
+        content_hash.assert_not_called()
+
+    def test_touched_file_matches_by_content(self):
+        previous = fingerprint.fingerprint(self.path)
+        os.utime(self.path, ns=(previous.mtime_ns + 10**9,) * 2)
+        unchanged, current = fingerprint.matches(self.path, previous)
+        self.assertTrue(unchanged)
+        self.assertEqual(current.mtime_ns, previous.mtime_ns + 10**9)
+
+    def test_changed_file_does_not_match(self):
+        previous = fingerprint.fingerprint(self.path)
+        with open(self.path, "w") as file:
+            file.write("<Project>")
+        os.utime(self.path, ns=(previous.mtime_ns + 10**9,) * 2)
+        self.assertFalse(fingerprint.matches(self.path, previous)[0])
+        self.assertFalse(fingerprint.matches(self.path, None)[0])
+
+
+class TestSkipUnchangedImport(unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.xml_path = os.path.join(self.directory.name, "project.xml")
+        self.db_path = os.path.join(self.directory.name, "omniplan.db")
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def import_count(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            return conn.execute("SELECT COUNT(*) FROM omniplan_imports").fetchone()[0]
+        finally:
+            conn.close()
+
+    def test_second_import_is_skipped(self):
+        main.process_xml(self.xml_path, self.db_path)
+        with patch.object(main.extract_operations, "stream_project") as stream:
+            main.process_xml(self.xml_path, self.db_path)
+        stream.assert_not_called()
+        self.assertEqual(self.import_count(), 1)
+
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(
+                operations.get_last_import(conn),
+                fingerprint.fingerprint(self.xml_path),
+            )
+        finally:
+            conn.close()
+
+    def test_force_and_changed_export_are_imported(self):
+        main.process_xml(self.xml_path, self.db_path)
+        main.process_xml(self.xml_path, self.db_path, force=True)
+        self.assertEqual(self.import_count(), 2)
+
+        with open(self.xml_path, "w") as file:
+            file.write(PROJECT_XML.replace("Build", "Rebuild"))
+        main.process_xml(self.xml_path, self.db_path)
+        self.assertEqual(self.import_count(), 3)
+
+    def test_import_of_another_schema_version_is_not_skipped(self):
+        main.process_xml(self.xml_path, self.db_path)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(
+                "UPDATE omniplan_imports SET SchemaVersion = ?",
+                (operations.SCHEMA_VERSION - 1,),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        main.process_xml(self.xml_path, self.db_path)
+        self.assertEqual(self.import_count(), 2)
+        main.process_xml(self.xml_path, self.db_path)
+        self.assertEqual(self.import_count(), 2)
+
+    def test_import_log_without_schema_version(self):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute(
+                """
+                CREATE TABLE omniplan_imports (
+                    ImportID INTEGER PRIMARY KEY, SourcePath TEXT, Size INTEGER,
+                    MTimeNs INTEGER, ContentHash TEXT, ImportedAt TEXT
+                )
+                """
+            )
+            conn.execute(
+                "INSERT INTO omniplan_imports VALUES (1, ?, ?, ?, ?, NULL)",
+                (self.xml_path, *fingerprint.fingerprint(self.xml_path)),
+            )
+            conn.commit()
+        finally:
+            conn.close()
+        main.process_xml(self.xml_path, self.db_path)
+        self.assertEqual(self.import_count(), 2)
+        conn = sqlite3.connect(self.db_path)
+        try:
+            self.assertEqual(
+                operations.get_last_import(conn),
+                fingerprint.fingerprint(self.xml_path),
+            )
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,10 +1,120 @@
+import io
+import os
+import tempfile
 import unittest
 import xml.etree.ElementTree as ET
 import sqlite3
 
-from omniplan_exporter.xml import extract_operations
+from omniplan_exporter.xml import extract_operations, parallel_operations
 from omniplan_exporter.db import operations
 
+PROJECT_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<Project xmlns="http://schemas.microsoft.com/project">
+    <Name>Sample</Name>
+    <Calendars>
+        <Calendar>
+            <UID>1</UID>
+            <Name>Standard</Name>
+            <IsBaseCalendar>1</IsBaseCalendar>
+            <BaseCalendarUID>-1</BaseCalendarUID>
+            <WeekDays>
+                <WeekDay>
+                    <DayType>2</DayType>
+                    <DayWorking>1</DayWorking>
+                    <WorkingTimes>
+                        <WorkingTime>
+                            <FromTime>08:00:00</FromTime>
+                            <ToTime>11:30:00</ToTime>
+                        </WorkingTime>
+                        <WorkingTime>
+                            <FromTime>12:00:00</FromTime>
+                            <ToTime>16:00:00</ToTime>
+                        </WorkingTime>
+                    </WorkingTimes>
+                </WeekDay>
+            </WeekDays>
+            <Exceptions>
+                <Exception>
+                    <UID>1</UID>
+                    <Name>Holiday</Name>
+                    <FromDate>2023-01-02T00:00:00</FromDate>
+                    <ToDate>2023-01-02T23:59:00</ToDate>
+                </Exception>
+            </Exceptions>
+        </Calendar>
+    </Calendars>
+    <Tasks>
+        <Task>
+            <UID>1</UID>
+            <ID>1</ID>
+            <Name>Epic</Name>
+            <OutlineLevel>1</OutlineLevel>
+            <Start>2023-01-02T08:00:00</Start>
+            <Finish>2023-01-06T16:00:00</Finish>
+            <Work>PT75H0M0S</Work>
+            <Summary>1</Summary>
+            <Milestone>0</Milestone>
+            <PercentComplete>40</PercentComplete>
+            <ExtendedAttribute>
+                <FieldID>188743731</FieldID>
+                <Value>MUP-1</Value>
+            </ExtendedAttribute>
+        </Task>
+        <Task>
+            <UID>2</UID>
+            <ID>2</ID>
+            <Name>Build</Name>
+            <OutlineLevel>2</OutlineLevel>
+            <Start>2023-01-02T08:00:00</Start>
+            <Finish>2023-01-04T16:00:00</Finish>
+            <Work>PT45H0M0S</Work>
+            <Summary>0</Summary>
+            <Milestone>0</Milestone>
+            <PercentComplete>50</PercentComplete>
+            <ExtendedAttribute>
+                <FieldID>188743731</FieldID>
+                <Value>MUP-2</Value>
+            </ExtendedAttribute>
+        </Task>
+        <Task>
+            <UID>3</UID>
+            <ID>3</ID>
+            <Name>Release</Name>
+            <OutlineLevel>2</OutlineLevel>
+            <Start>2023-01-06T16:00:00</Start>
+            <Finish>2023-01-06T16:00:00</Finish>
+            <Summary>0</Summary>
+            <Milestone>1</Milestone>
+            <PredecessorLink>
+                <PredecessorUID>2</PredecessorUID>
+                <Type>1</Type>
+            </PredecessorLink>
+        </Task>
+    </Tasks>
+    <Resources>
+        <Resource>
+            <UID>1</UID>
+            <ID>1</ID>
+            <Name>Kari</Name>
+            <Type>1</Type>
+            <MaxUnits>1</MaxUnits>
+            <CalendarUID>1</CalendarUID>
+        </Resource>
+    </Resources>
+    <Assignments>
+        <Assignment>
+            <UID>1</UID>
+            <TaskUID>2</TaskUID>
+            <ResourceUID>1</ResourceUID>
+            <Units>1</Units>
+            <Work>PT45H0M0S</Work>
+            <Start>2023-01-02T08:00:00</Start>
+            <Finish>2023-01-04T16:00:00</Finish>
+        </Assignment>
+    </Assignments>
+</Project>
+"""
+
 
 class TestXMLParseOperations(unittest.TestCase):
     def setUp(self):
@@ -46,6 +156,138 @@ class TestXMLParseOperations(unittest.TestCase):
         self.assertEqual(len(tasks), 1)
         self.assertEqual(tasks[0][2], "Task 1")
 
+    def test_stream_project_matches_tree_extraction(self):
+        root = ET.fromstring(
+            PROJECT_XML.replace(' xmlns="http://schemas.microsoft.com/project"', "")
+        )
+        tables = extract_operations.stream_project(
+            io.BytesIO(PROJECT_XML.encode("utf-8"))
+        )
+        self.assertEqual(tables["tasks"], extract_operations.extract_tasks(root))
+        self.assertEqual(
+            tables["resources"], extract_operations.extract_resources(root)
+        )
+        self.assertEqual(
+            tables["assignments"], extract_operations.extract_assignments(root)
+        )
+        self.assertEqual(
+            tables["calendars"], extract_operations.extract_calendars(root)
+        )
+        self.assertEqual(
+            tables["calendar_weekdays"],
+            extract_operations.extract_calendar_weekdays(root),
+        )
+        self.assertEqual(
+            tables["calendar_exceptions"],
+            extract_operations.extract_calendar_exceptions(root),
+        )
+        self.assertEqual(
+            tables["extended_attributes"],
+            extract_operations.extract_extended_attributes(root),
+        )
+        self.assertEqual(
+            tables["predecessor_links"],
+            extract_operations.extract_predecessor_links(root),
+        )
+        self.assertEqual(tables["tasks"][2][15], "1")
+
+    def test_extract_all_single_pass(self):
+        root = ET.fromstring(
+            PROJECT_XML.replace(' xmlns="http://schemas.microsoft.com/project"', "")
+        )
+        tables = extract_operations.extract_all(root)
+        self.assertEqual(set(tables), set(extract_operations.TABLES))
+        self.assertEqual(len(tables["tasks"]), 3)
+        self.assertEqual(len(tables["calendar_weekdays"]), 2)
+        self.assertEqual(tables["extended_attributes"][1], ("2", "188743731", "MUP-2"))
+
+        links_only = extract_operations.extract_all(root, ("predecessor_links",))
+        self.assertEqual(links_only, {"predecessor_links": [("3", "2", "1", None)]})
+
+    def test_extract_task_closure(self):
+        root = ET.fromstring(
+            PROJECT_XML.replace(' xmlns="http://schemas.microsoft.com/project"', "")
+        )
+        self.assertEqual(
+            extract_operations.extract_task_closure(root),
+            [("1", "1", 0), ("1", "2", 1), ("2", "2", 0), ("1", "3", 1), ("3", "3", 0)],
+        )
+
+    def test_extract_jira_keys(self):
+        root = ET.fromstring(
+            PROJECT_XML.replace(' xmlns="http://schemas.microsoft.com/project"', "")
+        )
+        jira_keys = extract_operations.extract_jira_keys(root)
+        self.assertEqual(jira_keys, [("1", "MUP-1", "MUP-1"), ("2", "MUP-2", "MUP-2")])
+        self.assertEqual(
+            extract_operations.stream_project(io.StringIO(PROJECT_XML))["jira_keys"],
+            jira_keys,
+        )
+
+    def test_field_mappings_match_table_columns(self):
+        cursor = self.conn.cursor()
+        operations.create_resources_table(cursor)
+        operations.create_assignments_table(cursor)
+        operations.create_calendars_table(cursor)
+        for table, fields in (
+            ("omniplan_tasks", extract_operations.TASK_FIELDS),
+            ("omniplan_resources", extract_operations.RESOURCE_FIELDS),
+            ("omniplan_assignments", extract_operations.ASSIGNMENT_FIELDS),
+            ("omniplan_calendars", extract_operations.CALENDAR_FIELDS),
+        ):
+            columns = [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]
+            self.assertEqual(columns[: len(fields)], [field.column for field in fields])
+
+    def test_iter_project_elements_releases_consumed_elements(self):
+        seen = []
+        for tag, element in extract_operations.iter_project_elements(
+            io.BytesIO(PROJECT_XML.encode("utf-8"))
+        ):
+            seen.append((tag, element.findtext("UID")))
+            previous = element
+        self.assertEqual(
+            seen,
+            [
+                ("Calendar", "1"),
+                ("Task", "1"),
+                ("Task", "2"),
+                ("Task", "3"),
+                ("Resource", "1"),
+                ("Assignment", "1"),
+            ],
+        )
+        self.assertEqual(len(previous), 0)
+
+    def test_iter_row_batches_matches_stream_project(self):
+        source = PROJECT_XML.encode("utf-8")
+        batches = list(
+            extract_operations.iter_row_batches(io.BytesIO(source), batch_size=2)
+        )
+        self.assertTrue(all(0 < len(rows) <= 2 for _, rows in batches))
+        joined = {table: [] for table in extract_operations.TABLES}
+        for table, rows in batches:
+            joined[table].extend(rows)
+        self.assertEqual(joined, extract_operations.stream_project(io.BytesIO(source)))
+
+    def test_split_task_chunks(self):
+        data = PROJECT_XML.encode("utf-8")
+        (start, end), chunks = parallel_operations.split_task_chunks(data, 3)
+        self.assertEqual(chunks[0][0], start)
+        self.assertEqual(chunks[-1][1], end)
+        for (_, chunk_end), (next_start, _) in zip(chunks, chunks[1:]):
+            self.assertEqual(chunk_end, next_start)
+            self.assertTrue(data.endswith(b"</Task>", 0, chunk_end))
+
+    def test_stream_project_parallel_matches_serial(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "project.xml")
+            with open(path, "w", encoding="utf-8") as file:
+                file.write(PROJECT_XML)
+            self.assertEqual(
+                parallel_operations.stream_project_parallel(path, workers=2),
+                extract_operations.stream_project(path),
+            )
+
 
 if __name__ == "__main__":
     unittest.main()